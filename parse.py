@@ -1,15 +1,53 @@
 from serror import SkimpyError
-
-# Save the line and column of this token for error messages
-class SkimpyToken(object):
-    def __init__(self,text,line,col):
-        if not text:
-            raise ValueError('initializing token with empty string')
-        
-        self.text = text
-        self.line = line
-        self.col = col
- #       print ('building ' + str(self))
+from enum import Enum
+from array import array
+import bisect
+import mmap
+import re
+import os
+import concurrent.futures
+
+# What a token stands for, decided once when the token is built
+class TokenKind(Enum):
+    IDENTIFIER = 0
+    INTEGER = 1
+    FLOAT = 2
+    STRING = 3
+    BOOLEAN = 4
+    PUNCTUATION = 5
+
+literal_kinds = frozenset([TokenKind.INTEGER,TokenKind.FLOAT,TokenKind.STRING,TokenKind.BOOLEAN])
+
+# Numbers are boot-strapped to Python's.  The policy: digits alone make an integer; a decimal point or an exponent
+# makes a float.
+_integer_regex = re.compile(r'[+-]?\d+')
+_float_regex = re.compile(r'[+-]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?')
+_punctuation = frozenset(["(",")","'","#("])
+
+def classify_token(text):
+    # Returns the kind of token text and its value converted to a Python object (None for identifiers and punctuation)
+    first = text[0]
+    if first == '"':
+        # A quotation may not contain a quotation mark, so a trailing one can only be the closing one
+        if len(text) > 1 and text[-1] == '"':
+            return TokenKind.STRING,text[1:-1]
+        return TokenKind.STRING,text[1:]
+    elif text in _punctuation:
+        return TokenKind.PUNCTUATION,None
+    elif first == '#':
+        if text == "#t":
+            return TokenKind.BOOLEAN,True
+        elif text == "#f":
+            return TokenKind.BOOLEAN,False
+    elif _integer_regex.fullmatch(text):
+        return TokenKind.INTEGER,int(text)
+    elif _float_regex.fullmatch(text):
+        return TokenKind.FLOAT,float(text)
+    return TokenKind.IDENTIFIER,None
+
+# Common base of the token types.  The printing logic only needs text
+class SkimpyAtom(object):
+    __slots__ = ()
 
     def __str__(self): # Printable representation
         return self.text + " @ {" + str(self.line) + ":" + str(self.col) + "}"
@@ -19,22 +57,35 @@ class SkimpyToken(object):
             return self.text + '"'
         else:
             return self.text
-     
-class SkimpyConcrNonleafNode(object):
-    def __init__(self,line,col,parent=None):
-        self.parent = parent
-        self.text = [] # list representing my substructure
+
+# Save the line and column of this token for error messages
+class SkimpyToken(SkimpyAtom):
+    def __init__(self,text,line,col,kind=None,value=None):
+        if not text:
+            raise ValueError('initializing token with empty string')
+        
+        self.text = text
         self.line = line
         self.col = col
+        if kind is None:
+            kind,value = classify_token(text)
+        self.kind = kind
+        self.value = value
+ #       print ('building ' + str(self))
+
+# Common base of the nonleaf node types.  Subnodes are in text
+class SkimpyNonleaf(object):
+    __slots__ = ()
 
-    def append(self,v):
-        self.text.append(v)
-    
     def str_pretty(self):
         retv = ""
 
         if not self.text:
             retv += "#f"  # empty node
+        elif is_vector_literal(self):
+            retv += "#("
+            retv += " ".join(self.text[i].str_pretty() for i in range(1,len(self.text)))
+            retv += ")"
         else:
             retv += "("
             retv += self.text[0].str_pretty()
@@ -45,6 +96,18 @@ class SkimpyConcrNonleafNode(object):
 
         return retv
 
+class SkimpyConcrNonleafNode(SkimpyNonleaf):
+    def __init__(self,line,col,parent=None):
+        self.parent = parent
+        self.text = [] # list representing my substructure
+        self.line = line
+        self.col = col
+
+    def append(self,v):
+        self.text.append(v)
+
+    def is_root(self):
+        return self.parent is None
 
 # This logic is shared between all states
 class SkimpyPrescanContext(object):
@@ -81,7 +144,7 @@ class SkimpyPrescanContext(object):
     def distance(self):
         return self.idx - self.mark
 
-extended_set = set(iter("+*/-_<>?!'=.\#"))
+extended_set = set(iter(r"+*/-_<>?!'=.\#"))
 def is_extended(ch):
     return ch in extended_set
 
@@ -117,20 +180,26 @@ def skimpy_prescan(t_str):
 
     in_comment = False
     for ch in t_str:
-        if ch == ';':
+        if in_comment:
+            if ch == '\n':
+                in_comment = False
+        elif ch == ';' and fsm_state != 5:
             in_comment = True
-        elif ch == '\n':
-            in_comment = False
 
-        if in_comment:
-            continue
         # Category of next character as whitespace, identifier, or parenthesis
-        char_cat = classify_char(ch)
+        # A comment separates tokens exactly like whitespace does
+        char_cat = 0 if in_comment else classify_char(ch)
 
-        if char_cat is None:
+        if char_cat is None and fsm_state != 5:  # Anything but a quotation mark may appear between quotes
             # Invalid character
             raise context.get_error("Invalid character: " + ch)
 
+        if fsm_state == 3 and char_cat == 1 and token_len == 0 and t_str[context.mark] == '#':
+            # #( opens a vector.  The parenthesis ends a token of its own, as in state 1
+            fsm_state = 1
+            context.on_character(ch)
+            continue
+
         # If we are not inside quotes
         changed_category = fsm_state != char_cat  # Note: if fsm_category == -1, this will be true
 
@@ -171,9 +240,57 @@ def skimpy_prescan(t_str):
     if fsm_state != 0 and fsm_state != -1:
         yield context.on_token_end()
 
+# The table-driven lexer.  Instead of stepping the FSM above one character at a time, it matches whole runs of
+# characters of the same class with one compiled regular expression.  Every character of the input is either
+# leading whitespace or falls into exactly one of the alternatives, so finditer() walks the text without gaps.
+# The group that matched gives the token class.
+# NOTE:  \w and \s follow str.isalnum()/str.isspace() (plus '_', which is extended anyway), so the classes agree with
+# classify_char exactly.
+_LEX_COMMENT = 1
+_LEX_PUNCT = 2
+_LEX_ATOM = 3
+_LEX_STRING = 4
+_LEX_INVALID = 5
+
+_lex_regex = re.compile(r'\s*(?:(;[^\n]*)|(#\(|[()\'])|([\w+*/<>?!=.\\#-]+)|("[^"]*"?)|(\S))')
+
+def skimpy_lex(t_str):
+    # Generator yielding the same tokens as skimpy_prescan, with the same line and column numbers
+    line = 1
+    line_start = 0  # Offset of the first character on the current line
+    last = 0  # Newlines are counted lazily, from the start of the previous token to the start of the next
+
+    for match in _lex_regex.finditer(t_str):
+        token_class = match.lastindex
+        if token_class == _LEX_COMMENT:
+            continue
+
+        start = match.start(token_class)
+        newlines = t_str.count('\n',last,start)
+        if newlines:
+            line += newlines
+            line_start = t_str.rindex('\n',last,start) + 1
+        last = start
+
+        if token_class == _LEX_INVALID:
+            raise SkimpyError((line,start - line_start + 1),"Invalid character: " + match.group(token_class))
+
+        text = match.group(token_class)
+        if token_class == _LEX_PUNCT:
+            yield SkimpyToken(text,line,start - line_start + 1,TokenKind.PUNCTUATION)
+        else:
+            yield SkimpyToken(text,line,start - line_start + 1)
+
 def is_atom(concrete_node):
     # In the parsed tree, a node is an atom iff it's a token
-    return isinstance(concrete_node,SkimpyToken)
+    return isinstance(concrete_node,SkimpyAtom)
+
+def is_nonleaf(concrete_node):
+    return isinstance(concrete_node,SkimpyNonleaf)
+
+def is_root(concrete_node):
+    # The root holds the top-level forms of a program
+    return concrete_node.is_root()
 
 def get_text(token):
     if not is_atom(token):
@@ -184,72 +301,62 @@ def get_text(token):
 def is_number(token):
     # Note: we do not create empty tokens as they cannot mean anything
     # Note 2: For now, boot-strap the number representation to Python's
-    if not is_atom(token):
-        return False
-
-    text = get_text(token)
-
-    # Try to convert the number to a float
-    # This stupidity arises because Python does not give feasibility predicates to go with its coercers.
-    try:
-        cf = float(text)
-        return True
-    except ValueError:
-        return False
+    return is_atom(token) and (token.kind == TokenKind.INTEGER or token.kind == TokenKind.FLOAT)
 
 def to_number(token):
-    # This wrapper around Python's str->num converter is to declare the policy for building numeric types from literals
-    token_text = get_text(token)
-    if "." in token_text:
-        return float(token_text)
-    else:
-        return int(token_text)
+    # The token was converted by the policy in classify_token when it was built
+    return token.value
 
 def is_string(token):
-    return is_atom(token) and get_text(token)[0] == '"'
+    return is_atom(token) and token.kind == TokenKind.STRING
 
 def to_python_string(token):
-    # skip the tagging quotation mark
-    return get_text(token)[1:]
+    # The tagging quotation mark is already skipped
+    return token.value
 
 def is_boolean(token):
-    text = get_text(token)
-    return text == "#f" or text == "#t"
+    return is_atom(token) and token.kind == TokenKind.BOOLEAN
 
 def to_python_boolean(token):
-    text = get_text(token)
-    if text == "#t":
-        return True
-    elif text == "#f":
-        return False
-    else:
+    if token.kind != TokenKind.BOOLEAN:
         raise ValueError('token not recognized as boolean')
+    return token.value
 
 def is_literal(token):
-    return is_atom(token) and (is_number(token) or is_string(token) or is_boolean(token))
+    return is_atom(token) and token.kind in literal_kinds
 
 def is_varname(token):
-    return is_atom(token) and not is_literal(token)
+    return is_atom(token) and token.kind == TokenKind.IDENTIFIER
+
+def is_vector_literal(concrete_node):
+    # #(...) is read as a node holding the #( token and then the elements
+    if is_atom(concrete_node) or not len(concrete_node.text):
+        return False
+    first = concrete_node.text[0]
+    return is_atom(first) and first.kind == TokenKind.PUNCTUATION and first.text == "#("
 
 def generate_subnodes(concrete_node,start = 0):
     if not is_atom(concrete_node):
-        for idx in range(start,len(concrete_node.text)):
-            yield concrete_node.text[idx]
+        subnodes = concrete_node.text
+        for idx in range(start,len(subnodes)):
+            yield subnodes[idx]
 
 def generate_subnodes_reversed(concrete_node,start = None, end = 0):
+    subnodes = concrete_node.text
     if start is None:
-        start = len(concrete_node.text) - 1
+        start = len(subnodes) - 1
     elif start < 0:  # python style
-        start = len(concrete_node.text) + start
+        start = len(subnodes) + start
         
     if not is_atom(concrete_node):
         for idx in range(start,end - 1,-1):
-            yield concrete_node.text[idx]
+            yield subnodes[idx]
 
 def get_subnode(concrete_node,index,default=None):
     if not is_atom(concrete_node):
-        if index < len(concrete_node.text) and index >= -len(concrete_node.text):
-            return concrete_node.text[index]
+        subnodes = concrete_node.text
+        if index < len(subnodes) and index >= -len(subnodes):
+            return subnodes[index]
         elif default is not None:
             return default
         else:
@@ -257,82 +364,463 @@ def get_subnode(concrete_node,index,default=None):
     else:
         raise ValueError('calling getsubnode on an atom')
 
-class SkimpyTreeBuilder(object):
-    def __init__(self):
-        self.root = SkimpyConcrNonleafNode(None,None)
-        self.node = self.root
-
-    def push(self,token):
-        self.node = SkimpyConcrNonleafNode(token.line,token.col,self.node)
-
-    def pop(self):
-        cur_node = self.node
-        self.node = cur_node.parent
-        self.node.append(cur_node)
-
-    def append(self,text):
-        self.node.append(text)
-
-# Binds all function arguments (returns a 0-argument function) but delays evaluation
-def python_bind(f,*args,**kwargs):
-    def _proc():
-        f(*args,**kwargs)
-    return _proc
-
-def skimpy_scan(t_str):
-    class ScanLevel(object):
-        def __init__(self,token,implicit=False):
-            self.implicit = implicit
-            self.token = token
-            self.count = 0
-    # We prescan cleverly, by building up a sequence of operations to perform
-    sbuilder = SkimpyTreeBuilder()
-    
-    lp_stack = []  # stack of ScanLevel objects describing the tree
-    
-    operations = []
-    for token in skimpy_prescan(t_str):
-        if token.text == "(":
-            lp_stack.append(ScanLevel(token))
-            operations.append(python_bind(sbuilder.push, token))
-        elif token.text == ")":
+class SkimpyReadLevel(object):
+    # An open parenthesis (or an implicit one for ') awaiting its closing token
+    def __init__(self,token,node,implicit=False):
+        self.token = token
+        self.node = node
+        self.implicit = implicit
+
+def skimpy_read(t_str,prescan=skimpy_lex,root=None):
+    # Streaming reader.  Builds the concrete tree directly as tokens arrive and yields every top-level node as soon as
+    # it is complete, so a caller can evaluate a form before the rest of the text has even been tokenized.
+    # Top-level nodes are parented to root (a fresh one unless given) but not appended to it -- that is up to the caller.
+    if root is None:
+        root = SkimpyConcrNonleafNode(None,None)
+
+    lp_stack = []  # stack of SkimpyReadLevel objects describing the open nodes
+    for token in prescan(t_str):
+        text = token.text
+        if text == "(":
+            parent = lp_stack[-1].node if lp_stack else root
+            lp_stack.append(SkimpyReadLevel(token,SkimpyConcrNonleafNode(token.line,token.col,parent)))
+            continue
+        elif text == "#(":
+            # A vector is read as a node whose first entry is the #( token (see is_vector_literal)
+            parent = lp_stack[-1].node if lp_stack else root
+            node = SkimpyConcrNonleafNode(token.line,token.col,parent)
+            node.append(token)
+            lp_stack.append(SkimpyReadLevel(token,node))
+            continue
+        elif text == ")":
             if not lp_stack:
                 raise SkimpyError(token,'unmatched right parenthesis')
-            lp_stack.pop()
-            operations.append(sbuilder.pop)  # Nothing to bind, pop takes no arguments
-        elif token.text == "'":
+            level = lp_stack.pop()
+            if level.implicit:
+                raise SkimpyError(level.token,'quote: missing the quoted expression')
+            node = level.node
+        elif text == "'":
             # Treat ' as (quote x).  Add an implicit parenthesis which is to be closed after one entry
-            lp_stack.append(ScanLevel(token,implicit=True))
-            operations.append(python_bind(sbuilder.push,token))
-            operations.append(python_bind(sbuilder.append,SkimpyToken("quote",token.line,token.col)))
+            parent = lp_stack[-1].node if lp_stack else root
+            node = SkimpyConcrNonleafNode(token.line,token.col,parent)
+            node.append(SkimpyToken("quote",token.line,token.col))
+            lp_stack.append(SkimpyReadLevel(token,node,implicit=True))
+            continue
+        elif text[0] == '"':
+            # Quoted text
+            if text[-1] != '"' or len(text) == 1:
+                raise SkimpyError(token,'unmatched quotation')
+            # We need to save the quotation as a prefix, because strings make up a special type
+            node = slice_token(token,0,-1)
         else:
-            if token.text and token.text[0] == '"':
-                # Quoted text
-                if token.text[-1] != '"':
-                    raise SkimpyError(token,'unmatched quotation')
-                # We need to save the quotation as a prefix, because strings make up a special type
-                operations.append(python_bind(sbuilder.append,slice_token(token,0,-1)))
-            else:
-                operations.append(python_bind(sbuilder.append,token))
-
-        # Update the level entry count.  If the token is implicit, pop again
-        if lp_stack:
-            while lp_stack[-1].implicit:
-                ccount = lp_stack[-1].count + 1
-                lp_stack[-1].count = ccount
-                if ccount > 1:
-                    lp_stack.pop()
-                    operations.append(sbuilder.pop)                    
-                else:
-                    break
+            node = token
+
+        # node is complete.  Close the implicit parentheses of any quotes waiting for it
+        while lp_stack:
+            level = lp_stack[-1]
+            level.node.append(node)
+            if not level.implicit:
+                break
+            lp_stack.pop()
+            node = level.node
+        else:
+            yield node
+
     if lp_stack:
         # Pop the token and report an error
         inparen = lp_stack.pop()
+        if inparen.implicit:
+            raise SkimpyError(inparen.token,'quote: missing the quoted expression')
         raise SkimpyError(inparen.token,'unmatched left parenthesis')
 
-    # Now let's run the functions
-    for op in operations:
-        op()
+# The compact concrete tree.
+# In the tree above every token is an object with a __dict__ and its own copy of the text, and every node carries a
+# list and a parent pointer.  For large sources that is several times the size of the text itself.  In compact mode
+# the whole tree is a SkimpySourceTable of parallel arrays:
+#   tokens -- start offset, end offset and kind of each token
+#   nodes -- the offset where the node opens and the range of its entries in the subnode column
+#   subnodes -- one entry per subnode: a token row, or the complement (~row) of a node row
+# Text and values are sliced out of the source, and line and column are computed, only on request.  The objects the
+# accessor functions return are small views over a row, made as they are asked for.
+# The accessor functions in this module work the same on both trees.
+
+_kinds_by_value = dict((kind.value,kind) for kind in TokenKind)
+
+# The compact reader also reads bytes-like sources, above all a file mapped into memory (see map_source), which it
+# scans in place.  Such a source is taken to be UTF-8.  Multibyte characters are allowed in comments and quotations,
+# and in identifiers as long as they are alphanumeric.
+# Whitespace is what str.isspace() accepts, as for text: the ASCII characters, and the UTF-8 encodings of the others
+# (U+0085, U+00A0, U+1680, U+2000-U+200A, U+2028, U+2029, U+202F, U+205F and U+3000).  A multibyte space begins with a
+# lead byte, so looking ahead for one at each non-ASCII byte of an identifier cannot split a character
+_bytes_space = rb'(?:[ \t\n\r\f\v\x1c-\x1f]|\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)'
+_bytes_lex_regex = re.compile(_bytes_space + rb'*(?:(;[^\n]*)|(#\(|[()\'])|((?:[\w+*/<>?!=.\\#-]|(?!' + _bytes_space +
+                              rb')[\x80-\xff])+)|("[^"]*"?)|((?!' + _bytes_space + rb')[^ \t\n\r\f\v\x1c-\x1f]))')
+_atom_regex = re.compile(r'[\w+*/<>?!=.\\#-]+')
+
+class SkimpySourceTable(object):
+    __slots__ = ('source','filename','starts','ends','kinds','node_offsets','node_firsts','node_counts','subnodes',
+                 'line_starts')
+
+    def __init__(self,source,filename=None):
+        # filename is given if source is the mapped or read contents of that file
+        self.source = source
+        self.filename = filename
+        self.starts = array('l')
+        self.ends = array('l')
+        self.kinds = array('b')
+        self.node_offsets = array('l')
+        self.node_firsts = array('l')
+        self.node_counts = array('l')
+        self.subnodes = array('l')
+        self.line_starts = None  # Offsets where lines begin, built the first time a position is requested
+
+    def __getstate__(self):
+        # A table read from a file is pickled without its source, which is mapped again when it is unpickled
+        state = dict((slot,getattr(self,slot)) for slot in self.__slots__)
+        state['line_starts'] = None
+        if self.filename is not None:
+            state['source'] = None
+        elif not isinstance(self.source,str):
+            state['source'] = bytes(self.source)
+        return state
+
+    def __setstate__(self,state):
+        for slot,value in state.items():
+            setattr(self,slot,value)
+        if self.source is None:
+            self.source = map_source(self.filename)
+
+    def add_token(self,start,end,kind):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.kinds.append(kind.value)
+        return len(self.kinds) - 1
+
+    def add_node(self,offset,entries):
+        self.node_offsets.append(offset)
+        self.node_firsts.append(len(self.subnodes))
+        self.node_counts.append(len(entries))
+        self.subnodes.extend(entries)
+        return len(self.node_offsets) - 1
+
+    def get_text(self,index):
+        start = self.starts[index]
+        end = self.ends[index]
+        if start == end:
+            # The only token with no text of its own is the implicit one that ' stands for
+            return "quote"
+        text = self.source[start:end]
+        return text if text.__class__ is str else text.decode('utf-8')
+
+    def get_kind(self,index):
+        return _kinds_by_value[self.kinds[index]]
+
+    def get_value(self,index):
+        return classify_token(self.get_text(index))[1]
+
+    def get_subnode(self,entry):
+        if entry >= 0:
+            return SkimpyCompactToken(self,entry)
+        return SkimpyCompactNode(self,~entry)
+
+    def get_position(self,offset):
+        # (line, column) of an offset into the source
+        binary = not isinstance(self.source,str)
+        if self.line_starts is None:
+            line_end = b'\n' if binary else '\n'
+            line_starts = array('l',[0])
+            newline = self.source.find(line_end)
+            while newline >= 0:
+                line_starts.append(newline + 1)
+                newline = self.source.find(line_end,newline + 1)
+            self.line_starts = line_starts
+
+        line = bisect.bisect_right(self.line_starts,offset)
+        line_start = self.line_starts[line - 1]
+        if binary:
+            # Offsets count bytes, columns count characters
+            return (line,len(self.source[line_start:offset].decode('utf-8','replace')) + 1)
+        return (line,offset - line_start + 1)
+
+class SkimpyCompactToken(SkimpyAtom):
+    __slots__ = ('table','index')
+
+    def __init__(self,table,index):
+        self.table = table
+        self.index = index
+
+    @property
+    def text(self):
+        return self.table.get_text(self.index)
+
+    @property
+    def kind(self):
+        return self.table.get_kind(self.index)
+
+    @property
+    def value(self):
+        return self.table.get_value(self.index)
+
+    @property
+    def line(self):
+        return self.table.get_position(self.table.starts[self.index])[0]
+
+    @property
+    def col(self):
+        return self.table.get_position(self.table.starts[self.index])[1]
+
+class SkimpyCompactSubnodes(object):
+    # The text of a compact node, seen as a sequence
+    __slots__ = ('table','first','count')
+
+    def __init__(self,table,first,count):
+        self.table = table
+        self.first = first
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self,index):
+        if index < 0:
+            index += self.count
+        if index < 0 or index >= self.count:
+            raise IndexError('compact node index out of range')
+        return self.table.get_subnode(self.table.subnodes[self.first + index])
+
+class SkimpyCompactNode(SkimpyNonleaf):
+    __slots__ = ('table','row')
+
+    def __init__(self,table,row):
+        self.table = table
+        self.row = row
+
+    @property
+    def text(self):
+        return SkimpyCompactSubnodes(self.table,self.table.node_firsts[self.row],self.table.node_counts[self.row])
+
+    @property
+    def line(self):
+        offset = self.table.node_offsets[self.row]
+        return self.table.get_position(offset)[0] if offset >= 0 else None
+
+    @property
+    def col(self):
+        offset = self.table.node_offsets[self.row]
+        return self.table.get_position(offset)[1] if offset >= 0 else None
+
+    def is_root(self):
+        return self.table.node_offsets[self.row] < 0
+
+def get_compact_entry(concrete_node):
+    # The entry standing for a compact token or node in the subnode column of its table
+    if isinstance(concrete_node,SkimpyCompactToken):
+        return concrete_node.index
+    return ~concrete_node.row
+
+def map_source(filename):
+    # The contents of filename, mapped into memory for the compact reader
+    with open(filename,'rb') as source_file:
+        try:
+            return mmap.mmap(source_file.fileno(),0,access=mmap.ACCESS_READ)
+        except ValueError:
+            return b""  # An empty file cannot be mapped
+
+def skimpy_read_compact(t_str,table=None,begin=0,end=None):
+    # The streaming reader of skimpy_read, building a compact tree in table (a fresh one for t_str unless given)
+    # t_str is text, or a bytes-like object holding UTF-8 text.  Only t_str[begin:end] is read, but offsets are
+    # always into the whole of t_str
+    if end is None:
+        end = len(t_str)
+    if table is None:
+        table = SkimpySourceTable(t_str)
+
+    if isinstance(t_str,str):
+        lex_regex = _lex_regex
+        lparen,rparen,quotation,vector_open = "(",")",'"',"#("
+    else:
+        lex_regex = _bytes_lex_regex
+        lparen,rparen,quotation,vector_open = b"(",b")",b'"',b"#("
+
+    lp_stack = []  # SkimpyReadLevel objects: the offset of the opening character and the list of entries
+    for match in lex_regex.finditer(t_str,begin,end):
+        token_class = match.lastindex
+        if token_class == _LEX_COMMENT:
+            continue
+
+        start = match.start(token_class)
+        if token_class == _LEX_PUNCT:
+            ch = match.group(token_class)
+            if ch == lparen:
+                lp_stack.append(SkimpyReadLevel(start,[]))
+                continue
+            elif ch == vector_open:
+                lp_stack.append(SkimpyReadLevel(start,[table.add_token(start,start + 2,TokenKind.PUNCTUATION)]))
+                continue
+            elif ch == rparen:
+                if not lp_stack:
+                    raise SkimpyError(table.get_position(start),'unmatched right parenthesis')
+                level = lp_stack.pop()
+                if level.implicit:
+                    raise SkimpyError(table.get_position(level.token),'quote: missing the quoted expression')
+                entry = ~table.add_node(level.token,level.node)
+            else:
+                # Treat ' as (quote x), with an empty token at the ' standing for quote
+                lp_stack.append(SkimpyReadLevel(start,[table.add_token(start,start,TokenKind.IDENTIFIER)],implicit=True))
+                continue
+        elif token_class == _LEX_ATOM:
+            text = match.group(token_class)
+            if text.__class__ is not str:
+                text = decode_atom(table,start,text)
+            entry = table.add_token(start,match.end(),classify_token(text)[0])
+        elif token_class == _LEX_STRING:
+            stop = match.end()
+            if stop - start == 1 or match.group(token_class)[-1:] != quotation:
+                raise SkimpyError(table.get_position(start),'unmatched quotation')
+            # As in skimpy_read, the token keeps the opening quotation mark as a prefix
+            entry = table.add_token(start,stop - 1,TokenKind.STRING)
+        else:
+            invalid = match.group(token_class)
+            if invalid.__class__ is not str:
+                invalid = t_str[start:start + 4].decode('utf-8','replace')[0]
+            raise SkimpyError(table.get_position(start),"Invalid character: " + invalid)
+
+        # The entry is complete.  Close the implicit parentheses of any quotes waiting for it
+        while lp_stack:
+            level = lp_stack[-1]
+            level.node.append(entry)
+            if not level.implicit:
+                break
+            lp_stack.pop()
+            entry = ~table.add_node(level.token,level.node)
+        else:
+            yield table.get_subnode(entry)
+
+    if lp_stack:
+        inparen = lp_stack.pop()
+        if inparen.implicit:
+            raise SkimpyError(table.get_position(inparen.token),'quote: missing the quoted expression')
+        raise SkimpyError(table.get_position(inparen.token),'unmatched left parenthesis')
+
+def decode_atom(table,start,text):
+    # The text of an identifier or number read from a bytes-like source.  Only the ASCII characters are checked by
+    # the lexer, so check the others here
+    if text.isascii():
+        return text.decode('ascii')
+    try:
+        decoded = text.decode('utf-8')
+    except UnicodeDecodeError as decode_error:
+        raise SkimpyError(table.get_position(start + decode_error.start),'invalid UTF-8 text')
+    if _atom_regex.fullmatch(decoded) is None:
+        for idx,ch in enumerate(decoded):
+            if _atom_regex.match(ch) is None:
+                raise SkimpyError(table.get_position(start + len(decoded[:idx].encode('utf-8'))),"Invalid character: " + ch)
+    return decoded
+
+def skimpy_scan(t_str,prescan=skimpy_lex,compact=False):
+    # Read the entire text.  The result is the root node of the tree, holding the top-level nodes
+    if compact:
+        table = SkimpySourceTable(t_str)
+        entries = [get_compact_entry(node) for node in skimpy_read_compact(t_str,table)]
+        return SkimpyCompactNode(table,table.add_node(-1,entries))
+
+    root = SkimpyConcrNonleafNode(None,None)
+    for node in skimpy_read(t_str,prescan,root):
+        root.append(node)
+
+    return root
+
+# Parallel reading.
+# The text is cut after top-level forms into about equal chunks, which a pool of processes reads independently.
+# Finding the cuts needs only the parentheses, quotations and comments, which one regular expression picks out.
+# Only the compact tree is read in parallel: its columns travel between processes as flat arrays, and stitching
+# them is a matter of shifting row numbers.  (A regular tree of objects costs more to pickle and unpickle than to
+# read.)  Every process reads its chunk in place in the whole text, so offsets, and with them lines and columns,
+# need no correction: the stitched table is exactly the sequential one.
+_boundary_regex = re.compile(r'[()]|"[^"]*"?|;[^\n]*')
+_bytes_boundary_regex = re.compile(rb'[()]|"[^"]*"?|;[^\n]*')
+
+parallel_min_chunk = 1 << 16  # Chunks smaller than this are not worth a process
+
+def find_chunks(t_str,n_chunks):
+    # Offsets cutting t_str into at most n_chunks pieces, each ending after a top-level form, as a list
+    # [0, cut, ..., len(t_str)].  None if the parentheses do not balance (the sequential reader reports the error).
+    boundary_regex = _boundary_regex if isinstance(t_str,str) else _bytes_boundary_regex
+    lparen,rparen = ("(",")") if isinstance(t_str,str) else (b"(",b")")
+    target = max(len(t_str) // n_chunks,1)
+
+    cuts = [0]
+    depth = 0
+    for match in boundary_regex.finditer(t_str):
+        text = match.group()
+        if text == lparen:
+            depth += 1
+        elif text == rparen:
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0 and match.end() - cuts[-1] >= target:
+                cuts.append(match.end())
+    if depth != 0:
+        return None
 
-    # The result is the root node in the tree.  We know it's the root because the parentheses matched
-    return sbuilder.node
+    if cuts[-1] != len(t_str):
+        cuts.append(len(t_str))
+    return cuts
+
+# The source a pool process reads its chunks from, set once when the process starts
+_chunk_source = None
+
+def _init_chunk_reader(source,filename):
+    # A source read from a file is mapped again, so that neither a mapping nor a copy of the text is passed over
+    global _chunk_source
+    _chunk_source = map_source(filename) if filename is not None else source
+
+def _read_chunk(bounds):
+    # Runs in a pool process.  Returns the columns of the table for one chunk and its top-level entries
+    begin,end = bounds
+    table = SkimpySourceTable(_chunk_source)
+    entries = [get_compact_entry(node) for node in skimpy_read_compact(_chunk_source,table,begin,end)]
+    return (table.starts,table.ends,table.kinds,table.node_offsets,table.node_firsts,table.node_counts,
+            table.subnodes,entries)
+
+def merge_compact_chunk(table,columns):
+    # Append the columns of a chunk table to table.  Returns the top-level entries
+    # Offsets are already into the whole text; only row numbers need shifting
+    starts,ends,kinds,node_offsets,node_firsts,node_counts,subnodes,entries = columns
+    token_base = len(table.kinds)
+    node_base = len(table.node_offsets)
+    subnode_base = len(table.subnodes)
+
+    table.starts.extend(starts)
+    table.ends.extend(ends)
+    table.kinds.extend(kinds)
+    table.node_offsets.extend(node_offsets)
+    table.node_firsts.extend([first + subnode_base for first in node_firsts])
+    table.node_counts.extend(node_counts)
+    # A node entry ~row becomes ~(row + node_base), which is entry - node_base
+    table.subnodes.extend([entry + token_base if entry >= 0 else entry - node_base for entry in subnodes])
+    return [entry + token_base if entry >= 0 else entry - node_base for entry in entries]
+
+def skimpy_scan_parallel(t_str,processes=None,table=None):
+    # skimpy_scan(t_str,compact=True), with the chunks of t_str read in a pool of processes (by default, one per CPU)
+    # t_str may be bytes-like, as for skimpy_read_compact.  The tree is built in table if given
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if table is None:
+        table = SkimpySourceTable(t_str)
+
+    n_chunks = min(processes * 4,len(t_str) // parallel_min_chunk)
+    cuts = find_chunks(t_str,n_chunks) if processes > 1 and n_chunks > 1 else None
+    if cuts is None:
+        entries = [get_compact_entry(node) for node in skimpy_read_compact(t_str,table)]
+        return SkimpyCompactNode(table,table.add_node(-1,entries))
+
+    source = t_str if table.filename is None else None
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes,initializer=_init_chunk_reader,
+                                                initargs=(source,table.filename)) as executor:
+        entries = []
+        for columns in executor.map(_read_chunk,zip(cuts,cuts[1:])):
+            entries.extend(merge_compact_chunk(table,columns))
+
+    return SkimpyCompactNode(table,table.add_node(-1,entries))
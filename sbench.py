@@ -0,0 +1,555 @@
+import parse
+import sdata
+import seval
+import sloop
+import svm
+import sys
+import time
+import gc
+import tracemalloc
+import os
+
+# Benchmarks for the interpreter.  Run as
+#   python sbench.py [name ...]
+# with no names to run them all.  Each benchmark prints its own table of timings.
+
+benchmarks = {}
+
+def benchmark(f):
+    # Register f under its name without the bench_ prefix
+    benchmarks[f.__name__[len('bench_'):]] = f
+    return f
+
+def timed(f,*args,repeat=3,**kwargs):
+    # (seconds, result) of the best of repeat calls of f
+    best = None
+    for trial in range(repeat):
+        start = time.perf_counter()
+        result = f(*args,**kwargs)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best,result
+
+def report(label,seconds,baseline=None):
+    line = '  {:<40} {:>10.4f}s'.format(label,seconds)
+    if baseline is not None:
+        line += '  x{:.2f}'.format(baseline / seconds)
+    print(line)
+
+def make_data_source(rows):
+    # A generated source of the kind that is big and flat: a quoted data table of top-level defines
+    return "".join("(define row%d '(%d %d.5 \"name %d\" sym-%d (a b c) #t))\n" % (i,i,i,i,i) for i in range(rows))
+
+@benchmark
+def bench_parse_parallel():
+    # Scaling of the parallel reader with the number of processes.  On a machine with fewer CPUs than processes
+    # the extra processes only add overhead.
+    text = make_data_source(50000)
+    print('parse_parallel: {} characters, {} CPUs'.format(len(text),os.cpu_count()))
+
+    sequential,tree = timed(parse.skimpy_scan,text,compact=True,repeat=1)
+    report('sequential',sequential)
+    for processes in [2,4,8]:
+        seconds,tree = timed(parse.skimpy_scan_parallel,text,processes=processes,repeat=1)
+        report('{} processes'.format(processes),seconds,sequential)
+
+def run_program(text,evaluator="recursive"):
+    # The value of the last form of text, evaluated in a fresh global environment
+    env = sloop.prepare()
+    evaluate = seval.evaluators[evaluator]
+    result = None
+    for form in parse.skimpy_read(text):
+        result = evaluate(form,env)
+    return result
+
+fib_source = """
+(define (fib n) (if (< n 2) n (+ (fib (+ n -1)) (fib (+ n -2)))))
+(fib 18)
+"""
+
+@benchmark
+def bench_compiled():
+    # The closure compiler against the recursive and explicit evaluators on recursive numeric code
+    print('compiled: (fib 18)')
+    baseline,result = timed(run_program,fib_source,"recursive",repeat=1)
+    report('recursive',baseline)
+    for evaluator in ["explicit","compiled","vm"]:
+        seconds,other = timed(run_program,fib_source,evaluator,repeat=1)
+        assert str(other) == str(result)
+        report(evaluator,seconds,baseline)
+
+nested_source = """
+(define (deep n)
+  (let ((a 1)) (let ((b 2)) (let ((c 3)) (let ((d 4))
+    (define (loop i acc) (if (= i 0) acc (loop (+ i -1) (+ acc a b c d))))
+    (loop n 0))))))
+(deep 20000)
+"""
+
+@benchmark
+def bench_nested_lookup():
+    # Variables captured from several frames out, on each evaluator
+    print('nested_lookup: (deep 20000)')
+    for evaluator in ["recursive","explicit","compiled"]:
+        seconds,result = timed(run_program,nested_source,evaluator,repeat=1)
+        report(evaluator,seconds)
+
+closures_source = """
+(define (make-adder n) (lambda (x) (+ x n)))
+(define (loop i acc) (if (= i 0) acc (loop (+ i -1) ((make-adder i) acc))))
+(loop 20000 0)
+"""
+
+@benchmark
+def bench_closures():
+    # Procedures made in a loop from one lambda, which share its translated body
+    print('closures: 20000 adders')
+    for evaluator in ["recursive","explicit","compiled"]:
+        seval.reset_lambda_stats()
+        seconds,result = timed(run_program,closures_source,evaluator,repeat=1)
+        report(evaluator,seconds)
+    print('  {}'.format(seval.get_lambda_stats()))
+
+loops_source = """
+(define (count-down n) (if (= n 0) 'done (count-down (+ n -1))))
+(define (even? n) (if (= n 0) #t (odd? (+ n -1))))
+(define (odd? n) (if (= n 0) #f (even? (+ n -1))))
+(define (state-a n) (cond ((= n 0) 'a) (else (state-b (+ n -1)))))
+(define (state-b n) (and #t (or #f (begin (state-c (+ n -1))))))
+(define (state-c n) (let ((m n)) (state-a m)))
+"""
+
+@benchmark
+def bench_deep_loops():
+    # Loops of 10^5 calls in tail position: a procedure calling itself, mutual recursion, and a state machine
+    # whose calls are in tail position through cond, and, or, begin and let.  Each runs in constant Python stack
+    print('deep_loops: 100000 iterations')
+    for call in ["(count-down 100000)","(even? 100000)","(state-a 100000)"]:
+        for evaluator in ["recursive","explicit","compiled"]:
+            seconds,result = timed(run_program,loops_source + call,evaluator,repeat=1)
+            report('{} {}'.format(call,evaluator),seconds)
+
+count_source = """
+(define (count n) (if (= n 0) 0 (+ 1 (count (+ n -1)))))
+"""
+
+@benchmark
+def bench_hybrid():
+    # The hybrid evaluator against the recursive one on shallow code, where it should cost nothing, and on recursion
+    # too deep for the recursive one
+    print('hybrid: (fib 18), then (count n)')
+    baseline,result = timed(run_program,fib_source,"recursive",repeat=1)
+    report('(fib 18) recursive',baseline)
+    seconds,result = timed(run_program,fib_source,"hybrid",repeat=1)
+    report('(fib 18) hybrid',seconds,baseline)
+
+    for n in [10000,1000000]:
+        call = "(count {})".format(n)
+        for evaluator in ["recursive","explicit","hybrid"]:
+            if evaluator == "explicit" and n > 10000:
+                continue  # As hybrid but for the first levels
+            seval.handovers = 0
+            try:
+                seconds,result = timed(run_program,count_source + call,evaluator,repeat=1)
+            except RecursionError:
+                print('  {:<40} RecursionError'.format(call + ' ' + evaluator))
+                continue
+            report('{} {}'.format(call,evaluator),seconds)
+        print('  handovers: {}'.format(seval.handovers))
+
+arith_source = """
+(define (sum-squares i acc) (if (= i 0) acc (sum-squares (+ i -1) (+ acc (* i i) (remainder i 7)))))
+(sum-squares 30000 0)
+"""
+
+@benchmark
+def bench_primitives():
+    # Calls of builtins through PythonProc.apply against an invoker cached at the call site, and an arithmetic loop
+    # on each evaluator
+    print('primitives: 10^5 calls of + on two numbers, then (sum-squares 30000 0)')
+    env = sloop.prepare()
+    plus = env.find('+')
+    values = [sdata.SkimpyNumber(1),sdata.SkimpyNumber(2)]
+    site = sdata.CallSite()
+
+    def call_apply():
+        for i in range(100000):
+            plus.apply(None,env,None,values)
+
+    def call_site():
+        for i in range(100000):
+            site.call(plus,None,env,values)
+
+    baseline,result = timed(call_apply)
+    report('PythonProc.apply',baseline)
+    seconds,result = timed(call_site)
+    report('CallSite.call',seconds,baseline)
+
+    for evaluator in ["recursive","explicit","compiled","vm"]:
+        seconds,result = timed(run_program,arith_source,evaluator,repeat=1)
+        report(evaluator,seconds)
+
+@benchmark
+def bench_unboxed():
+    # (fib 18) with numbers boxed in SkimpyNumbers and unboxed, with the boxes made for each call of fib
+    print('unboxed: (fib 18), {} calls of fib'.format(fib_calls(18)))
+    made = [0]
+    box_init = sdata.SkimpyNumber.__init__
+    def counting_init(self,value):
+        made[0] += 1
+        box_init(self,value)
+
+    for evaluator in ["recursive","compiled","vm"]:
+        baseline = None
+        for unboxed in [False,True]:
+            sdata.unboxed_numbers = unboxed
+            made[0] = 0
+            sdata.SkimpyNumber.__init__ = counting_init
+            try:
+                run_program(fib_source,evaluator)
+            finally:
+                sdata.SkimpyNumber.__init__ = box_init
+            boxes = made[0]
+
+            seconds,result = timed(run_program,fib_source,evaluator)
+            sdata.unboxed_numbers = False
+            label = '{} {}, {:.2f} boxes per call'.format(evaluator,'unboxed' if unboxed else 'boxed',boxes / fib_calls(18))
+            report(label,seconds,baseline)
+            baseline = baseline or seconds
+
+def fib_calls(n):
+    # The number of calls (fib n) makes
+    return 1 if n < 2 else 1 + fib_calls(n - 1) + fib_calls(n - 2)
+
+numeric_calls = [('+',[1,2]),('+',[1,2,3]),('-',[5,2]),('-',[5]),('*',[3,4]),('/',[1,4]),
+                 ('<',[1,2]),('<',[1,2,3]),('<',[3,1,2]),('=',[1,1]),('>=',[2,1]),
+                 ('fx+',[1,2]),('fx-',[5,2]),('fx*',[3,4]),('fx<',[1,2]),('fx=',[1,1]),
+                 ('fl+',[1.0,2.0]),('fl*',[3.0,4.0]),('fl/',[1.0,4.0]),('fl<',[1.0,2.0])]
+
+numeric_loop_source = """
+(define (generic i acc) (if (= i 0) acc (generic (- i 1) (+ acc (* i 2)))))
+(define (fixnum i acc) (if (fx= i 0) acc (fixnum (fx- i 1) (fx+ acc (fx* i 2)))))
+"""
+
+@benchmark
+def bench_numeric():
+    # Each numeric primitive called 10^5 times through a call site, as the evaluators call it, with boxed and unboxed
+    # numbers; then a loop of generic arithmetic against the same loop in fixnum operations
+    print('numeric: 10^5 calls of each primitive, boxed and unboxed')
+    for unboxed in [False,True]:
+        sdata.unboxed_numbers = unboxed
+        env = sloop.prepare()
+        for name,args in numeric_calls:
+            proc = env.find(name)
+            values = [sdata.make_number(arg) for arg in args]
+            site = sdata.CallSite()
+
+            def call_site():
+                for i in range(100000):
+                    site.call(proc,None,env,values)
+
+            seconds,result = timed(call_site)
+            report('({} {}) {}'.format(name,' '.join(str(arg) for arg in args),'unboxed' if unboxed else 'boxed'),seconds)
+    sdata.unboxed_numbers = False
+
+    print('numeric: (generic 30000 0) against (fixnum 30000 0)')
+    for evaluator in ["compiled","vm"]:
+        baseline,result = timed(run_program,numeric_loop_source + "(generic 30000 0)",evaluator,repeat=1)
+        report('generic ' + evaluator,baseline)
+        seconds,other = timed(run_program,numeric_loop_source + "(fixnum 30000 0)",evaluator,repeat=1)
+        assert str(other) == str(result)
+        report('fixnum ' + evaluator,seconds,baseline)
+
+def traced_bytes(f):
+    # (bytes still allocated after f returns, what f returned).  The result is kept alive while it is measured
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = f()
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0] - before,result
+    finally:
+        tracemalloc.stop()
+
+def count_forms(form):
+    count = 0
+    stack = [form]
+    while stack:
+        current = stack.pop()
+        count += 1
+        if current.subnode_values:
+            stack.extend(current.subnode_values)
+    return count
+
+def slot_fields(cls):
+    return [slot for klass in cls.__mro__ for slot in klass.__dict__.get('__slots__',())]
+
+def is_slotted(value):
+    # An object of one of the interpreter's own classes, which all have __slots__
+    return type(value).__module__ in ('sdata','senv','seval','serror') and hasattr(type(value),'__slots__')
+
+def reachable_objects(roots,shared=()):
+    # The objects of the interpreter's classes reachable from roots through their fields, lists and dictionaries,
+    # leaving out those reachable from shared
+    seen = set()
+    found = []
+    for walk_roots,keep in [(shared,False),(roots,True)]:
+        stack = list(walk_roots)
+        while stack:
+            value = stack.pop()
+            if id(value) in seen:
+                continue
+            if is_slotted(value):
+                seen.add(id(value))
+                if keep:
+                    found.append(value)
+                stack.extend(getattr(value,field) for field in slot_fields(type(value)) if hasattr(value,field))
+            elif isinstance(value,(list,tuple)):
+                seen.add(id(value))
+                stack.extend(value)
+            elif isinstance(value,dict):
+                seen.add(id(value))
+                stack.extend(value.values())
+    return found
+
+dict_classes = {}
+
+def dict_overhead(sample,n=2000):
+    # Bytes an object of a plain class, with the fields of sample in its __dict__ as before the classes had
+    # __slots__, takes over an object of sample's own class.  Both share sample's field values
+    cls = type(sample)
+    if cls not in dict_classes:
+        dict_classes[cls] = type(cls.__name__,(object,),{})
+    fields = [(field,getattr(sample,field)) for field in slot_fields(cls) if hasattr(sample,field)]
+
+    def make(make_object):
+        objects = []
+        for i in range(n):
+            copy = make_object()
+            for field,value in fields:
+                setattr(copy,field,value)
+            objects.append(copy)
+        return objects
+
+    with_dict,result = traced_bytes(lambda: make(dict_classes[cls]))
+    with_slots,result = traced_bytes(lambda: make(lambda: object.__new__(cls)))
+    return (with_dict - with_slots) / n
+
+def dict_bytes(size,objects):
+    # What size, the bytes taken by objects and what they hold, would be if every object had a __dict__
+    samples = {}
+    for value in objects:
+        samples.setdefault(type(value),[value,0])[1] += 1
+    return size + sum(dict_overhead(sample) * count for sample,count in samples.values())
+
+@benchmark
+def bench_memory():
+    # Bytes per cons cell, per closure and per translated form, as the program keeps them.  The classes always have
+    # __slots__, so the __dict__ column is measured on plain copies of the same objects: what each would take over
+    # its slotted object is added to what the slotted structure takes
+    print('memory: bytes per object')
+    print('  {:<40} {:>10} {:>10}'.format('','__dict__','__slots__'))
+    element = sdata.SkimpyNumber(1)
+
+    def build_list():
+        lst = sdata.the_empty_list
+        for i in range(100000):
+            lst = sdata.SkimpyPair(element,lst)
+        return lst
+
+    size,result = traced_bytes(build_list)
+    report_bytes('cons cell',dict_bytes(size,reachable_objects([result],[element,sdata.the_empty_list])),size,100000)
+
+    env = sloop.prepare()
+    run_program_in("(define (make-adder n) (lambda (x) (+ x n)))",env)
+    make_adder = env.find('make-adder')
+    arg = [element]
+
+    def make_closures():
+        return [make_adder.apply(None,env,None,arg) for i in range(20000)]
+
+    size,result = traced_bytes(make_closures)
+    report_bytes('closure, with the frame it closes over',
+                 dict_bytes(size,reachable_objects(result,[env,make_adder,element])),size,20000)
+
+    text = "".join("(define (f{0} n) (if (< n 2) n (+ (f{0} (- n 1)) (* n {0}))))\n".format(i) for i in range(2000))
+
+    def translate_all():
+        # The concrete tree is garbage once it is translated, unless the forms keep it
+        return [seval.preprocess(node) for node in parse.skimpy_read(text)]
+
+    size,forms = traced_bytes(translate_all)
+    report_bytes('translated form',dict_bytes(size,reachable_objects(forms)),size,
+                 sum(count_forms(form) for form in forms))
+
+def report_bytes(label,dict_size,slots_size,count):
+    print('  {:<40} {:>10.1f} {:>10.1f} bytes'.format(label,dict_size / count,slots_size / count))
+
+def run_program_in(text,env,evaluator="recursive"):
+    evaluate = seval.evaluators[evaluator]
+    for form in parse.skimpy_read(text):
+        evaluate(form,env)
+
+def build_list(n,element):
+    builder = sdata.list_builder()
+    builder.send(None)
+    for i in range(n):
+        builder.send(element)
+    try:
+        builder.send(None)
+    except StopIteration as result:
+        return result.value
+
+@benchmark
+def bench_arena():
+    # A list of a million elements from the list builder, with a pair object for each element and in an arena:
+    # building, traversing and printing it, the memory it takes, and a full collection while it is alive
+    n = 1000000
+    print('arena: a list of {} elements'.format(n))
+    element = sdata.SkimpyNumber(1)
+    for arena in [False,True]:
+        sdata.arena_pairs = arena
+        label = 'arena' if arena else 'objects'
+        try:
+            seconds,lst = timed(build_list,n,element,repeat=1)
+            report('build, ' + label,seconds)
+            seconds,count = timed(lambda: sum(1 for value in sdata.lister(lst)),repeat=1)
+            report('traverse, ' + label,seconds)
+            seconds,text = timed(str,lst,repeat=1)
+            report('print, ' + label,seconds)
+            seconds,collected = timed(gc.collect)
+            report('gc.collect with the list alive, ' + label,seconds)
+            lst = None
+            size,lst = traced_bytes(lambda: build_list(n,element))
+            report_bytes('per element, ' + label,size / n)
+            lst = None
+        finally:
+            sdata.arena_pairs = False
+
+lists_prelude = """
+(define (iota n) (define (loop i acc) (if (= i 0) acc (loop (- i 1) (cons (- i 1) acc)))) (loop n '()))
+(define data (iota 2000))
+(define pairs (map (lambda (x) (cons x x)) data))
+(define (s-length l) (if (null? l) 0 (+ 1 (s-length (cdr l)))))
+(define (s-append a b) (if (null? a) b (cons (car a) (s-append (cdr a) b))))
+(define (s-reverse l) (define (loop l acc) (if (null? l) acc (loop (cdr l) (cons (car l) acc)))) (loop l '()))
+(define (s-list-tail l k) (if (= k 0) l (s-list-tail (cdr l) (- k 1))))
+(define (s-list-ref l k) (car (s-list-tail l k)))
+(define (s-last-pair l) (if (null? (cdr l)) l (s-last-pair (cdr l))))
+(define (s-member x l) (cond ((null? l) #f) ((equal? x (car l)) l) (else (s-member x (cdr l)))))
+(define (s-assoc x l) (cond ((null? l) #f) ((equal? x (car (car l))) (car l)) (else (s-assoc x (cdr l)))))
+(define (s-filter p l)
+  (cond ((null? l) '()) ((p (car l)) (cons (car l) (s-filter p (cdr l)))) (else (s-filter p (cdr l)))))
+(define (s-fold-left f acc l) (if (null? l) acc (s-fold-left f (f acc (car l)) (cdr l))))
+(define (s-fold-right f acc l) (if (null? l) acc (f (car l) (s-fold-right f acc (cdr l)))))
+(define (s-for-each f l) (if (null? l) #t (begin (f (car l)) (s-for-each f (cdr l)))))
+(define (s-map2 f a b) (if (or (null? a) (null? b)) '() (cons (f (car a) (car b)) (s-map2 f (cdr a) (cdr b)))))
+(define (s-sort l less?)
+  (define (merge a b)
+    (cond ((null? a) b) ((null? b) a)
+          ((less? (car b) (car a)) (cons (car b) (merge a (cdr b))))
+          (else (cons (car a) (merge (cdr a) b)))))
+  (define (take-odd l) (if (null? l) '() (cons (car l) (take-even (cdr l)))))
+  (define (take-even l) (if (null? l) '() (take-odd (cdr l))))
+  (if (or (null? l) (null? (cdr l))) l (merge (s-sort (take-odd l) less?) (s-sort (take-even l) less?))))
+(define shuffled (map (lambda (x) (remainder (* x 7919) 2003)) data))
+"""
+
+# (primitive, native call, the same in Scheme) on lists of 2000 elements
+list_calls = [('length',"(length data)","(s-length data)"),
+              ('append',"(append data data)","(s-append data data)"),
+              ('reverse',"(reverse data)","(s-reverse data)"),
+              ('list-tail',"(list-tail data 1999)","(s-list-tail data 1999)"),
+              ('list-ref',"(list-ref data 1999)","(s-list-ref data 1999)"),
+              ('last-pair',"(last-pair data)","(s-last-pair data)"),
+              ('member',"(member 1999 data)","(s-member 1999 data)"),
+              ('assoc',"(assoc 1999 pairs)","(s-assoc 1999 pairs)"),
+              ('filter',"(filter (lambda (x) (< x 1000)) data)","(s-filter (lambda (x) (< x 1000)) data)"),
+              ('fold-left',"(fold-left + 0 data)","(s-fold-left + 0 data)"),
+              ('fold-right',"(fold-right cons '() data)","(s-fold-right cons '() data)"),
+              ('for-each',"(for-each car pairs)","(s-for-each car pairs)"),
+              ('apply',"(apply + data)","(s-fold-left + 0 data)"),
+              ('map, two lists',"(map + data data)","(s-map2 + data data)"),
+              ('sort',"(sort shuffled <)","(s-sort shuffled <)")]
+
+@benchmark
+def bench_lists():
+    # Each native list primitive against the same operation written in Scheme, on the explicit evaluator (whose
+    # depth is unlimited, for the Scheme versions that are not tail recursive)
+    print('lists: native primitives against Scheme, lists of 2000 elements')
+    env = sloop.prepare()
+    evaluate = seval.evaluators["explicit"]
+    run_program_in(lists_prelude,env,"explicit")
+    for name,native,scheme in list_calls:
+        native_form = seval.preprocess(next(parse.skimpy_read(native)))
+        scheme_form = seval.preprocess(next(parse.skimpy_read(scheme)))
+        baseline,expected = timed(evaluate,scheme_form,env)
+        seconds,result = timed(evaluate,native_form,env)
+        assert str(result) == str(expected) or name == 'for-each',name
+        report(name,seconds,baseline)
+
+tables_prelude = """
+(define (iota n) (define (loop i acc) (if (= i 0) acc (loop (- i 1) (cons (- i 1) acc)))) (loop n '()))
+(define keys (iota 3000))
+(define alist (map (lambda (k) (cons k k)) keys))
+(define table (make-hash-table eqv?))
+(for-each (lambda (k) (hash-table-set! table k k)) keys)
+(define list-alist (map (lambda (k) (cons (list k 'x) k)) keys))
+(define list-table (make-hash-table equal?))
+(for-each (lambda (k) (hash-table-set! list-table (list k 'x) k)) keys)
+"""
+
+@benchmark
+def bench_tables():
+    # Looking up every key of 3000 in a hash table, against searching an association list for it
+    print('tables: 3000 lookups in 3000 entries')
+    env = sloop.prepare()
+    evaluate = seval.evaluators["explicit"]
+    run_program_in(tables_prelude,env,"explicit")
+    lookups = [('number keys',"(fold-left (lambda (s k) (+ s (hash-table-ref table k))) 0 keys)",
+                "(fold-left (lambda (s k) (+ s (cdr (assoc k alist)))) 0 keys)"),
+               ('list keys',"(fold-left (lambda (s k) (+ s (hash-table-ref list-table (list k 'x)))) 0 keys)",
+                "(fold-left (lambda (s k) (+ s (cdr (assoc (list k 'x) list-alist)))) 0 keys)")]
+    for name,table,alist in lookups:
+        table_form = seval.preprocess(next(parse.skimpy_read(table)))
+        alist_form = seval.preprocess(next(parse.skimpy_read(alist)))
+        baseline,expected = timed(evaluate,alist_form,env,repeat=1)
+        seconds,result = timed(evaluate,table_form,env)
+        assert str(result) == str(expected),name
+        report(name,seconds,baseline)
+
+vectors_prelude = """
+(define (iota n) (define (loop i acc) (if (= i 0) acc (loop (- i 1) (cons (- i 1) acc)))) (loop n '()))
+(define data (iota 2000))
+(define vec (list->vector data))
+(define (sum-indexed ref seq n) (define (loop i acc) (if (= i n) acc (loop (+ i 1) (+ acc (ref seq i))))) (loop 0 0))
+(define (prefix-sums! v n)
+  (define (loop i)
+    (if (< i n) (begin (vector-set! v i (+ (vector-ref v i) (vector-ref v (- i 1)))) (loop (+ i 1))) v))
+  (loop 1))
+"""
+
+@benchmark
+def bench_vectors():
+    # Index-heavy code on a vector, against the same on a list, where every access walks the list
+    print('vectors: indexed access to 2000 elements')
+    env = sloop.prepare()
+    evaluate = seval.evaluators["explicit"]
+    run_program_in(vectors_prelude,env,"explicit")
+    vector_form = seval.preprocess(next(parse.skimpy_read("(sum-indexed vector-ref vec 2000)")))
+    list_form = seval.preprocess(next(parse.skimpy_read("(sum-indexed list-ref data 2000)")))
+    baseline,expected = timed(evaluate,list_form,env)
+    seconds,result = timed(evaluate,vector_form,env)
+    assert str(result) == str(expected)
+    report('sum by index',seconds,baseline)
+    prefix_form = seval.preprocess(next(parse.skimpy_read("(vector-ref (prefix-sums! (list->vector data) 2000) 1999)")))
+    seconds,result = timed(evaluate,prefix_form,env)
+    assert str(result) == str(expected)
+    report('prefix sums in place',seconds)
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(benchmarks)
+    for name in names:
+        benchmarks[name]()
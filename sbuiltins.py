@@ -1,27 +1,33 @@
 import sdata
 import senv
+import seval
 import operator
 import sloop
+import scache
 import itertools
 import os
 import fileinput
 import sys
+from serror import SkimpyError
+
+def raise_errors(eval_result):
+    # load discards the values of the forms it evaluates, but not the errors
+    if isinstance(eval_result,Exception):
+        raise eval_result
 
 def load_file(env,token,filename):
     # Execute a file in its entirety
     if not os.path.isfile(filename):
         raise SkimpyError(token,'load: could not find file ' + filename)
 
-    ptext = None
-    with open(filename,'r') as prog_file:
-        ptext = prog_file.read()
-
     # NOTE:  We execute file inside the current environment, not the top-level
-    sloop.execute_code(ptext,env)
+    sloop.execute_forms(scache.load_forms(filename),env[1],raise_errors)
     return sdata.SkimpyNonReturn('<unspecified>')
 
-def bind_builtin(env,name,pyf,check_arg_count=None, check_arg_types=None, is_raw=False):
-    proc = sdata.PythonProc(env,name,pyf,check_arg_count, check_arg_types, is_raw)
+def bind_builtin(env,name,pyf,check_arg_count=None, check_arg_types=None, is_raw=False, rest_type=None, binary=None):
+    # The signature is compiled here, once, into the checks and conversion each call makes (see sdata.BuiltinSignature)
+    signature = sdata.BuiltinSignature(name,check_arg_count,check_arg_types,is_raw,rest_type,binary)
+    proc = sdata.PythonProc(env,name,pyf,signature)
     env.bind(name,proc)
 
 def make_checker(test):
@@ -53,25 +59,37 @@ def negator(env,token,*inputs):
     if len(inputs) == 1:
         return -inputs[0]
     else:
-        return accumulate(operator.sub,inputs)
-
-def is_equal(env,token,v1,v2):
-    # simple, bootstrapped initial version
-#    print ('is equal ' + str(v1) + ' ' + str(v2))    
-    return v1 == v2
+        return py_accumulate(operator.sub,inputs)
 
-def is_less(env,token,v1,v2):
-    # simple, bootstrapped initial version
-#    print ('is less ' + str(v1) + ' ' + str(v2))
-    return v1 < v2
+def make_comparison(op):
+    # True if op holds between each argument and the next.  Stops at the first pair for which it does not
+    def _proc(env,token,*inputs):
+        for idx in range(1,len(inputs)):
+            if not op(inputs[idx-1],inputs[idx]):
+                return False
+        return True
+    return _proc
 
-def is_greater(env,token,v1,v2):  
-    return v1 > v2
+def make_specialized(op,is_predicate=False):
+    # The binary function of a fixnum or flonum operation.  Its arguments are raw and already checked, so it works on
+    # the numbers as they are represented, and makes its result the same way (see sdata.unboxed_numbers)
+    if sdata.unboxed_numbers:
+        if is_predicate:
+            return lambda left,right: sdata.true_val if op(left,right) else sdata.false_val
+        return op
+    if is_predicate:
+        return lambda left,right: sdata.true_val if op(left.value,right.value) else sdata.false_val
+    return lambda left,right: sdata.SkimpyNumber(op(left.value,right.value))
+
+def make_number_checker(number_type):
+    if sdata.unboxed_numbers:
+        return (lambda arg,idx: arg.__class__ is number_type)
+    return (lambda arg,idx: arg.__class__ is sdata.SkimpyNumber and arg.value.__class__ is number_type)
 
 def display_text(env,token,arglist):
     # Accept SkimpyValues directly here
     for arg in arglist:
-        sys.stdout.write(arg.str_for_display(token))
+        sys.stdout.write(sdata.str_for_display(arg,token))
     return sdata.SkimpyNonReturn('<unspecified>')
 
 def remainder(env,token,divisor,dividend):
@@ -87,34 +105,269 @@ def pair_right(env,token,arg):
     return arg[0].cdr
 
 def is_eq(left,right):
-    return left == right   # The most straightorward way is to compare Python references
+    # The most straightforward way is to compare Python references.  == also finds two handles of one arena pair, and
+    # unboxed numbers by value
+    return sdata.true_val if left is right or (left == right and left.__class__ is right.__class__) else sdata.false_val
+
+def is_eqv(left,right):
+    return sdata.true_val if sdata.values_eqv(left,right) else sdata.false_val
 
 def make_list(env,token,args):
-    lb = sdata.list_builder()
-    lb.send(None)  # Initialize generator
+    return sdata.build_list(args)
+
+# The bulk list operations.  Each takes its lists apart into Python lists in one loop (see sdata.list_elements),
+# works on those, and builds its result with the list builder.  Procedures given to them are called with apply
+
+def proper_elements(token,env,lst,name):
+    elements,tail = sdata.list_elements(lst)
+    if tail is not sdata.the_empty_list:
+        raise SkimpyError(token,name + ': not a proper list',env[1])
+    return elements
+
+def is_equal_value(left,right):
+    return sdata.true_val if sdata.values_equal(left,right) else sdata.false_val
 
-    for arg in args:
-        lb.send(arg)
-    try:
-        lb.send(None)
-    except StopIteration as result:
-        return result.value
+def is_true(value):
+    return not sdata.is_false(value)
 
 def map_list(env,tok,args):
+    # (map proc list ...), as long as the shortest list
     proc = args[0]
-    lst = args[1]
-    
-    result_lst = sdata.list_builder()
-    result_lst.send(None)
+    if len(args) == 2:
+        return sdata.build_list([proc.apply(tok,env[1],None,[element])
+                                 for element in proper_elements(tok,env,args[1],'map')])
+    columns = [proper_elements(tok,env,lst,'map') for lst in args[1:]]
+    return sdata.build_list([proc.apply(tok,env[1],None,list(row)) for row in zip(*columns)])
+
+def for_each(env,tok,args):
+    # (for-each proc list ...)
+    proc = args[0]
+    columns = [proper_elements(tok,env,lst,'for-each') for lst in args[1:]]
+    for row in zip(*columns):
+        proc.apply(tok,env[1],None,list(row))
+    return sdata.SkimpyNonReturn('<unspecified>')
 
-    for element in sdata.lister(lst):
-        val = proc.apply(tok,env,None,[element])
-        result_lst.send(val)
+def list_length(env,tok,args):
+    return sdata.make_number(len(proper_elements(tok,env,args[0],'length')))
+
+def append_lists(env,tok,args):
+    # (append list ... obj): the last argument is shared, not copied
+    if not args:
+        return sdata.the_empty_list
+    elements = []
+    for lst in args[:-1]:
+        elements.extend(proper_elements(tok,env,lst,'append'))
+    return sdata.build_list(elements,args[-1])
+
+def reverse_list(env,tok,args):
+    elements = proper_elements(tok,env,args[0],'reverse')
+    elements.reverse()
+    return sdata.build_list(elements)
+
+def get_index(tok,env,value,name):
+    index = sdata.pythonify(value)
+    if type(index) is not int or index < 0:
+        raise SkimpyError(tok,name + ': index must be a nonnegative integer',env[1])
+    return index
+
+def walk_tail(tok,env,lst,index,name):
+    # The list after the first index pairs of lst
+    for i in range(get_index(tok,env,index,name)):
+        if not is_pair(lst):
+            raise SkimpyError(tok,name + ': index out of range',env[1])
+        lst = lst.cdr
+    return lst
+
+def list_tail(env,tok,args):
+    return walk_tail(tok,env,args[0],args[1],'list-tail')
+
+def list_ref(env,tok,args):
+    lst = walk_tail(tok,env,args[0],args[1],'list-ref')
+    if not is_pair(lst):
+        raise SkimpyError(tok,'list-ref: index out of range',env[1])
+    return lst.car
+
+def last_pair(env,tok,args):
+    lst = args[0]
+    while is_pair(lst.cdr):
+        lst = lst.cdr
+    return lst
+
+def member_list(env,tok,args):
+    # The first pair of the list whose car is equal? to the value, or #f
+    value,lst = args
+    while is_pair(lst):
+        if sdata.values_equal(value,lst.car):
+            return lst
+        lst = lst.cdr
+    if lst is not sdata.the_empty_list:
+        raise SkimpyError(tok,'member: not a proper list',env[1])
+    return sdata.false_val
+
+def assoc_list(env,tok,args):
+    # The first pair of the association list whose car is equal? to the key, or #f
+    key,lst = args
+    while is_pair(lst):
+        entry = lst.car
+        if not is_pair(entry):
+            raise SkimpyError(tok,'assoc: not an association list',env[1])
+        if sdata.values_equal(key,entry.car):
+            return entry
+        lst = lst.cdr
+    if lst is not sdata.the_empty_list:
+        raise SkimpyError(tok,'assoc: not a proper list',env[1])
+    return sdata.false_val
+
+def filter_list(env,tok,args):
+    pred = args[0]
+    return sdata.build_list([element for element in proper_elements(tok,env,args[1],'filter')
+                             if is_true(pred.apply(tok,env[1],None,[element]))])
+
+def fold_left(env,tok,args):
+    # (fold-left proc init list ...): (proc (proc init e0 ...) e1 ...) ...
+    proc,acc = args[0],args[1]
+    columns = [proper_elements(tok,env,lst,'fold-left') for lst in args[2:]]
+    for row in zip(*columns):
+        acc = proc.apply(tok,env[1],None,[acc] + list(row))
+    return acc
+
+def fold_right(env,tok,args):
+    # (fold-right proc init list ...): (proc e0 ... (proc e1 ... init))
+    proc,acc = args[0],args[1]
+    columns = [proper_elements(tok,env,lst,'fold-right') for lst in args[2:]]
+    for row in reversed(list(zip(*columns))):
+        acc = proc.apply(tok,env[1],None,list(row) + [acc])
+    return acc
+
+def apply_proc(env,tok,args):
+    # (apply proc arg ... list).  A procedure other than a builtin is not called here: the call is handed back as a
+    # seval.TailCall, which the evaluator makes as if it were its own, so that apply in tail position is a tail call
+    proc = args[0]
+    values = list(args[1:-1]) + proper_elements(tok,env,args[-1],'apply')
+    if proc.__class__ is sdata.PythonProc:
+        return proc.apply(tok,env[1],None,values)
+    return seval.TailCall(proc,tok,env[1],values)
+
+class SortKey(object):
+    # An element being sorted, ordered by the less? procedure.  Timsort only asks whether one key is less than another
+    __slots__ = ('value','less','tok','env')
+
+    def __init__(self,value,less,tok,env):
+        self.value = value
+        self.less = less
+        self.tok = tok
+        self.env = env
+
+    def __lt__(self,other):
+        return is_true(self.less.apply(self.tok,self.env,None,[self.value,other.value]))
+
+def sort_list(env,tok,args):
+    # (sort list less?), stable, with Python's sort on the elements in a buffer
+    less = args[1]
+    elements = proper_elements(tok,env,args[0],'sort')
+    elements.sort(key=lambda value: SortKey(value,less,tok,env[1]))
+    return sdata.build_list(elements)
+
+# The hash tables.  Keys are looked up by the key the table makes of them (see sdata.hash_table_keys)
+
+def make_hash_table(env,tok,args):
+    # (make-hash-table [equivalence]), equal? by default.  The equivalence must be the builtin eq?, eqv? or equal?
+    equivalence = args[0].name if args else 'equal?'
+    if not args or isinstance(args[0],sdata.PythonProc) and equivalence in sdata.hash_table_keys:
+        return sdata.SkimpyHashTable(equivalence,sdata.hash_table_keys[equivalence])
+    raise SkimpyError(tok,'make-hash-table: equivalence must be eq?, eqv? or equal?',env[1])
+
+def missing_key(env,tok,key,thunk,name):
+    # The value of a key not in the table: the thunk's, or an error
+    if thunk is None:
+        raise SkimpyError(tok,name + ': no value for key ' + str(key),env[1])
+    return thunk.apply(tok,env[1],None,[])
+
+def hash_table_ref(env,tok,args):
+    # (hash-table-ref table key [thunk])
+    table = args[0]
+    entry = table.entries.get(table.make_key(args[1]))
+    if entry is None:
+        return missing_key(env,tok,args[1],args[2] if len(args) > 2 else None,'hash-table-ref')
+    return entry[1]
+
+def hash_table_ref_default(env,tok,args):
+    table = args[0]
+    entry = table.entries.get(table.make_key(args[1]))
+    return args[2] if entry is None else entry[1]
+
+def hash_table_set(env,tok,args):
+    table = args[0]
+    table.entries[table.make_key(args[1])] = (args[1],args[2])
+    return sdata.SkimpyNonReturn('<unspecified>')
 
-    try:
-        result_lst.send(None)
-    except StopIteration as result:
-        return result.value
+def hash_table_update(env,tok,args):
+    # (hash-table-update! table key proc [thunk])
+    table = args[0]
+    key = table.make_key(args[1])
+    entry = table.entries.get(key)
+    if entry is None:
+        value = missing_key(env,tok,args[1],args[3] if len(args) > 3 else None,'hash-table-update!')
+    else:
+        value = entry[1]
+    table.entries[key] = (args[1] if entry is None else entry[0],args[2].apply(tok,env[1],None,[value]))
+    return sdata.SkimpyNonReturn('<unspecified>')
+
+def hash_table_delete(env,tok,args):
+    table = args[0]
+    table.entries.pop(table.make_key(args[1]),None)
+    return sdata.SkimpyNonReturn('<unspecified>')
+
+def hash_table_walk(env,tok,args):
+    # (hash-table-walk table proc), over the entries there were when the walk began
+    proc = args[1]
+    for key,value in list(args[0].entries.values()):
+        proc.apply(tok,env[1],None,[key,value])
+    return sdata.SkimpyNonReturn('<unspecified>')
+
+def hash_table_count(env,tok,args):
+    return sdata.make_number(len(args[0].entries))
+
+def hash_table_keys(env,tok,args):
+    return sdata.build_list([key for key,value in args[0].entries.values()])
+
+# The vectors.  Their items are a Python list, so that indexing takes constant time
+
+def vector_index(tok,env,vector,index,name):
+    index = get_index(tok,env,index,name)
+    if index >= len(vector.items):
+        raise SkimpyError(tok,name + ': index out of range',env[1])
+    return index
+
+def make_vector(env,tok,args):
+    # (make-vector k [fill]), filled with #f unless fill is given
+    fill = args[1] if len(args) > 1 else sdata.false_val
+    return sdata.SkimpyVector([fill] * get_index(tok,env,args[0],'make-vector'))
+
+def vector_ref(env,tok,args):
+    return args[0].items[vector_index(tok,env,args[0],args[1],'vector-ref')]
+
+def vector_set(env,tok,args):
+    args[0].items[vector_index(tok,env,args[0],args[1],'vector-set!')] = args[2]
+    return sdata.SkimpyNonReturn('<unspecified>')
+
+def vector_fill(env,tok,args):
+    items = args[0].items
+    items[:] = [args[1]] * len(items)
+    return sdata.SkimpyNonReturn('<unspecified>')
+
+def vector_map(env,tok,args):
+    # (vector-map proc vector ...), as long as the shortest vector
+    proc = args[0]
+    columns = [vector.items for vector in args[1:]]
+    return sdata.SkimpyVector([proc.apply(tok,env[1],None,list(row)) for row in zip(*columns)])
+
+def vector_for_each(env,tok,args):
+    proc = args[0]
+    columns = [vector.items for vector in args[1:]]
+    for row in zip(*columns):
+        proc.apply(tok,env[1],None,list(row))
+    return sdata.SkimpyNonReturn('<unspecified>')
 
 def is_pair(value):
     return isinstance(value,sdata.SkimpyPair)
@@ -126,27 +379,40 @@ def is_empty_list(value):
     return value == sdata.the_empty_list
 
 def register_builtins(env):
+    # The arithmetic and the comparisons call the operator directly for two arguments, the usual case
     bind_builtin(env,'+',make_accumulator(operator.add),\
-                  check_arg_count=(1,None))
+                  check_arg_count=(1,None),binary=operator.add)
 
     bind_builtin(env,'*',make_accumulator(operator.mul),\
-                  check_arg_count=(1,None))
+                  check_arg_count=(1,None),binary=operator.mul)
 
     bind_builtin(env,'-',negator,\
-                  check_arg_count=(1,None))
+                  check_arg_count=(1,None),binary=operator.sub)
 
     bind_builtin(env,'/',make_accumulator(operator.truediv),\
-                  check_arg_count=(1,None))
+                  check_arg_count=(1,None),binary=operator.truediv)
+
+    for name,op in [('=',operator.eq),('<',operator.lt),('>',operator.gt),('<=',operator.le),('>=',operator.ge)]:
+        bind_builtin(env,name,make_comparison(op),check_arg_count=(2,None),binary=op)
+
+    # Fixnum and flonum operations take exactly two numbers of their kind, and are not converted at all
+    check_fixnum = ('fixnum',make_number_checker(int))
+    check_flonum = ('flonum',make_number_checker(float))
+    specialized = [('+',operator.add,False),('-',operator.sub,False),('*',operator.mul,False),
+                   ('=',operator.eq,True),('<',operator.lt,True),('>',operator.gt,True),
+                   ('<=',operator.le,True),('>=',operator.ge,True)]
+    for prefix,check_type in [('fx',check_fixnum),('fl',check_flonum)]:
+        for name,op,is_predicate in specialized + ([('/',operator.truediv,False)] if prefix == 'fl' else []):
+            binary = make_specialized(op,is_predicate)
+            bind_builtin(env,prefix + name,lambda env,tok,values,binary=binary: binary(values[0],values[1]),
+                         check_arg_count=2,check_arg_types=[check_type,check_type],is_raw=True,binary=binary)
 
     check_pair = make_checker(is_pair)
     check_list = make_checker(is_list)
     
-    check_int = (lambda arg,idx: isinstance(arg,sdata.SkimpyNumber) and type(arg.value) == int)
+    check_int = (lambda arg,idx: sdata.is_number(arg) and type(sdata.pythonify(arg)) == int)
     check_procedure = (lambda arg,idx: isinstance(arg,sdata.SkimpyProc))
 
-    bind_builtin(env,'=',is_equal,check_arg_count=2)
-    bind_builtin(env,'<',is_less,check_arg_count=2)
-    bind_builtin(env,'>',is_greater,check_arg_count=2)
     bind_builtin(env,'remainder',remainder,check_arg_count=2)
     bind_builtin(env,'load',load_file,check_arg_count=1)
     bind_builtin(env,'display',display_text,check_arg_count=(1,None),is_raw=True)
@@ -160,11 +426,80 @@ def register_builtins(env):
     bind_builtin(env,'pair?',make_predicate(is_pair),check_arg_count=1)
     bind_builtin(env,'atom?',make_predicate(lambda p: not is_pair(p)),check_arg_count=1)
     bind_builtin(env,'not',lambda env,tok,v: not v,check_arg_count=1)
-    bind_builtin(env,'eq?',is_eq,check_arg_count=2)
+    bind_builtin(env,'eq?',lambda env,tok,args: is_eq(args[0],args[1]),check_arg_count=2,is_raw=True,binary=is_eq)
+    bind_builtin(env,'eqv?',lambda env,tok,args: is_eqv(args[0],args[1]),check_arg_count=2,is_raw=True,
+                 binary=is_eqv)
+    bind_builtin(env,'equal?',lambda env,tok,args: is_equal_value(args[0],args[1]),check_arg_count=2,is_raw=True,
+                 binary=is_equal_value)
     # The list operations
-    bind_builtin(env,'map',map_list,check_arg_count=2,
-                 check_arg_types=[('procedure',check_procedure),('list',check_list)], is_raw=True)
+    check_proc_first = [('procedure',check_procedure)]
+    proc_and_lists = dict(check_arg_types=check_proc_first,rest_type=('list',check_list),is_raw=True)
+    bind_builtin(env,'map',map_list,check_arg_count=(2,None),**proc_and_lists)
+    bind_builtin(env,'for-each',for_each,check_arg_count=(2,None),**proc_and_lists)
+    bind_builtin(env,'filter',filter_list,check_arg_count=2,**proc_and_lists)
+    bind_builtin(env,'fold-left',fold_left,check_arg_count=(3,None),
+                 check_arg_types=check_proc_first + [('*',None)],rest_type=('list',check_list),is_raw=True)
+    bind_builtin(env,'fold-right',fold_right,check_arg_count=(3,None),
+                 check_arg_types=check_proc_first + [('*',None)],rest_type=('list',check_list),is_raw=True)
+    bind_builtin(env,'apply',apply_proc,check_arg_count=(2,None),check_arg_types=check_proc_first,is_raw=True)
+    bind_builtin(env,'sort',sort_list,check_arg_count=2,
+                 check_arg_types=[('list',check_list),('procedure',check_procedure)],is_raw=True)
 
     bind_builtin(env,'list',make_list,is_raw=True)
+    bind_builtin(env,'length',list_length,check_arg_count=1,check_arg_types=[('list',check_list)],is_raw=True)
+    bind_builtin(env,'append',append_lists,is_raw=True)
+    bind_builtin(env,'reverse',reverse_list,check_arg_count=1,check_arg_types=[('list',check_list)],is_raw=True)
+    bind_builtin(env,'list-tail',list_tail,check_arg_count=2,check_arg_types=[('*',None),('integer',check_int)],
+                 is_raw=True)
+    bind_builtin(env,'list-ref',list_ref,check_arg_count=2,check_arg_types=[('*',None),('integer',check_int)],
+                 is_raw=True)
+    bind_builtin(env,'last-pair',last_pair,check_arg_count=1,check_arg_types=[('pair',check_pair)],is_raw=True)
+    bind_builtin(env,'member',member_list,check_arg_count=2,check_arg_types=[('*',None),('list',check_list)],
+                 is_raw=True)
+    bind_builtin(env,'assoc',assoc_list,check_arg_count=2,check_arg_types=[('*',None),('list',check_list)],
+                 is_raw=True)
+
+    # The vectors
+    check_vector = ('vector',make_checker(lambda value: value.__class__ is sdata.SkimpyVector))
+    vector_and_index = [check_vector,('integer',check_int)]
+    bind_builtin(env,'vector?',lambda env,tok,args: sdata.true_val if check_vector[1](args[0],0) else sdata.false_val,
+                 check_arg_count=1,is_raw=True)
+    bind_builtin(env,'make-vector',make_vector,check_arg_count=(1,2),check_arg_types=[('integer',check_int)],
+                 is_raw=True)
+    bind_builtin(env,'vector',lambda env,tok,args: sdata.SkimpyVector(list(args)),is_raw=True)
+    bind_builtin(env,'vector-ref',vector_ref,check_arg_count=2,check_arg_types=vector_and_index,is_raw=True)
+    bind_builtin(env,'vector-set!',vector_set,check_arg_count=3,check_arg_types=vector_and_index,is_raw=True)
+    bind_builtin(env,'vector-length',lambda env,tok,args: sdata.make_number(len(args[0].items)),check_arg_count=1,
+                 check_arg_types=[check_vector],is_raw=True)
+    bind_builtin(env,'vector->list',lambda env,tok,args: sdata.build_list(args[0].items),check_arg_count=1,
+                 check_arg_types=[check_vector],is_raw=True)
+    bind_builtin(env,'list->vector',
+                 lambda env,tok,args: sdata.SkimpyVector(proper_elements(tok,env,args[0],'list->vector')),
+                 check_arg_count=1,check_arg_types=[('list',check_list)],is_raw=True)
+    bind_builtin(env,'vector-fill!',vector_fill,check_arg_count=2,check_arg_types=[check_vector],is_raw=True)
+    proc_and_vectors = dict(check_arg_types=check_proc_first,rest_type=check_vector,is_raw=True)
+    bind_builtin(env,'vector-map',vector_map,check_arg_count=(2,None),**proc_and_vectors)
+    bind_builtin(env,'vector-for-each',vector_for_each,check_arg_count=(2,None),**proc_and_vectors)
+
+    # The hash tables
+    check_table = ('hash table',make_checker(lambda value: isinstance(value,sdata.SkimpyHashTable)))
+    table_and_key = [check_table,('*',None)]
+    bind_builtin(env,'make-hash-table',make_hash_table,check_arg_count=(0,1),check_arg_types=[('procedure',check_procedure)],
+                 is_raw=True)
+    bind_builtin(env,'hash-table?',lambda env,tok,args: sdata.true_val if check_table[1](args[0],0) else sdata.false_val,
+                 check_arg_count=1,is_raw=True)
+    bind_builtin(env,'hash-table-ref',hash_table_ref,check_arg_count=(2,3),
+                 check_arg_types=table_and_key + [('procedure',check_procedure)],is_raw=True)
+    bind_builtin(env,'hash-table-ref/default',hash_table_ref_default,check_arg_count=3,check_arg_types=table_and_key,
+                 is_raw=True)
+    bind_builtin(env,'hash-table-set!',hash_table_set,check_arg_count=3,check_arg_types=table_and_key,is_raw=True)
+    bind_builtin(env,'hash-table-update!',hash_table_update,check_arg_count=(3,4),
+                 check_arg_types=table_and_key + [('procedure',check_procedure)] * 2,is_raw=True)
+    bind_builtin(env,'hash-table-delete!',hash_table_delete,check_arg_count=2,check_arg_types=table_and_key,
+                 is_raw=True)
+    bind_builtin(env,'hash-table-walk',hash_table_walk,check_arg_count=2,
+                 check_arg_types=[check_table,('procedure',check_procedure)],is_raw=True)
+    bind_builtin(env,'hash-table-count',hash_table_count,check_arg_count=1,check_arg_types=[check_table],is_raw=True)
+    bind_builtin(env,'hash-table-keys',hash_table_keys,check_arg_count=1,check_arg_types=[check_table],is_raw=True)
 
 
@@ -0,0 +1,109 @@
+import parse
+import sdata
+import seval
+import os
+import hashlib
+import pickle
+from serror import SkimpyError
+
+# The compiled cache for Scheme files, in the manner of Python's .pyc files.
+# Loading a file normally means scanning it and translating every form as it is evaluated.  Here the file is scanned
+# and fully translated once, and the translated forms are pickled to __skimpycache__/<name>.skc next to the source.
+# The concrete tree is kept in compact form, whose tables are pickled without the text: they map the file again.
+# An entry is used only if it was written by the same interpreter version for the same path and the same text, with
+# numbers in the same representation (see sdata.unboxed_numbers).
+
+# Bump this whenever the layout of forms, tokens or values changes.  Entries of other versions are ignored.
+INTERPRETER_VERSION = 6
+
+cache_dir_name = "__skimpycache__"
+enabled = True
+
+hits = 0
+misses = 0
+
+def get_cache_path(filename):
+    directory,basename = os.path.split(os.path.abspath(filename))
+    return os.path.join(directory,cache_dir_name,basename + ".skc")
+
+def get_stats():
+    return {"hits" : hits, "misses" : misses}
+
+def reset_stats():
+    global hits, misses
+    hits = 0
+    misses = 0
+
+def invalidate(filename):
+    # Drop the cache entry for filename.  Returns whether there was one
+    try:
+        os.remove(get_cache_path(filename))
+        return True
+    except FileNotFoundError:
+        return False
+
+def analyze(source,filename=None,stats=None):
+    # Read source into a compact tree (see parse.py) and translate every top-level form all the way down.
+    # source is text, or the mapped contents of filename.
+    # A form that fails translation is kept as concrete text, so that it reports its error when it is evaluated
+    # and not when the file is loaded, exactly as without the cache.  Any other exception is a bug, and is raised
+    # stats, if given, is an seval.AnalysisStats to accumulate the work of the analysis in
+    table = parse.SkimpySourceTable(source,filename)
+    forms = []
+    for node in parse.skimpy_read_compact(source,table):
+        try:
+            forms.append(seval.preprocess(node,stats))
+        except SkimpyError:
+            forms.append(node)
+    return forms
+
+def read_entry(cache_path,filename,digest):
+    try:
+        with open(cache_path,'rb') as cache_file:
+            entry = pickle.load(cache_file)
+    except Exception:
+        return None  # No entry, or one we cannot read -- treat the same
+
+    if entry.get("version") != INTERPRETER_VERSION or entry.get("unboxed") != sdata.unboxed_numbers \
+       or entry.get("path") != filename or entry.get("digest") != digest:
+        return None
+    return entry["forms"]
+
+def write_entry(cache_path,filename,digest,forms):
+    entry = {"version" : INTERPRETER_VERSION, "unboxed" : sdata.unboxed_numbers, "path" : filename, "digest" : digest,
+             "forms" : forms}
+    temp_path = cache_path + "." + str(os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache_path),exist_ok=True)
+        with open(temp_path,'wb') as cache_file:
+            pickle.dump(entry,cache_file,pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path,cache_path)  # Readers never see a partly written entry
+    except Exception:
+        # The cache is an optimization only.  A read-only directory or a tree too deep to pickle just means no entry
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def load_forms(filename,stats=None):
+    # The translated top-level forms of filename, from the cache if possible
+    # stats is as for analyze(); a cache hit translates nothing
+    # The file is mapped into memory and read in place, so its text is never copied as a whole
+    global hits, misses
+
+    filename = os.path.abspath(filename)
+    source = parse.map_source(filename)
+
+    if not enabled:
+        return analyze(source,filename,stats)
+
+    digest = hashlib.sha256(source).hexdigest()
+    cache_path = get_cache_path(filename)
+
+    forms = read_entry(cache_path,filename,digest)
+    if forms is not None:
+        hits += 1
+        return forms
+
+    misses += 1
+    forms = analyze(source,filename,stats)
+    write_entry(cache_path,filename,digest,forms)
+    return forms
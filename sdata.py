@@ -2,10 +2,14 @@ import senv
 import seval
 import parse
 import numbers
+from array import array
 from serror import SkimpyError
 from serror import StackFrame
 
+# Values have no __dict__: the classes below list their fields in __slots__.  A program may make millions of them
 class SkimpyValue(object):
+    __slots__ = ()
+
     def pythonify(self):
         # print ('pythonifying self')
         return self # default -- identity
@@ -22,6 +26,8 @@ class SkimpyValue(object):
         return str(self)
 
 class SkimpyProc(SkimpyValue):
+    __slots__ = ('enc_env','name','arglist','text')
+
     def __init__(self,enc_env,name,arglist,text):
         self.enc_env = enc_env
         self.name = name
@@ -29,6 +35,8 @@ class SkimpyProc(SkimpyValue):
         self.text = text
 
 class CompoundProc(SkimpyProc):
+    __slots__ = ()
+
     def __init__(self,*args):
         super(CompoundProc,self).__init__(*args)
 
@@ -48,11 +56,10 @@ class CompoundProc(SkimpyProc):
             # NOTE:  _user was set by the explicit_eval function!
             requester = self._user
             my_host = self.host
-            my_host.text = seval.translate(my_host.text)
             
             if isinstance(requester,CompoundProc.Applier) and requester.host == my_host:
                 senv.bind_arglist(self.token,self.exec_env,my_host.arglist,self.values,rebind=True)
-                raise StopIteration ((my_host.text.make_eval(exec_env),seval.EvalMessage.CONTINUATION))
+                raise StopIteration ((my_host.text.make_eval(self.exec_env),seval.EvalMessage.CONTINUATION))
             else:
                 new_env = senv.bind_arglist(self.token,my_host.enc_env,my_host.arglist,self.values)  
                 raise StopIteration ((my_host.text.make_eval(new_env),seval.EvalMessage.CONTINUATION))            
@@ -68,33 +75,182 @@ class CompoundProc(SkimpyProc):
         # The returned value is passed back to eval.
         # We are bootstrapping the return to Python.
  
-        if caller_id == self:
-            # This is the same procedure.  Do a continuation
-            # That is, rebind the arguments into the calling environment and raise a ContinuationException
-            senv.bind_arglist(token,exec_env,self.arglist,values,rebind=True)
-            # The _cp remains the same
-            new_text = seval.translate(self.text)  # As in seval, explicit translation to cache the analyzed text if it was not cached on the form
-            self.text = new_text
-            raise seval.ContinuationException(self.text)
-        else:
-            new_env = senv.bind_arglist(token,self.enc_env,self.arglist,values)
-            new_env.bind_private("_cp",StackFrame(self,token,exec_env))
+        # Calls from skimpy_eval itself do not come here; it makes them in its own loop, so that tail calls do not nest.
+        # caller_id is no longer used.
+        # The text is the body its lambda translated, shared by every procedure made from it (see SkimpyLambda)
+        new_env = senv.bind_arglist(token,self.enc_env,self.arglist,values)
+        new_env.bind_private("_cp",StackFrame(self,token,exec_env))
             
-            to_return,new_text = seval.skimpy_eval(self.text,new_env,self)
-            self.text = new_text
-            
-        return to_return    
+        return seval.skimpy_eval(self.text,new_env)[0]    
+
+
+# What a builtin accepts, compiled once when it is bound (see sbuiltins.bind_builtin).
+#   check_arg_count is None (any number), n, or (min,max) where either may be None
+#   check_arg_types is a list of (type name, test(value,index)) pairs for the first arguments; the name '*' means
+#     any type.  rest_type is a pair for every argument after them, or None
+#   is_raw is True to pass the list of values as they are, False to pythonify every argument, or a sequence of
+#     flags, one for each argument, True for those to pass as they are.  Arguments past its end are pythonified
+#   binary, if given, is a function of two arguments, converted as is_raw says, for the calls with two arguments.
+#     It takes neither the environments nor the token, and its result is skimpified unless is_raw is True
+CONVERT_RAW = 0
+CONVERT_PYTHONIFY = 1
+CONVERT_PER_ARGUMENT = 2
 
+class BuiltinSignature(object):
+    __slots__ = ('name','min_args','max_args','types','rest_type','conversion','raw_flags','binary','validate')
+
+    def __init__(self,name,check_arg_count=None,check_arg_types=None,is_raw=False,rest_type=None,binary=None):
+        self.name = name
+        if isinstance(check_arg_count,tuple):
+            self.min_args,self.max_args = check_arg_count
+        else:
+            self.min_args = self.max_args = check_arg_count
+
+        # A position of any type needs no test
+        self.types = [None if check_pair[0] == '*' else check_pair for check_pair in (check_arg_types or [])]
+        self.rest_type = rest_type if rest_type is not None and rest_type[0] != '*' else None
+
+        if is_raw is True:
+            self.conversion = CONVERT_RAW
+            self.raw_flags = None
+        elif not is_raw:
+            self.conversion = CONVERT_PYTHONIFY
+            self.raw_flags = None
+        else:
+            self.conversion = CONVERT_PER_ARGUMENT
+            self.raw_flags = tuple(is_raw)
+            binary = None  # Not worth the trouble
+
+        self.binary = binary
+
+        self.validate = self.make_validator()
+
+    def count_error(self,token,exec_env,n_args):
+        # The error for n_args arguments, or None if n_args is accepted
+        if self.min_args is not None and n_args < self.min_args:
+            return SkimpyError(token, 'too few arguments for builtin procedure ' + str(self.name),exec_env)
+        if self.max_args is not None and n_args > self.max_args:
+            return SkimpyError(token, 'too many arguments for builtin procedure ' + str(self.name),exec_env)
+        return None
+
+    def type_error(self,token,exec_env,idx,type_name):
+        return SkimpyError(token,'argument ' + str(idx) + ': wrong argument type for builtin procedure ' + str(self.name)\
+                           + '; expected ' + type_name,exec_env)
+
+    def checks_for(self,n_args):
+        # (index, type name, test) for each of n_args arguments that has a test
+        checks = []
+        for idx in range(n_args):
+            check_pair = self.types[idx] if idx < len(self.types) else self.rest_type
+            if check_pair is not None:
+                checks.append((idx,check_pair[0],check_pair[1]))
+        return checks
+
+    def make_validator(self):
+        # A function (token,exec_env,values) raising the error for values, specialized to what this signature checks,
+        # or None if every call is valid
+        min_args = self.min_args
+        max_args = self.max_args
+        has_types = any(check_pair is not None for check_pair in self.types) or self.rest_type is not None
+
+        if min_args is None and max_args is None:
+            count_ok = None
+        elif min_args == max_args:
+            count_ok = lambda n_args: n_args == min_args
+        elif max_args is None:
+            count_ok = lambda n_args: n_args >= min_args
+        elif min_args is None:
+            count_ok = lambda n_args: n_args <= max_args
+        else:
+            count_ok = lambda n_args: min_args <= n_args <= max_args
+
+        if not has_types:
+            # The common case, checked without calling count_ok
+            if count_ok is None:
+                return None
+            elif min_args == max_args:
+                def validate(token,exec_env,values):
+                    if len(values) != min_args:
+                        raise self.count_error(token,exec_env,len(values))
+            else:
+                def validate(token,exec_env,values):
+                    if not count_ok(len(values)):
+                        raise self.count_error(token,exec_env,len(values))
+            return validate
+
+        types = self.types
+        n_types = len(types)
+        rest_type = self.rest_type
+        def validate(token,exec_env,values):
+            if count_ok is not None and not count_ok(len(values)):
+                raise self.count_error(token,exec_env,len(values))
+            for idx,value in enumerate(values):
+                check_pair = types[idx] if idx < n_types else rest_type
+                if check_pair is not None and not check_pair[1](value,idx):
+                    raise self.type_error(token,exec_env,idx,check_pair[0])
+        return validate
+
+    def make_caller(self,pyf,enc_env,n_args=None):
+        # A function (token,exec_env,values) calling pyf with values converted as this signature says, without
+        # checking them.  With n_args, the caller may assume there are that many values
+        if self.binary is not None:
+            if n_args == 2:
+                return self.make_binary_caller()
+            elif n_args is None:
+                binary_call = self.make_binary_caller()
+                general_call = self.make_general_caller(pyf,enc_env,None)
+                return lambda token,exec_env,values: binary_call(token,exec_env,values) if len(values) == 2 \
+                                                     else general_call(token,exec_env,values)
+        return self.make_general_caller(pyf,enc_env,n_args)
+
+    def make_binary_caller(self):
+        binary = self.binary
+        if self.conversion == CONVERT_RAW:
+            return lambda token,exec_env,values: binary(values[0],values[1])
+        elif unboxed_numbers:
+            return lambda token,exec_env,values: skimpify(binary(pythonify(values[0]),pythonify(values[1])))
+        return lambda token,exec_env,values: skimpify(binary(values[0].pythonify(),values[1].pythonify()))
+
+    def make_general_caller(self,pyf,enc_env,n_args):
+        if self.conversion == CONVERT_RAW:
+            return lambda token,exec_env,values: pyf((enc_env,exec_env),token,values)
+        elif self.conversion == CONVERT_PYTHONIFY and unboxed_numbers:
+            # Numbers need no conversion, but the other values still do
+            if n_args == 1:
+                return lambda token,exec_env,values: skimpify(pyf((enc_env,exec_env),token,pythonify(values[0])))
+            elif n_args == 2:
+                return lambda token,exec_env,values: skimpify(pyf((enc_env,exec_env),token,pythonify(values[0]),
+                                                                  pythonify(values[1])))
+            return lambda token,exec_env,values: skimpify(pyf((enc_env,exec_env),token,
+                                                              *[pythonify(val) for val in values]))
+        elif self.conversion == CONVERT_PYTHONIFY:
+            if n_args == 1:
+                return lambda token,exec_env,values: skimpify(pyf((enc_env,exec_env),token,values[0].pythonify()))
+            elif n_args == 2:
+                return lambda token,exec_env,values: skimpify(pyf((enc_env,exec_env),token,values[0].pythonify(),
+                                                                  values[1].pythonify()))
+            return lambda token,exec_env,values: skimpify(pyf((enc_env,exec_env),token,
+                                                              *[val.pythonify() for val in values]))
+
+        raw_flags = self.raw_flags
+        n_flags = len(raw_flags)
+        def call(token,exec_env,values):
+            val_list = [val if idx < n_flags and raw_flags[idx] else pythonify(val) for idx,val in enumerate(values)]
+            return skimpify(pyf((enc_env,exec_env),token,*val_list))
+        return call
 
 # To users these are indistinguishable if 'apply' is used to call a procedure
 class PythonProc(SkimpyProc):
-    def __init__(self,enc_env,name,pyf,check_arg_count=None,check_arg_types=None,is_raw = False):    
+    __slots__ = ('signature','pyf','validate','call')
+
+    def __init__(self,enc_env,name,pyf,signature=None):
         super(PythonProc,self).__init__(enc_env,name,arglist=None,text=None)
-        self.check_arg_count = check_arg_count
-        self.check_arg_types = check_arg_types
-        
+        # A builtin without a signature takes anything, pythonified
+        self.signature = signature if signature is not None else BuiltinSignature(name)
         self.pyf = pyf
-        self.is_raw = is_raw  # Do not pythonify values -- pass the list of objects
+
+        self.validate = self.signature.validate
+        self.call = self.signature.make_caller(pyf,enc_env)
 
     def __str__(self):
         return 'primitive-procedure ' + self.name
@@ -107,51 +263,102 @@ class PythonProc(SkimpyProc):
         return [self.apply(token,exec_env,None,values), seval.EvalMessage.RESULT]
     
     def apply(self,token,exec_env,caller_id,values):
-        
-        if self.check_arg_count is not None:
-            if isinstance(self.check_arg_count,tuple):
-                min_args = self.check_arg_count[0]
-                max_args = self.check_arg_count[1]
-            else:
-                min_args = self.check_arg_count
-                max_args = self.check_arg_count
-                
-            if min_args is not None and len(values) < min_args:
-                raise SkimpyError(token, 'too few arguments for builtin procedure ' + str(self.name),exec_env)
-            if max_args is not None and len(values) > max_args:
-                raise SkimpyError(token, 'too many arguments for builtin procedure ' + str(self.name),exec_env)
-
-        if self.check_arg_types is not None:
-            # Zip helps here.  It stops checking only when either values or check_arg_types is exhausted
-            # To check varargs, make check_arg_types an infinite generator
-            idx = 0
-            for check_pair,value in zip(self.check_arg_types,values):
-                if check_pair[0] == '*' or not check_pair[1](value,idx):
-                    raise SkimpyError(token,'argument ' + str(idx) + ': wrong argument type for builtin procedure ' + str(self.name)\
-                                      + '; expected ' + check_pair[0],exec_env)
-                idx += 1
-            
         # Do not bother binding the values into the environment, it's wasted time
         # The called python function knows what it expects in values
         
         # If the python function wants to let a compound-procedure escape from it, it should use Skimpy primitives to extend enc_env
         # exactly the way it will use sdata.CompoundProc(...) to build the procedure.
-        if not self.is_raw:
-            # Pythonify all values first.  Obviously slower, but much more convenient
-            val_list = [val.pythonify() for val in values]
-            return skimpify(self.pyf((self.enc_env,exec_env), token, *val_list))
+        if self.validate is not None:
+            self.validate(token,exec_env,values)
+        result = self.call(token,exec_env,values)
+        if result.__class__ is seval.TailCall:
+            # A call apply handed back (see sbuiltins.apply_proc)
+            return result.proc.apply(result.token,result.env,None,result.values)
+        return result
+
+    def make_invoker(self,n_args):
+        # apply, specialized once for calls with n_args arguments (see CallSite).  The argument count is checked here,
+        # and only the type checks that reach the first n_args arguments are left for each call.  The invoker takes
+        # (token,exec_env,values)
+        signature = self.signature
+        if signature.count_error(None,None,n_args) is not None:
+            # Every call fails; let apply say why
+            return lambda token,exec_env,values: self.apply(token,exec_env,None,values)
+
+        invoke = signature.make_caller(self.pyf,self.enc_env,n_args)
+        checks = signature.checks_for(n_args)
+        if not checks:
+            return invoke
+
+        def type_error(token,exec_env,values):
+            for idx,type_name,test in checks:
+                if not test(values[idx],idx):
+                    return signature.type_error(token,exec_env,idx,type_name)
+
+        # One and two checks, as most builtins have, are made without a loop
+        if len(checks) == 1:
+            idx0,type_name,test0 = checks[0]
+            def checked(token,exec_env,values):
+                if not test0(values[idx0],idx0):
+                    raise type_error(token,exec_env,values)
+                return invoke(token,exec_env,values)
+        elif len(checks) == 2:
+            (idx0,type_name,test0),(idx1,type_name,test1) = checks
+            def checked(token,exec_env,values):
+                if not (test0(values[idx0],idx0) and test1(values[idx1],idx1)):
+                    raise type_error(token,exec_env,values)
+                return invoke(token,exec_env,values)
         else:
-            # In this case it's just a thin wrapper
-            return self.pyf((self.enc_env,exec_env),token,values)
+            def checked(token,exec_env,values):
+                error = type_error(token,exec_env,values)
+                if error is not None:
+                    raise error
+                return invoke(token,exec_env,values)
+        return checked
+
+# Each application caches the primitive it last called and the invoker made for it (see PythonProc.make_invoker).
+# The number of arguments at a call site never changes, so the procedure alone decides whether the invoker still fits
+class CallSite(object):
+    __slots__ = ('proc','invoker')
+
+    def __init__(self):
+        self.proc = None
+        self.invoker = None
+
+    def __reduce__(self):
+        # Procedures are not part of the program.  A call site pickles empty
+        return (CallSite,())
+
+    def call(self,proc,token,exec_env,values):
+        # As proc.apply(token,exec_env,None,values) for a PythonProc
+        if proc is not self.proc:
+            self.invoker = proc.make_invoker(len(values))
+            self.proc = proc
+        return self.invoker(token,exec_env,values)
 
 class SkimpyNumber(SkimpyValue):
+    __slots__ = ('value',)
+
     def __init__(self,value):
         self.value = value
 
     def pythonify(self):
         return self.value
 
+# Numbers are boxed in SkimpyNumbers unless unboxed_numbers is set, when they are Python ints and floats themselves and
+# arithmetic allocates nothing but its result.  Set it before preparing the environment and reading any text:
+# builtins choose their conversions when they are bound, and literals are converted when they are analyzed
+unboxed_numbers = False
+
+def make_number(value):
+    return value if unboxed_numbers else SkimpyNumber(value)
+
+def is_number(value):
+    return isinstance(value,SkimpyNumber) or value.__class__ is int or value.__class__ is float
+
 class SkimpyString(SkimpyValue):
+    __slots__ = ('value',)
+
     def __init__(self,value):
         self.value = value
 
@@ -159,6 +366,8 @@ class SkimpyString(SkimpyValue):
         return self.value
 
 class SkimpyChar(SkimpyValue):
+    __slots__ = ('value',)
+
     def __init__(self,value):
         if len(value) != 1:
             raise ValueError('A character must be of length 1')
@@ -168,6 +377,8 @@ class SkimpyChar(SkimpyValue):
         return self.value
 
 class _SkimpyBool(SkimpyValue):
+    __slots__ = ('value',)
+
     def __init__(self,value):
         self.value = value
 
@@ -180,6 +391,10 @@ class _SkimpyBool(SkimpyValue):
     def __str__(self):
         return "#t" if self.value else "#f"
 
+    def __reduce__(self):
+        # Unpickle to the one and only #t or #f
+        return "true_val" if self.value else "false_val"
+
 true_val = _SkimpyBool(True)
 false_val = _SkimpyBool(False)
 
@@ -189,15 +404,22 @@ def is_false(val):
     return isinstance(val,_SkimpyBool) and val.value == False
 
 class SkimpyEmptyList(SkimpyValue):
+    __slots__ = ()
+
     def __init__(self):
         pass
 
     def __str__(self):
         return "()"  # this is quite deliberate
 
+    def __reduce__(self):
+        return "the_empty_list"
+
 the_empty_list = SkimpyEmptyList()
 
 class SkimpySymbol(SkimpyValue):
+    __slots__ = ('symbol_name',)
+
     def __init__(self,symbol_name):
         self.symbol_name = symbol_name
 
@@ -207,11 +429,17 @@ class SkimpySymbol(SkimpyValue):
     def pythonify(self):
         return self.symbol_name  # as string
 
+    def __reduce__(self):
+        # Symbols are interned, so that eq? works on them by reference.  Unpickle through the symbol dictionary
+        return (senv.lookup_symbol,(self.symbol_name,SkimpySymbol))
+
 class ListCycleError(Exception):
     pass  # just a tag
 
 class SkimpyPair(SkimpyValue):
     # NOTE:  We don't Pythonify pairs.  x.car and x.cdr is not harder to type or read than x[0]/x[1].  It is arguably clearer here.
+    __slots__ = ('car','cdr')
+
     def __init__(self,car,cdr):
         self.car = car
         self.cdr = cdr
@@ -219,19 +447,121 @@ class SkimpyPair(SkimpyValue):
     def __str__(self):
         return self.str_for_display()
 
-    def str_for_display(self):
+    def str_for_display(self,env=None):
         try:
             return prettify_pair(self,detect_cycles=True)
         except ListCycleError:
             return '<list structure contains cycles>'
 
+# Pairs for very long lists.  In arena mode (arena_pairs), the list builder keeps the pairs of each list it builds
+# in one PairArena: columns of cars and cdrs instead of an object per pair, so that a list of a million elements is a
+# few objects for the cyclic GC instead of a million.  The pairs of a list are freed together, with the last handle
+# to any of them.  cons still makes a SkimpyPair, whose cdr may be an arena pair
+arena_pairs = False
+
+class PairArena(object):
+    # cars[i] is the car of pair i.  cdrs[i] is the index of the pair that is its cdr, or -1 if the cdr is not a pair
+    # of this arena; it is then tails[i], or the empty list if there is no entry
+    __slots__ = ('cars','cdrs','tails')
+
+    def __init__(self):
+        self.cars = []
+        self.cdrs = array('l')
+        self.tails = {}
+
+    def get_cdr(self,index):
+        next_index = self.cdrs[index]
+        if next_index == -1:
+            return self.tails.get(index,the_empty_list)
+        return ArenaPair(self,next_index)
+
+    def set_cdr(self,index,value):
+        if value.__class__ is ArenaPair and value.arena is self:
+            self.cdrs[index] = value.index
+            self.tails.pop(index,None)
+        else:
+            self.cdrs[index] = -1
+            if value is the_empty_list:
+                self.tails.pop(index,None)
+            else:
+                self.tails[index] = value
+
+# A pair of a PairArena, by index.  Handles are made as they are asked for, so two handles may stand for one pair;
+# they compare equal
+class ArenaPair(SkimpyPair):
+    __slots__ = ('arena','index')
+
+    def __init__(self,arena,index):
+        self.arena = arena
+        self.index = index
+
+    @property
+    def car(self):
+        return self.arena.cars[self.index]
+
+    @car.setter
+    def car(self,value):
+        self.arena.cars[self.index] = value
+
+    @property
+    def cdr(self):
+        return self.arena.get_cdr(self.index)
+
+    @cdr.setter
+    def cdr(self,value):
+        self.arena.set_cdr(self.index,value)
+
+    def __eq__(self,other):
+        if other.__class__ is ArenaPair:
+            return self.arena is other.arena and self.index == other.index
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self.arena),self.index))
+
+    def __reduce__(self):
+        return (ArenaPair,(self.arena,self.index))
+
 # A value that doesn't count as a return, but has a string description
 class SkimpyNonReturn(SkimpyValue):
+    __slots__ = ('tag',)
+
     def __init__(self,tag):
         self.tag = tag
 
     def __str__(self):
         return self.tag
+
+# Vectors, backed by a Python list.  They print through the pair printer, which finds cycles through them
+class SkimpyVector(SkimpyValue):
+    __slots__ = ('items',)
+
+    def __init__(self,items):
+        self.items = items
+
+    def __str__(self):
+        return self.str_for_display()
+
+    def str_for_display(self,env=None):
+        try:
+            return prettify_pair(self,detect_cycles=True)
+        except ListCycleError:
+            return '<vector structure contains cycles>'
+
+# Hash tables (SRFI-69).  entries maps the key the table's make_key function makes of each key value to the pair
+# (key value, value) as a Python tuple, so that the key values can be given back.  equivalence names the predicate
+# the table was made with
+class SkimpyHashTable(SkimpyValue):
+    __slots__ = ('equivalence','make_key','entries')
+
+    def __init__(self,equivalence,make_key):
+        self.equivalence = equivalence
+        self.make_key = make_key
+        self.entries = {}
+
+    def __str__(self):
+        return '<hash-table ' + self.equivalence + '>'
+
 # Conversions
 # NOTE:  skimpify and pythonify are shallow.  For example, lists will not turn into python lists automatically
 # For deep conversions you must implement your own functions.
@@ -241,75 +571,88 @@ class SkimpyNonReturn(SkimpyValue):
 def skimpify(python_value):
     # Represent numbers as SkimpyNumbers, strings as SkimpyStrings, and pairs -- tuples of size 2 -- as SkimpyPairs
     # Lists are not represented.  Construct lists with the list builder.
-    if isinstance(python_value,bool):
+    value_class = python_value.__class__
+    if value_class is int or value_class is float:
+        # The usual result, checked first
+        return python_value if unboxed_numbers else SkimpyNumber(python_value)
+    elif isinstance(python_value,bool):
         if python_value:
             return true_val
         else:
             return false_val
     elif isinstance(python_value,numbers.Number):
-        return SkimpyNumber(python_value)
+        return make_number(python_value)
     else:
         return python_value  # By default, return what I get (as with pythonify)
 
+def pythonify(value):
+    # As value.pythonify(), for unboxed numbers as well
+    if isinstance(value,SkimpyValue):
+        return value.pythonify()
+    return value
+
+def str_for_display(value,env):
+    # As value.str_for_display(env), for unboxed numbers as well
+    if isinstance(value,SkimpyValue):
+        return value.str_for_display(env)
+    return str(value)
+
 def skimpy_lister(first_pair):
-    if not is_list(first_pair):
+    if not isinstance(first_pair,(SkimpyPair,SkimpyEmptyList)):
         raise ValueError('skimpy_lister must be used with a list as the first argument')
-
-    pair = first_pair
-    while not isinstance(pair,SkimpyNil):
-        yield pair.car
-        pair = pair.cdr
+    return lister(first_pair)
 
 def prettify_pair(pair,detect_cycles=False):
-    # An extremely dumb pretty-printer for pairs.  Recursive, so
-    #   1) limited by the Python stack
-    #   2) strings will be allocated and discarded left and right
-    if not isinstance(pair,SkimpyPair):
+    # An extremely dumb pretty-printer for pairs, and for vectors.  It follows cdrs in a loop, so a list may be as
+    # long as memory allows, but recurses into cars and vector elements, so nesting is limited by the Python stack.
+    if not isinstance(pair,(SkimpyPair,SkimpyVector)):
         raise ValueError('prettify_pair called with non-pair')
-    
-    def pair_prettifier(obj,cycle_detector):
-        if not isinstance(obj,SkimpyPair):
-            # Just get the string rep
-            return str(obj)
 
-        # Now deal with the pair
+    def check_cycle(key,cycle_detector):
         if cycle_detector is not None:
-            if obj in cycle_detector:
+            if key in cycle_detector:
                 raise ListCycleError()
-            cycle_detector.add(obj)
+            cycle_detector.add(key)
 
-        left = obj.car
-        right = obj.cdr
-        
-        # We don't care about form_left because form_left is not specially printed (i.e. has no dot dilemma)
-        form_left = pair_prettifier(left,cycle_detector)
-        if right == the_empty_list:
-            form_right = None
-        else:
-            form_right = pair_prettifier(right,cycle_detector)            
-
-        # 2(3) = 6 possibilities for car and cdr as pairs and nonpairs
-        result_str = ""
-        if isinstance(left,SkimpyPair):
-            if form_right is None:
-                result_str = "({left_v})".format(left_v = form_left, right_v = form_right)
-            elif isinstance(right,SkimpyPair):
-                result_str = "({left_v}) {right_v}".format(left_v = form_left, right_v = form_right)
-            else:
-                result_str = "({left_v}) . {right_v}".format(left_v = form_left, right_v = form_right)
-        else:
-            if form_right is None:
-                result_str = "{left_v}".format(left_v = form_left, right_v = form_right)               
-            elif isinstance(right,SkimpyPair):
-                result_str = "{left_v} {right_v}".format(left_v = form_left, right_v = form_right)
+    def prettify_element(obj,cycle_detector):
+        if isinstance(obj,SkimpyPair):
+            return "(" + pair_prettifier(obj,cycle_detector) + ")"
+        elif obj.__class__ is SkimpyVector:
+            check_cycle(obj,cycle_detector)
+            return "#(" + " ".join([prettify_element(item,cycle_detector) for item in obj.items]) + ")"
+        return str(obj)
+
+    def pair_prettifier(obj,cycle_detector):
+        # The elements of the list from obj, without the parentheses; ". tail" if it does not end in ()
+        parts = []
+        while isinstance(obj,SkimpyPair):
+            if obj.__class__ is ArenaPair:
+                # Walk the columns of the arena, without making a handle for each pair
+                arena = obj.arena
+                cars = arena.cars
+                cdrs = arena.cdrs
+                index = obj.index
+                # A cycle inside the arena has a link back to an index at or before its own, and a cycle through
+                # other pairs enters the arena again where it did before, so only those indices are remembered
+                check_cycle((arena,index),cycle_detector)
+                while index != -1:
+                    parts.append(prettify_element(cars[index],cycle_detector))
+                    last = index
+                    index = cdrs[index]
+                    if index != -1 and index <= last:
+                        check_cycle((arena,index),cycle_detector)
+                obj = arena.tails.get(last,the_empty_list)
             else:
-                result_str = "{left_v} . {right_v}".format(left_v = form_left, right_v = form_right)
-        return result_str
+                check_cycle(obj,cycle_detector)
+                parts.append(prettify_element(obj.car,cycle_detector))
+                obj = obj.cdr
 
-    if detect_cycles:
-       return "(" + pair_prettifier(pair,set()) + ")"
-    else:
-        return "(" + pair_prettifier(pair,None) + ")"
+        if obj is not the_empty_list:
+            parts.append(".")
+            parts.append(str(obj))
+        return " ".join(parts)
+
+    return prettify_element(pair,set() if detect_cycles else None)
     
         
 # quote and unquote
@@ -323,66 +666,210 @@ def do_quote(error_token, quotable):
         else:
             return senv.lookup_symbol(parse.get_text(quotable),SkimpySymbol)
     else:
+        if parse.is_nonleaf(quotable) and parse.is_vector_literal(quotable):
+            elements = list(parse.generate_subnodes(quotable,1))
+            for element in elements:
+                if parse.is_atom(element) and parse.get_text(element) == ".":
+                    raise SkimpyError(error_token,'quote: a vector cannot have a dot')
+            return SkimpyVector([do_quote(error_token,element) for element in elements])
+
         # We have either a node or an iterator.  The iterable represents a subnode generator
-        if isinstance(quotable,parse.SkimpyConcrNonleafNode):
+        if parse.is_nonleaf(quotable):
             subnodes = parse.generate_subnodes(quotable)
         else:  # must be iterator since we pass nothing else.  expression trees contain either Nonleaf nodes or Tokens
             subnodes = quotable
 
-        first_subnode = next(subnodes,None)
-        # This is for the empty list
-        if first_subnode is None:
-            return the_empty_list
-        
-        quoted_first = do_quote(error_token,first_subnode)
-
-        second_subnode = next(subnodes,None)
-
-        if second_subnode is None:
-            # Construct a pair with the empty list at the end
-            # This is for standard list notation, (1)
-            return SkimpyPair(quoted_first,the_empty_list)
-
-        if parse.get_text(second_subnode) == ".":
-            # There must be exactly one more node
-            third_subnode = next(subnodes,None)
-            fourth_subnode = next(subnodes,None)
-
-            if third_subnode is None or fourth_subnode is not None:
+        # The elements are quoted into a list builder, so that a quoted list is built as any other (see arena_pairs)
+        elements = list(subnodes)
+        tail = the_empty_list
+        if len(elements) > 2 and parse.is_atom(elements[-2]) and parse.get_text(elements[-2]) == ".":
+            # A dotted list: exactly one value after the dot
+            tail = do_quote(error_token,elements[-1])
+            elements = elements[:-2]
+        for element in elements:
+            if parse.is_atom(element) and parse.get_text(element) == ".":
                 raise SkimpyError(error_token, 'quote: ill-formed dotted list -- there should be exactly one value after the dot')
 
-            quoted_second = do_quote(error_token,third_subnode)
-            return SkimpyPair(quoted_first,quoted_second)
-        else:
-            # The 'Python cdr' of the list will give us the right argument
-
-            # have to handle second node specially since we saw it with the generator.  A little less elegant than I would like, but..
-            quoted_second = do_quote(error_token,second_subnode)
-            quoted_rest = do_quote(error_token,subnodes)
-            #subnodes = None  # NOTE:  Keep this statement!  It means subnodes will be in an invalid state after the recursive call
+        builder = list_builder(tail)
+        builder.send(None)  # Initialize generator
+        for element in elements:
+            builder.send(do_quote(error_token,element))
+        try:
+            builder.send(None)
+        except StopIteration as result:
+            return result.value
 
-            return SkimpyPair(quoted_first,SkimpyPair(quoted_second,quoted_rest))
+# Consumer-style list builder.  The list ends in tail, by default the empty list
+def list_builder(tail=None):
+    if tail is None:
+        tail = the_empty_list
 
-# Consumer-style list builder
-def list_builder():
     element = (yield)
     # Treat first element specially
     if element is None:
-        return the_empty_list
-    else:
-        result = SkimpyPair(element, the_empty_list)
-        cursor = result
+        return tail
+
+    if arena_pairs:
+        # Each pair's cdr is the next pair of the arena
+        arena = PairArena()
+        cars = arena.cars
+        cdrs = arena.cdrs
+        while element is not None:
+            cars.append(element)
+            cdrs.append(len(cars))
+            element = (yield)
+        arena.set_cdr(len(cars) - 1,tail)
+        return ArenaPair(arena,0)
+
+    result = SkimpyPair(element, tail)
+    cursor = result
 
     element = (yield)
     while element is not None:
-        cursor.cdr = SkimpyPair(element, the_empty_list)
+        cursor.cdr = SkimpyPair(element, tail)
         cursor = cursor.cdr
         element = (yield)
 
     return result
 
+def build_list(elements,tail=None):
+    # The list of the values of an iterable, through the list builder
+    builder = list_builder(tail)
+    builder.send(None)  # Initialize generator
+    for element in elements:
+        builder.send(element)
+    try:
+        builder.send(None)
+    except StopIteration as result:
+        return result.value
+
+def list_elements(lst):
+    # The elements of lst in a Python list, and the value its last cdr holds: the empty list, unless lst is improper
+    elements = []
+    while isinstance(lst,SkimpyPair):
+        if lst.__class__ is ArenaPair:
+            arena = lst.arena
+            cars = arena.cars
+            cdrs = arena.cdrs
+            index = lst.index
+            while index != -1:
+                elements.append(cars[index])
+                last = index
+                index = cdrs[index]
+            lst = arena.tails.get(last,the_empty_list)
+        else:
+            elements.append(lst.car)
+            lst = lst.cdr
+    return elements,lst
+
+def values_equal(left,right):
+    # equal?: numbers of the same exactness, strings and characters by value, pairs and vectors by structure, and
+    # anything else by reference.  Lists are compared in a loop, nested lists and vectors recursively
+    while True:
+        if left is right:
+            return True
+        elif isinstance(left,SkimpyPair):
+            if not isinstance(right,SkimpyPair) or not values_equal(left.car,right.car):
+                return False
+            left = left.cdr
+            right = right.cdr
+        elif is_number(left):
+            if not is_number(right):
+                return False
+            left = pythonify(left)
+            right = pythonify(right)
+            return type(left) is type(right) and left == right
+        elif isinstance(left,(SkimpyString,SkimpyChar)):
+            return left.__class__ is right.__class__ and left.value == right.value
+        elif left.__class__ is SkimpyVector:
+            return right.__class__ is SkimpyVector and len(left.items) == len(right.items) and \
+                   all(values_equal(item,other) for item,other in zip(left.items,right.items))
+        else:
+            return False
+
+def values_eqv(left,right):
+    # eqv?: eq?, and numbers of the same exactness and characters by value
+    if left is right:
+        return True
+    elif is_number(left):
+        if not is_number(right):
+            return False
+        left = pythonify(left)
+        right = pythonify(right)
+        return type(left) is type(right) and left == right
+    elif left.__class__ is SkimpyChar:
+        return right.__class__ is SkimpyChar and left.value == right.value
+    return left == right  # two handles of one arena pair
+
+# Keys of the hash tables.  In an eq? table a value is its own key: symbols are interned by senv.lookup_symbol, the
+# other values hash by reference, and arena pair handles by position.  Only unboxed numbers need a key of their own,
+# so that 1 does not find 1.0
+def eq_key(value):
+    value_class = value.__class__
+    if value_class is int or value_class is float:
+        return (value_class,value)
+    return value
+
+def eqv_key(value):
+    value_class = value.__class__
+    if value_class is SkimpyNumber or value_class is SkimpyChar:
+        return (value_class,value.value.__class__,value.value)
+    return eq_key(value)
+
+# At most this many values of a key are hashed in an equal? table, so that long and cyclic lists hash in bounded time
+equal_hash_limit = 32
+
+def equal_hash(value):
+    # A hash agreeing with values_equal: pairs and vectors by structure, strings, characters and numbers by value
+    result = 0
+    pending = [value]
+    count = 0
+    while pending and count < equal_hash_limit:
+        value = pending.pop()
+        count += 1
+        if isinstance(value,SkimpyPair):
+            pending.append(value.cdr)
+            pending.append(value.car)
+            result = hash((result,SkimpyPair))
+        elif value.__class__ is SkimpyString:
+            result = hash((result,SkimpyString,value.value))
+        elif value.__class__ is SkimpyVector:
+            pending.extend(reversed(value.items[:equal_hash_limit]))
+            result = hash((result,SkimpyVector,len(value.items)))
+        else:
+            result = hash((result,eqv_key(value)))
+    return result
+
+class EqualKey(object):
+    # The key of a value in an equal? table
+    __slots__ = ('value','hash')
+
+    def __init__(self,value):
+        self.value = value
+        self.hash = equal_hash(value)
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self,other):
+        return values_equal(self.value,other.value)
+
+hash_table_keys = {'eq?':eq_key,'eqv?':eqv_key,'equal?':EqualKey}
+
 # Producer of list elements
 def lister(lst):
     while lst != the_empty_list:
-        yield lst.car
-        lst = lst.cdr
+        if lst.__class__ is ArenaPair:
+            # Walk the columns of the arena, without making a handle for each pair
+            arena = lst.arena
+            cars = arena.cars
+            cdrs = arena.cdrs
+            index = lst.index
+            while index != -1:
+                yield cars[index]
+                last = index
+                index = cdrs[index]
+            lst = arena.tails.get(last,the_empty_list)
+        else:
+            yield lst.car
+            lst = lst.cdr
@@ -1,29 +1,77 @@
 from serror import SkimpyError
 import threading
 
+# The version of each name, bumped whenever the name is bound where it was not bound before.  Such a binding may
+# shadow one that a SkimpyGlobalCache of that name holds, so the caches of the name filled under an older version are
+# refilled.  Bindings of other names leave them alone.  A name that was never bound anew is not in the dictionary
+binding_versions = {}
+
+# Statistics of the global caches, counted only while collect_cache_stats is set: counting costs about as much as
+# the lookup it measures
+collect_cache_stats = False
+cache_hits = 0
+cache_misses = 0
+
+def get_cache_stats():
+    return {"hits" : cache_hits, "misses" : cache_misses}
+
+def reset_cache_stats():
+    global cache_hits, cache_misses
+    cache_hits = 0
+    cache_misses = 0
+
+# The binding of one name in a SkimpyEnvironment.  A define of a name that is already bound replaces the value in the
+# cell, so that whoever holds the cell sees the new value at once
+class SkimpyCell(object):
+    __slots__ = ('value',)
+
+    def __init__(self,value):
+        self.value = value
+
+    def __str__(self):
+        return str(self.value)
+
 class SkimpyEnvironment(object):
+    __slots__ = ('enclosing','mapping','pmapping')
+
     # Initialize by extending an environment
     def __init__(self,enclosing=None):
         self.enclosing = enclosing
-        self.mapping = {}
+        self.mapping = {}  # Name to SkimpyCell
         # Private mappings for interpreter and python functions, inaccessible to the interpreted language
         # Initially, for stack traces (stores a ref to the caller's environment)
         self.pmapping = {}  
 
     def bind(self,key,value):
-        self.mapping[key] = value
+        cell = self.mapping.get(key)
+        if cell is not None:
+            cell.value = value
+        else:
+            self.mapping[key] = SkimpyCell(value)
+            binding_versions[key] = binding_versions.get(key,0) + 1
 
     def bind_private(self,key,value):
         self.pmapping[key] = value
         
     def find(self,key):
-        if key in self.mapping:
-            return self.mapping[key]
+        cell = self.mapping.get(key)
+        if cell is not None:
+            return cell.value
         elif self.enclosing is not None:
             return self.enclosing.find(key)
         else:
             return None
 
+    def find_cell(self,key):
+        # The cell binding key, or None if there is none or if a frame comes first (frames have no cells)
+        cell = self.mapping.get(key)
+        if cell is not None:
+            return cell
+        elif self.enclosing is not None:
+            return self.enclosing.find_cell(key)
+        else:
+            return None
+
     def find_private(self,key):
         if key in self.pmapping:
             return self.pmapping[key]
@@ -33,6 +81,122 @@ class SkimpyEnvironment(object):
     def __str__(self):
         return str_dict(self.mapping) + "|" + str_dict(self.pmapping) + ":" + str(self.enclosing)
 
+# The layout of the frames of one lambda: its arguments, then the names its body defines, each at a fixed slot.
+# Scopes nest as lambdas do, and a variable inside a lambda is resolved against them once, to a frame depth
+# and a slot (see seval.resolve_lambda)
+class SkimpyScope(object):
+    def __init__(self,argnames,defined_names=(),enclosing=None):
+        self.enclosing = enclosing
+        self.n_args = len(argnames)
+        self.names = list(argnames)
+        for name in defined_names:
+            if name not in self.names:
+                self.names.append(name)
+        self.index = {name : idx for idx,name in enumerate(self.names)}
+
+    def resolve(self,name):
+        # (depth, slot) of name, or (depth, None) if no scope binds it; depth then counts every scope
+        depth = 0
+        scope = self
+        while scope is not None:
+            slot = scope.index.get(name)
+            if slot is not None:
+                return depth,slot
+            scope = scope.enclosing
+            depth += 1
+        return depth,None
+
+# The environment of one procedure call: a fixed-size array of slots laid out by a SkimpyScope
+# It still answers bind and find by name, for define, builtins and the top level
+class SkimpyFrame(SkimpyEnvironment):
+    __slots__ = ('scope','slots','caller')
+
+    def __init__(self,enclosing,scope):
+        self.enclosing = enclosing
+        self.scope = scope
+        self.slots = [None] * len(scope.names)
+        self.mapping = None  # Names bound that the scope does not know about, e.g. by a load inside a procedure
+        # Every call binds the caller's stack frame, so it has its own slot.  Other private names are rare
+        self.caller = None
+        self.pmapping = None
+
+    def bind_private(self,key,value):
+        if key == "_cp":
+            self.caller = value
+        else:
+            if self.pmapping is None:
+                self.pmapping = {}
+            self.pmapping[key] = value
+
+    def find_private(self,key):
+        if key == "_cp":
+            return self.caller
+        elif self.pmapping is not None:
+            return self.pmapping.get(key)
+        return None
+
+    def bind(self,key,value):
+        slot = self.scope.index.get(key)
+        if slot is not None:
+            self.slots[slot] = value
+        else:
+            if self.mapping is None:
+                self.mapping = {}
+            if key not in self.mapping:
+                binding_versions[key] = binding_versions.get(key,0) + 1
+            self.mapping[key] = value
+
+    def find(self,key):
+        slot = self.scope.index.get(key)
+        if slot is not None and self.slots[slot] is not None:
+            return self.slots[slot]
+        if self.mapping is not None and key in self.mapping:
+            return self.mapping[key]
+        if self.enclosing is not None:
+            return self.enclosing.find(key)
+        return None
+
+    def find_cell(self,key):
+        return None
+
+    def __str__(self):
+        return str_dict(dict(zip(self.scope.names,self.slots))) + "|" + str_dict(self.mapping) + "|" \
+               + str_dict(dict(self.pmapping or {},_cp=self.caller)) + ":" + str(self.enclosing)
+
+# An inline cache of a variable which is looked up by name: a global, or a variable outside every lambda.
+# It holds the cell the name was found in, for the environment the lookup started from, and is good until the version
+# of the name moves on (see binding_versions)
+class SkimpyGlobalCache(object):
+    __slots__ = ('env','version','cell')
+
+    def __init__(self):
+        self.env = None
+        self.version = -1
+        self.cell = None
+
+    def __reduce__(self):
+        # A cache refers to an environment, which is not part of the program.  It pickles empty
+        return (SkimpyGlobalCache,())
+
+    def lookup(self,env,key):
+        # As env.find(key)
+        global cache_hits, cache_misses
+        if self.env is env and self.version == binding_versions.get(key,0):
+            if collect_cache_stats:
+                cache_hits += 1
+            return self.cell.value
+
+        if collect_cache_stats:
+            cache_misses += 1
+        cell = env.find_cell(key)
+        if cell is None:
+            self.env = None
+            return env.find(key)
+        self.env = env
+        self.version = binding_versions.get(key,0)
+        self.cell = cell
+        return cell.value
+
 def str_dict(dictionary):
     if dictionary is None:
         return "None"
@@ -50,15 +214,23 @@ def str_dict(dictionary):
 
 # For other kinds of arglists, such as the vararg, reimplement this function
 
+# arglist is a list of names, or the SkimpyScope of a lambda, whose arguments are then bound to the first slots
+# of a new SkimpyFrame
 def bind_arglist(call_token,env,arglist,values,rebind=False):
+    n_args = arglist.n_args if isinstance(arglist,SkimpyScope) else len(arglist)
 
     # Note: when rebinding for a tail recursion, this check ensures that we don't leave any 'stale' arguments from the previous call
-    if len(values) < len(arglist):
+    if len(values) < n_args:
         raise SkimpyError(call_token, 'too few arguments for procedure', env)
 
-    if len(values) > len(arglist):
+    if len(values) > n_args:
         raise SkimpyError(call_token, 'too many arguments for procedure', env)
 
+    if isinstance(arglist,SkimpyScope):
+        bind_env = env if rebind else SkimpyFrame(env,arglist)
+        bind_env.slots[0:n_args] = values
+        return bind_env
+
     if not rebind:
         bind_env = SkimpyEnvironment(env)
     else:
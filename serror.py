@@ -16,7 +16,24 @@ class SkimpyError(Exception):
     def __str__(self):
         return "SkimpyError: line " + str(self.line) + " col " + str(self.col) + ": " + self.reason
 
+# Where a form or an instruction came from in the text.  Forms keep this instead of the concrete node, so that
+# the concrete tree is not kept alive by the program (see seval.SkimpyForm)
+class SourcePosition(object):
+    __slots__ = ('line','col')
+
+    def __init__(self,line,col):
+        self.line = line
+        self.col = col
+
+def get_position(token):
+    # The position of a token or node of either concrete tree, or None
+    if token is None:
+        return None
+    return SourcePosition(token.line,token.col)
+
 class StackFrame(object):
+    __slots__ = ('procedure','token','env')
+
     def __init__(self,procedure,token,env):
         self.procedure = procedure
         self.token = token
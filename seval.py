@@ -1,25 +1,91 @@
 import parse
 import sdata
+import senv
 from serror import SkimpyError
+from serror import StackFrame
+from serror import get_position
 from enum import Enum
+import time
+
+# Counters for the sharing of lambda bodies (see SkimpyLambda.make_proc).  Every procedure made from a lambda shares
+# its translated body, so each one after the first is one translation avoided
+bodies_translated = 0
+translations_avoided = 0
+
+def get_lambda_stats():
+    return {"bodies_translated" : bodies_translated, "translations_avoided" : translations_avoided}
+
+def reset_lambda_stats():
+    global bodies_translated, translations_avoided
+    bodies_translated = 0
+    translations_avoided = 0
+
+code_slots = ('_code','_tail_code','_cek_code','_cek_tail_code')
 
 class EvalMessage(Enum):
     CONTINUATION = 0
     RESULT = 1
     
-# Allow for tail-optimization by passing upstream an expression to be evaluated instead of a given one
-class ContinuationException(Exception):
-    def __init__(self,form):
-        self.form = form
-
 # This module contains all the evaluation rules for Scheme, including the two most important ones, lambda and apply
+# Forms have no __dict__; each class lists its fields in __slots__.  A form keeps the position of the concrete node
+# it was made from, not the node, so that a translated program does not keep its concrete tree alive
 class SkimpyForm(object):
+    __slots__ = ('subnode_values','position','_code','_tail_code','_cek_code','_cek_tail_code')
+
     def __init__(self,form,n_subnodes=None):
         if n_subnodes is not None:
             self.subnode_values = [None] * n_subnodes
         else:
             self.subnode_values = None
-        self.original_form = form
+        self.position = get_position(form)  # For errors and stack frames
+
+        # Compiled code for the closure-compiling evaluator, in and out of tail position (see get_code)
+        self._code = None
+        self._tail_code = None
+        # And for the explicit-control machine (see get_cek_code)
+        self._cek_code = None
+        self._cek_tail_code = None
+
+    def __getstate__(self):
+        # Compiled code is closures, which do not pickle (see scache.py).  It is rebuilt when it is needed
+        return dict((slot,getattr(self,slot)) for form_class in type(self).__mro__
+                    for slot in form_class.__dict__.get('__slots__',()) if slot not in code_slots)
+
+    def __setstate__(self,state):
+        for slot,value in state.items():
+            setattr(self,slot,value)
+        for slot in code_slots:
+            setattr(self,slot,None)
+
+    def get_code(self,tail=False):
+        # The Python callable taking env which evaluates this form, compiled the first time it is asked for.
+        # Code in tail position returns a TailCall instead of making its call (see call_compiled)
+        if tail:
+            if self._tail_code is None:
+                self._tail_code = self.compile(True)
+            return self._tail_code
+        if self._code is None:
+            self._code = self.compile(False)
+        return self._code
+
+    def get_subcode(self,idx,tail=False):
+        # As make_subnode_evaluator, for compiled code
+        self.subnode_values[idx] = translate(self.subnode_values[idx])
+        return self.subnode_values[idx].get_code(tail)
+
+    def get_cek_code(self,tail=False):
+        # As get_code, for the explicit-control machine.  The code takes (env, stack) -- see cek_eval
+        if tail:
+            if self._cek_tail_code is None:
+                self._cek_tail_code = self.cek_compile(True)
+            return self._cek_tail_code
+        if self._cek_code is None:
+            self._cek_code = self.cek_compile(False)
+        return self._cek_code
+
+    def get_cek_subcode(self,idx,tail=False):
+        self.subnode_values[idx] = translate(self.subnode_values[idx])
+        return self.subnode_values[idx].get_cek_code(tail)
 
     def set_subnode(self,form,index):
         if self.subnode_values is None:
@@ -34,7 +100,7 @@ class SkimpyForm(object):
         self.subnode_values = list(iterable)
 
     def evaluate_subnode(self,env,idx):
-        eval_result,self.subnode_values[idx] = skimpy_eval(self.subnode_values[idx],env,None)
+        eval_result,self.subnode_values[idx] = skimpy_eval(self.subnode_values[idx],env)
         return eval_result
 
     def make_subnode_evaluator(self,env,idx):
@@ -59,15 +125,21 @@ class SkimpyForm(object):
         for idx in range(range_l,range_u):
             yield self.make_subnode_evaluator(env,idx)  
 
-    def evaluate_subnode_as_continuation(self,env,idx):
+    def subnode_as_continuation(self,idx):
         # Force an explicit translation of the subnode so we can cache the reference
+        # seval returns it, for skimpy_eval to evaluate in its place (see skimpy_eval)
         self.subnode_values[idx] = translate(self.subnode_values[idx])
-        # Raise a ContinuationException
-        raise ContinuationException(self.subnode_values[idx])
+        return self.subnode_values[idx]
 
     def translate_subnodes(self):
+        # Translate the immediate subnodes.  Returns how many of them were still concrete
+        translated = 0
         for idx in range(0,len(self.subnode_values)):
-            self.subnode_values[idx] = translate(self.subnode_values)
+            subnode = self.subnode_values[idx]
+            if not isinstance(subnode,SkimpyForm):
+                self.subnode_values[idx] = translate(subnode)
+                translated += 1
+        return translated
             
     def evaluate_subnodes(self,env,range_l=0,range_u=None):
         if range_u is None:
@@ -80,8 +152,11 @@ class SkimpyForm(object):
         return result_list
 
 class SkimpyLambda(SkimpyForm):
+    __slots__ = ('argnames','proc_id','force_name','scope','procs_made')
+
     def __init__(self,form,argnames,text,force_name=None):
         super(SkimpyLambda,self).__init__(form,1)
+        self.procs_made = 0
 
         self.argnames = argnames
 
@@ -93,6 +168,22 @@ class SkimpyLambda(SkimpyForm):
         #   1) Hierarchies (define within define)
         #   2) If a name is set! to something else, the procedure will wrongly remember its original name
         self.force_name = force_name
+        # The layout of the frames of the procedures made from this lambda, set when the lambda is resolved
+        self.scope = None
+
+    def prepare(self):
+        # A lambda inside another one is resolved with it; any other is resolved the first time it is evaluated
+        if self.scope is None:
+            resolve_lambda(self,None)
+        return self.scope
+
+    def make_proc(self,env):
+        # A procedure closed over env.  Its text is the body translated once for the lambda, not a copy of it
+        global translations_avoided
+        if self.procs_made:
+            translations_avoided += 1
+        self.procs_made += 1
+        return sdata.CompoundProc(env,self.generate_proc_name(),self.prepare(),self.subnode_values[0])
 
     def generate_proc_name(self):
         if self.force_name is not None:
@@ -103,56 +194,144 @@ class SkimpyLambda(SkimpyForm):
             return proc_name
 
     def make_eval(self,env):            
-        to_ret = sdata.CompoundProc(env, self.generate_proc_name(), self.argnames, self.get_subnode(0))
-        
-        return (to_ret, EvalMessage.RESULT)
+        return (self.make_proc(env), EvalMessage.RESULT)
     
         yield None  # Force this to be a generator
         
-    def seval(self,env,caller_id):
-        # The text node is not automatically translated here.  What this means is that, unless you pretranslate the form,
-        # the text will be retranslated each time a different actual procedure with a separate environment is applied.
-
-        # On the other hand, the CompoundProc object below evaluates the text and therefore caches the translation after
-        # the first evaluation.
-        to_ret = sdata.CompoundProc(env,self.generate_proc_name(), self.argnames, self.get_subnode(0))
-        return to_ret
+    def compile(self,tail):
+        # The body is compiled now, once, and shared by every procedure the lambda makes
+        self.prepare()
+        self.subnode_values[0].get_code(True)
+        return self.make_proc
+
+    def cek_compile(self,tail):
+        self.prepare()
+        self.subnode_values[0].get_cek_code(True)
+        make_proc = self.make_proc
+        return lambda env,stack: make_proc(env)
+
+    def seval(self,env):
+        # The text is translated whole and its variables resolved when the lambda is prepared (see resolve_lambda).
+        # The procedure takes the scope as its arglist, so that its calls get slot frames.
+        return self.make_proc(env)
 
 class SkimpyApply(SkimpyForm):
+    __slots__ = ('site',)
+
     def __init__(self,form,subexprs):
         # We already know form is not an atom and there are no other syntactic restrictions        
         super(SkimpyApply,self).__init__(form)
 
         # note to self: the parsed program text should be immutable
         self.subnodes(subexprs)
+        # Primitives called from here go straight to an invoker made for them (see sdata.CallSite)
+        self.site = sdata.CallSite()
 
     def make_eval(self,env):
         op_eval = self.make_subnode_evaluator(env,0)        
         op = (yield op_eval)
 
         if not isinstance(op,sdata.SkimpyProc):
-            raise SkimpyError(self.original_form, 'application: ' + str(op_to_call) + ' is not callable',env)
+            raise SkimpyError(self.position, 'application: ' + str(op_to_call) + ' is not callable',env)
         
         op_arguments = []
         for arg_eval in self.make_subnode_evaluators(env,1,None):
             result = (yield arg_eval)
             op_arguments.append(result)
 
-        applier = op.make_applier(self.original_form,env,op_arguments)
+        applier = op.make_applier(self.position,env,op_arguments)
         return (applier,EvalMessage.CONTINUATION)
 
-    def seval(self,env,caller_id):
+    def compile(self,tail):
+        op_code = self.get_subcode(0)
+        arg_codes = [self.get_subcode(idx) for idx in range(1,len(self.subnode_values))]
+        token = self.position
+        site = self.site
+
+        if tail:
+            def run(env):
+                proc = op_code(env)
+                values = [arg_code(env) for arg_code in arg_codes]
+                if proc.__class__ is sdata.PythonProc:
+                    return site.call(proc,token,env,values)
+                return TailCall(proc,token,env,values)
+        else:
+            def run(env):
+                proc = op_code(env)
+                values = [arg_code(env) for arg_code in arg_codes]
+                if proc.__class__ is sdata.PythonProc:
+                    result = site.call(proc,token,env,values)
+                    if result.__class__ is not TailCall:
+                        return result
+                    proc,values = result.proc,result.values
+                return call_compiled(proc,token,env,values)
+        return run
+
+    def cek_compile(self,tail):
+        codes = [self.get_cek_subcode(idx) for idx in range(0,len(self.subnode_values))]
+        n_codes = len(codes)
+        token = self.position
+        site = self.site
+
+        def call(values,env):
+            proc = values[0]
+            values = values[1:]
+            if proc.__class__ is sdata.PythonProc:
+                result = site.call(proc,token,env,values)
+                if result.__class__ is not TailCall:
+                    return result
+                # apply handed back its call, which is made as this one
+                proc,values = result.proc,result.values
+            if isinstance(proc,sdata.CompoundProc):
+                new_env = senv.bind_arglist(token,proc.enc_env,proc.arglist,values)
+                caller_env = env
+                if tail:
+                    # A tail call replaces the frame of its caller, and returns where that would have
+                    caller_frame = env.find_private("_cp")
+                    if caller_frame is not None:
+                        caller_env = caller_frame.env
+                new_env.bind_private("_cp",StackFrame(proc,token,caller_env))
+                return (proc.text.get_cek_code(True),new_env)
+            elif isinstance(proc,sdata.SkimpyProc):
+                return proc.apply(token,env,None,values)
+            raise SkimpyError(token, 'application: ' + str(proc) + ' is not callable',env)
+
+        def evaluate_from(values,env,stack):
+            # Evaluate the operator and operands left to right, as far as they give values without the machine
+            for idx in range(len(values),n_codes):
+                depth = len(stack)
+                value = codes[idx](env,stack)
+                if type(value) is tuple:
+                    stack.insert(depth,(resume,env,values))
+                    return value
+                values.append(value)
+            return call(values,env)
+
+        def resume(value,env,values,stack):
+            values.append(value)
+            return evaluate_from(values,env,stack)
+
+        return lambda env,stack: evaluate_from([],env,stack)
+
+    def seval(self,env):
         # Evaluate the operator, then evaluate the operands, then proceed to call the operator
         # Use the helper function in the base class
         op_to_call = self.evaluate_subnode(env,0)
 
         if not isinstance(op_to_call,sdata.SkimpyProc):
-            raise SkimpyError(self.original_form, 'application: ' + str(op_to_call) + ' is not callable',env)
+            raise SkimpyError(self.position, 'application: ' + str(op_to_call) + ' is not callable',env)
         
         op_arguments = self.evaluate_subnodes(env,1,None)
-        return op_to_call.apply(self.original_form,env,caller_id,op_arguments)
+        if op_to_call.__class__ is sdata.PythonProc:
+            return self.site.call(op_to_call,self.position,env,op_arguments)
+        elif isinstance(op_to_call,sdata.CompoundProc):
+            # Every application skimpy_eval reaches is in tail position, so skimpy_eval makes the call
+            return TailCall(op_to_call,self.position,env,op_arguments)
+        return op_to_call.apply(self.position,env,None,op_arguments)
 
 class SkimpyDefine(SkimpyForm):
+    __slots__ = ('key',)
+
     def __init__(self,form,key,expression):
         super(SkimpyDefine,self).__init__(form,1)
         self.key = parse.get_text(key)
@@ -166,13 +345,34 @@ class SkimpyDefine(SkimpyForm):
         env.bind (self.key, bound_value)
         return (sdata.SkimpyNonReturn(self.key),EvalMessage.RESULT)
         
-    def seval(self,env,caller_id):
+    def compile(self,tail):
+        value_code = self.get_subcode(0)
+        key = self.key
+
+        def run(env):
+            env.bind(key,value_code(env))
+            return sdata.SkimpyNonReturn(key)
+        return run
+
+    def cek_compile(self,tail):
+        value_code = self.get_cek_subcode(0)
+        key = self.key
+
+        def bind(value,env,state,stack):
+            env.bind(key,value)
+            return sdata.SkimpyNonReturn(key)
+
+        return lambda env,stack: cek_then(value_code,env,stack,bind)
+
+    def seval(self,env):
         bound_value = self.evaluate_subnode(env,0)
         # Add a binding to the environment
         env.bind(self.key,bound_value)
         return sdata.SkimpyNonReturn(self.key)
 
 class SkimpySequence(SkimpyForm):
+    __slots__ = ()
+
     def __init__(self,form,subexprs):
         # NOTE:  since we use sequences for syntactic neologisms which are not explicitly a 'begin' form and have no counterpart in the tree,
         # -- e.g. procedure bodies -- form might refer to an outer context
@@ -190,13 +390,46 @@ class SkimpySequence(SkimpyForm):
 
         return (self.make_subnode_evaluator(env,-1),EvalMessage.CONTINUATION)
         
-    def seval(self,env,caller_id):
+    def compile(self,tail):
+        last_node = len(self.subnode_values)-1
+        statement_codes = [self.get_subcode(idx) for idx in range(0,last_node)]
+        last_code = self.get_subcode(last_node,tail)
+
+        def run(env):
+            for statement_code in statement_codes:
+                statement_code(env)
+            return last_code(env)
+        return run
+
+    def cek_compile(self,tail):
+        last_node = len(self.subnode_values)-1
+        codes = [self.get_cek_subcode(idx) for idx in range(0,last_node)]
+        codes.append(self.get_cek_subcode(last_node,tail))
+
+        def evaluate_from(idx,env,stack):
+            while idx < last_node:
+                depth = len(stack)
+                value = codes[idx](env,stack)
+                if type(value) is tuple:
+                    stack.insert(depth,(resume,env,idx + 1))
+                    return value
+                idx += 1
+            return codes[last_node](env,stack)
+
+        def resume(value,env,idx,stack):
+            return evaluate_from(idx,env,stack)
+
+        return lambda env,stack: evaluate_from(0,env,stack)
+
+    def seval(self,env):
         # Evaluate everything but the last node, then make the last node a continuation
         last_node = len(self.subnode_values)-1
         self.evaluate_subnodes(env,0,last_node)
-        self.evaluate_subnode_as_continuation(env,last_node)
+        return self.subnode_as_continuation(last_node)
 
 class SkimpyIf(SkimpyForm):
+    __slots__ = ()
+
     def __init__(self,form,cond,consequence,alternative):
         if alternative is not None:
             n_subnodes = 3
@@ -221,26 +454,65 @@ class SkimpyIf(SkimpyForm):
             if len(self.subnode_values) > 2:
                 return (self.make_subnode_evaluator(env,2), EvalMessage.CONTINUATION) 
             else:
-                return sdata.false_value
+                return (sdata.false_val,EvalMessage.RESULT)
     
-    def seval(self,env,caller_id):
+    def compile(self,tail):
+        cond_code = self.get_subcode(0)
+        consequent_code = self.get_subcode(1,tail)
+        is_false = sdata.is_false
+
+        if len(self.subnode_values) > 2:
+            alternative_code = self.get_subcode(2,tail)
+            def run(env):
+                if not is_false(cond_code(env)):
+                    return consequent_code(env)
+                return alternative_code(env)
+        else:
+            false_val = sdata.false_val
+            def run(env):
+                if not is_false(cond_code(env)):
+                    return consequent_code(env)
+                return false_val
+        return run
+
+    def cek_compile(self,tail):
+        cond_code = self.get_cek_subcode(0)
+        consequent_code = self.get_cek_subcode(1,tail)
+        if len(self.subnode_values) > 2:
+            alternative_code = self.get_cek_subcode(2,tail)
+        else:
+            false_val = sdata.false_val
+            alternative_code = lambda env,stack: false_val
+        is_false = sdata.is_false
+
+        def branch(value,env,state,stack):
+            if not is_false(value):
+                return consequent_code(env,stack)
+            return alternative_code(env,stack)
+
+        return lambda env,stack: cek_then(cond_code,env,stack,branch)
+
+    def seval(self,env):
         cond_result = self.evaluate_subnode(env,0)
 
         if not sdata.is_false(cond_result):
-            self.evaluate_subnode_as_continuation(env,1)
+            return self.subnode_as_continuation(1)
         else:
             # Evaluating alternative
             if len(self.subnode_values) > 2:
-                self.evaluate_subnode_as_continuation(env,2)
+                return self.subnode_as_continuation(2)
             else:
-                return sdata.false_v
+                return sdata.false_val
 
 class QualifierType(Enum):
     Q_OR = 0
     Q_AND = 1
 
 class SkimpyQualifier(SkimpyForm):
+    __slots__ = ('qualifier_type',)
+
     def __init__(self,form,subexpressions,qualifier_type):
+        super(SkimpyQualifier,self).__init__(form)
         self.subnodes(subexpressions)
         self.qualifier_type = qualifier_type
 
@@ -255,11 +527,62 @@ class SkimpyQualifier(SkimpyForm):
                     return (result,EvalMessage.RESULT)
             else:  # AND
                 if sdata.is_false(result):
-                    return sdata.false_val            
+                    return (sdata.false_val,EvalMessage.RESULT)
 
         return (self.make_subnode_evaluator(env,-1),EvalMessage.CONTINUATION)
     
-    def seval(self,env,caller_id):
+    def compile(self,tail):
+        is_or = self.qualifier_type == QualifierType.Q_OR
+        last_node = len(self.subnode_values)-1
+        test_codes = [self.get_subcode(idx) for idx in range(0,last_node)]
+        last_code = self.get_subcode(last_node,tail)
+        is_false = sdata.is_false
+
+        if is_or:
+            def run(env):
+                for test_code in test_codes:
+                    result = test_code(env)
+                    if not is_false(result):
+                        return result
+                return last_code(env)
+        else:
+            false_val = sdata.false_val
+            def run(env):
+                for test_code in test_codes:
+                    if is_false(test_code(env)):
+                        return false_val
+                return last_code(env)
+        return run
+
+    def cek_compile(self,tail):
+        is_or = self.qualifier_type == QualifierType.Q_OR
+        last_node = len(self.subnode_values)-1
+        codes = [self.get_cek_subcode(idx) for idx in range(0,last_node)]
+        codes.append(self.get_cek_subcode(last_node,tail))
+        is_false = sdata.is_false
+        false_val = sdata.false_val
+
+        def test(value,env,idx,stack):
+            # value is that of codes[idx], which is not the last
+            if is_false(value) != is_or:
+                return value if is_or else false_val
+            return evaluate_from(idx + 1,env,stack)
+
+        def evaluate_from(idx,env,stack):
+            while idx < last_node:
+                depth = len(stack)
+                value = codes[idx](env,stack)
+                if type(value) is tuple:
+                    stack.insert(depth,(test,env,idx))
+                    return value
+                if is_false(value) != is_or:
+                    return value if is_or else false_val
+                idx += 1
+            return codes[last_node](env,stack)
+
+        return lambda env,stack: evaluate_from(0,env,stack)
+
+    def seval(self,env):
         # Short-circuit evaluation
         last_node_idx = len(self.subnode_values)-1
         for idx in range(0,last_node_idx):
@@ -273,11 +596,13 @@ class SkimpyQualifier(SkimpyForm):
                     return sdata.false_val
 
         # Last node should be tossed up as a continuation in both cases
-        self.evaluate_subnode_as_continuation(env,last_node_idx)
+        return self.subnode_as_continuation(last_node_idx)
         
 # A form-wrapper around a literal value.
 # It must be converted to a python value before it is bound.
 class SkimpyLiteral(SkimpyForm):
+    __slots__ = ('_v',)
+
     def __init__(self,form,value):
         super(SkimpyLiteral,self).__init__(form)
         # form must be an atom/token representing a value that can be wrapped in factory
@@ -288,36 +613,149 @@ class SkimpyLiteral(SkimpyForm):
         return (self._v,EvalMessage.RESULT)
         yield None
     
-    def seval(self,env,caller_id):
+    def compile(self,tail):
+        value = self._v
+        return lambda env: value
+
+    def cek_compile(self,tail):
+        value = self._v
+        return lambda env,stack: value
+
+    def seval(self,env):
         return self._v
 
 # A form-wrapper around a Scheme symbol or variable
 class SkimpyVariable(SkimpyForm):
+    __slots__ = ('varname','depth','slot','cache')
+
     def __init__(self,form):
         super(SkimpyVariable,self).__init__(form)       
         self.varname = parse.get_text(form)
+        # The lexical address, set by resolve_lambda for a variable inside a lambda.  The variable is in slot
+        # self.slot of the frame self.depth levels up.  With no slot, the variable is free: it is looked up by name
+        # from the environment just outside all the frames, i.e. usually the globals.  With no depth, it was never
+        # resolved, and it is looked up by name from the start
+        self.depth = None
+        self.slot = None
+        # For a variable looked up by name (see senv.SkimpyGlobalCache)
+        self.cache = senv.SkimpyGlobalCache()
+
+    def resolve(self,scope):
+        self.depth,self.slot = scope.resolve(self.varname)
+
+    def lookup(self,env):
+        depth = self.depth
+        if depth is not None:
+            # A frame on the way may have the name in its mapping (bound by a load inside a procedure, say), which
+            # comes first, as in SkimpyFrame.find
+            varname = self.varname
+            for level in range(depth):
+                mapping = env.mapping
+                if mapping is not None and varname in mapping:
+                    return mapping[varname]
+                env = env.enclosing
+            if self.slot is not None:
+                binding = env.slots[self.slot]
+            else:
+                binding = self.cache.lookup(env,self.varname)
+        else:
+            binding = self.cache.lookup(env,self.varname)
 
-    def make_eval(self,env):
-        binding = env.find(self.varname)
         if binding is None:
-            raise SkimpyError(self.original_form, 'unbound variable in this context: ' + self.varname,env)
+            raise SkimpyError(self.position, 'unbound variable in this context: ' + self.varname,env)
+        return binding
 
-        return (binding,EvalMessage.RESULT)
+    def make_eval(self,env):
+        return (self.lookup(env),EvalMessage.RESULT)
         yield None
         
-    def seval(self,env,caller_id):
-        binding = env.find(self.varname)
-        if binding is None:
-            raise SkimpyError(self.original_form, 'unbound variable in this context: ' + self.varname,env)
-
-        return binding
+    def compile(self,tail):
+        varname = self.varname
+        form = self.position
+        depth = self.depth
+        slot = self.slot
+
+        if slot is not None and depth == 0:
+            def run(env):
+                binding = env.slots[slot]
+                if binding is None:
+                    raise SkimpyError(form, 'unbound variable in this context: ' + varname,env)
+                return binding
+        elif depth is not None and slot is None:
+            cache_lookup = self.cache.lookup
+            def run(env):
+                frame_env = env
+                for level in range(depth):
+                    mapping = frame_env.mapping
+                    if mapping is not None and varname in mapping:
+                        return mapping[varname]
+                    frame_env = frame_env.enclosing
+                binding = cache_lookup(frame_env,varname)
+                if binding is None:
+                    raise SkimpyError(form, 'unbound variable in this context: ' + varname,env)
+                return binding
+        elif depth is not None:
+            lookup = self.lookup
+            def run(env):
+                return lookup(env)
+        else:
+            cache_lookup = self.cache.lookup
+            def run(env):
+                binding = cache_lookup(env,varname)
+                if binding is None:
+                    raise SkimpyError(form, 'unbound variable in this context: ' + varname,env)
+                return binding
+        return run
+
+    def cek_compile(self,tail):
+        code = self.get_code(tail)  # Never needs the machine
+        return lambda env,stack: code(env)
+
+    def seval(self,env):
+        return self.lookup(env)
     
 
+def find_defined_names(body):
+    # The names defined by the body of a lambda, wherever they are in it but outside the lambdas nested in it.
+    # body is translated
+    defined_names = []
+    form_stack = [body]
+    while form_stack:
+        current = form_stack.pop()
+        if isinstance(current,SkimpyDefine):
+            defined_names.append(current.key)
+        if current.subnode_values and not isinstance(current,SkimpyLambda):
+            form_stack.extend(reversed(current.subnode_values))
+    return defined_names
+
+def resolve_lambda(lambda_form,enclosing_scope):
+    # Lexical addressing.  Translate the body of lambda_form whole, lay out the frames of its procedures in a
+    # SkimpyScope enclosed by enclosing_scope, and resolve every variable in the body to a frame depth and slot.
+    # Lambdas in the body are resolved in turn, so this is done once for a whole nest of lambdas
+    global bodies_translated
+    bodies_translated += 1
+    body = preprocess(lambda_form.subnode_values[0])
+    lambda_form.subnode_values[0] = body
+
+    # A define in the body is the only way to add a name to a frame.  It gets its own slot
+    scope = senv.SkimpyScope(lambda_form.argnames,find_defined_names(body),enclosing_scope)
+    lambda_form.scope = scope
+
+    form_stack = [body]
+    while form_stack:
+        current = form_stack.pop()
+        if isinstance(current,SkimpyVariable):
+            current.resolve(scope)
+        elif isinstance(current,SkimpyLambda):
+            resolve_lambda(current,scope)
+        elif current.subnode_values:
+            form_stack.extend(current.subnode_values)
+
 def analyze_proc_body(ref_form,form_iterator):
     proc_body_list = list(form_iterator)  # this makes sense because we will use these one way or another
 
     if not proc_body_list:
-        raise SkimpyException(ref_form, 'empty procedure body')
+        raise SkimpyError(ref_form, 'empty procedure body')
     elif len(proc_body_list) == 1:
         return proc_body_list[0]
     else:
@@ -326,6 +764,8 @@ def analyze_proc_body(ref_form,form_iterator):
 
 def analyze_lambda(form):
         # Build up the AST entry for the procedure
+        if len(form.text) < 2:
+            raise SkimpyError(form, 'lambda: invalid syntax')
         arglist_node = parse.get_subnode(form,1)
 
         if arglist_node is None or parse.is_atom(arglist_node):
@@ -346,8 +786,8 @@ def analyze_let(form):
     # Let's extract the parts
     # NOTE:  There are more efficient as-if ways to do this.  I will consider a special SkimpyLet.
     
-    # TODO: Syntax checks
-    
+    if len(form.text) < 2 or parse.is_atom(parse.get_subnode(form,1)):
+        raise SkimpyError(form, 'let: invalid syntax')
     binding_list = parse.get_subnode(form,1)
     text = parse.generate_subnodes(form,2)
     
@@ -356,6 +796,8 @@ def analyze_let(form):
     # Go through the bindings, adding variable names to the argument list (see analyze_define) and
     # expressions to the application list
     for node in parse.generate_subnodes(binding_list):
+        if parse.is_atom(node) or len(node.text) != 2 or not parse.is_varname(parse.get_subnode(node,0)):
+            raise SkimpyError(form, 'let: invalid syntax in bindings')
         argnames.append (parse.get_text(parse.get_subnode(node,0)))
         apply_list.append (parse.get_subnode(node,1))
 
@@ -399,21 +841,28 @@ def analyze_apply(form):
     return SkimpyApply(form, parse.generate_subnodes(form))
 
 def analyze_if(form):
+    # The alternative is optional, and the rest must be there
+    n_subnodes = len(form.text)
+    if n_subnodes < 3 or n_subnodes > 4:
+        raise SkimpyError(form, 'ill-formed if')
+
     cond = parse.get_subnode(form,1)
     consequent = parse.get_subnode(form,2)
-    alternative = parse.get_subnode(form,3)
-
-    if cond is None or consequent is None:
-        raise SkimpyError(form, 'ill-formed if')
+    alternative = parse.get_subnode(form,3) if n_subnodes == 4 else None
 
     return SkimpyIf(form,cond,consequent,alternative)
 
 def analyze_cond(form):
     # Build up a list of conditions and consequents
     # We can simplify everything by building up a chain of ifs-elses from the last alternative
-    # This is not bad in computation either because ifs raise ContinuationExceptions.
+    # This is not bad in computation either because ifs hand their branches back to skimpy_eval as continuations.
 
-    # TODO:  Syntax checks!!!!
+    # Every clause is a test and an expression
+    if len(form.text) < 2:
+        raise SkimpyError(form, 'ill-formed cond')
+    for clause in parse.generate_subnodes(form,1):
+        if parse.is_atom(clause) or len(clause.text) < 2:
+            raise SkimpyError(form, 'ill-formed cond')
 
     last_cond = parse.get_subnode(form,-1)
 
@@ -432,21 +881,27 @@ def analyze_cond(form):
     return alternative
 
 def analyze_or(form):
+    if len(form.text) == 1:
+        return SkimpyLiteral(form,sdata.false_val)  # (or) is false
     return SkimpyQualifier(form, parse.generate_subnodes(form,1), QualifierType.Q_OR)
 
 def analyze_and(form):
+    if len(form.text) == 1:
+        return SkimpyLiteral(form,sdata.true_val)  # (and) is true
     return SkimpyQualifier(form, parse.generate_subnodes(form,1), QualifierType.Q_AND)
 
 def get_literal_contents(form):
-    if parse.is_number(form):
-        return sdata.SkimpyNumber(parse.to_number(form))
-    elif parse.is_string(form):
-        return sdata.SkimpyString(parse.to_python_string(form))
-    elif parse.is_boolean(form):
-        if parse.to_python_boolean(form):
+    # The token carries its kind and its converted value from the lexer
+    kind = form.kind
+    if kind == parse.TokenKind.INTEGER or kind == parse.TokenKind.FLOAT:
+        return sdata.make_number(form.value)
+    elif kind == parse.TokenKind.STRING:
+        return sdata.SkimpyString(form.value)
+    elif kind == parse.TokenKind.BOOLEAN:
+        if form.value:
             return sdata.true_val
         else:
-            return sdata.true_val
+            return sdata.false_val
 
 def analyze_literal(form):
     return SkimpyLiteral(form,get_literal_contents(form))
@@ -470,6 +925,10 @@ def analyze_quote(form):
     
     return SkimpyLiteral(form,sdata.do_quote(form,quoted_form))
 
+def analyze_vector(form):
+    # A vector literal #(...) evaluates to itself, as if quoted
+    return SkimpyLiteral(form,sdata.do_quote(form,form))
+
 # Initialize a module-level dictionary mapping token values to factories (classes)
 special_map = {"lambda" : analyze_lambda,
                "define" : analyze_define,
@@ -479,19 +938,27 @@ special_map = {"lambda" : analyze_lambda,
                "let" : analyze_let,
                "or" : analyze_or,
                "and" : analyze_and,
-               "quote" : analyze_quote}
+               "quote" : analyze_quote,
+               "#(" : analyze_vector}
+
+# Atoms are dispatched on the kind the lexer gave their token
+atom_factories = {parse.TokenKind.IDENTIFIER : SkimpyVariable,  # The constructor just takes form
+                  parse.TokenKind.INTEGER : analyze_literal,
+                  parse.TokenKind.FLOAT : analyze_literal,
+                  parse.TokenKind.STRING : analyze_literal,
+                  parse.TokenKind.BOOLEAN : analyze_literal}
 
 def get_form_factory(form):
     # Check the map, then check the conditionss
     if not parse.is_atom(form):
-        if form.parent is None:
+        if parse.is_root(form):
             # Analyze the root by building a sequence
             return analyze_implicit_sequence
         
         # All special forms begin with a first element
-        first_element = parse.get_subnode(form,0)
-        if first_element is None:
+        if not len(form.text):
             raise SkimpyError(form, 'unexpected empty form ()')
+        first_element = parse.get_subnode(form,0)
 
         if parse.is_atom(first_element):
             element_text = parse.get_text(first_element)
@@ -501,10 +968,7 @@ def get_form_factory(form):
         # If nothing else works, treat this as an application
         return analyze_apply
     else:
-        if parse.is_literal(form):
-            return analyze_literal
-        else:
-            return SkimpyVariable # In this case we can return the class name because the constructor just takes form            
+        return atom_factories[form.kind]
 
 def translate(form):
     # translate() will return the object it gets if it's already a SkimpyForm
@@ -519,22 +983,119 @@ def translate(form):
     else:
         return form
 
-def preprocess(form):
-    # Preprocess a concrete tree into an abstract one
-    # This is called on the root of a program, so let's handle it specially
-    tree_stack = []
+# Totals of the eager analysis pass, accumulated over however many forms are handed to preprocess
+class AnalysisStats(object):
+    def __init__(self):
+        self.forms = 0
+        self.nodes = 0
+        self.seconds = 0.0
+
+    def __str__(self):
+        return 'analyzed ' + str(self.forms) + ' forms (' + str(self.nodes) + ' nodes translated) in ' \
+               + str(round(self.seconds,6)) + 's'
 
-    for node in parse.generate_subnodes(form):
-        tree_stack.append(translate(node))
+def preprocess(form,stats=None):
+    # Preprocess a concrete tree into an abstract one, eagerly: every node reachable from form is translated,
+    # including procedure bodies, so that evaluation never stops to translate.
+    # Returns the translated form.  If stats (an AnalysisStats) is given, the work done is added to it
+    start_time = time.perf_counter()
+
+    n_translated = 0 if isinstance(form,SkimpyForm) else 1
+    translated_form = translate(form)
+    tree_stack = [translated_form]
 
     while tree_stack:
         current = tree_stack.pop()
-        # Translate and push
+        # Literals and variables have no subnodes
         if current.subnode_values:
-            current.translate_subnodes()
+            n_translated += current.translate_subnodes()
             tree_stack.extend(current.subnode_values)
 
+    if stats is not None:
+        stats.forms += 1
+        stats.nodes += n_translated
+        stats.seconds += time.perf_counter() - start_time
+
+    return translated_form
+
+# What compiled code in tail position returns instead of making its call, and what SkimpyApply.seval returns for a
+# compound procedure.  The trampolines in call_compiled and skimpy_eval make it, so that tail calls of every kind
+# (not only a procedure calling itself) run in constant Python stack
+class TailCall(object):
+    __slots__ = ('proc','token','env','values')
+
+    def __init__(self,proc,token,env,values):
+        self.proc = proc
+        self.token = token
+        self.env = env
+        self.values = values
+
+def call_compiled(proc,token,env,values):
+    # Apply proc to values for compiled code called from env
+    caller_env = env
+    while True:
+        if isinstance(proc,sdata.CompoundProc):
+            new_env = senv.bind_arglist(token,proc.enc_env,proc.arglist,values)
+            # A tail call replaces its caller's frame, so frames always point back to the caller that is waiting
+            new_env.bind_private("_cp",StackFrame(proc,token,caller_env))
+
+            result = proc.text.get_code(True)(new_env)
+            if not isinstance(result,TailCall):
+                return result
+            proc,token,env,values = result.proc,result.token,result.env,result.values
+        elif isinstance(proc,sdata.SkimpyProc):
+            return proc.apply(token,env,None,values)
+        else:
+            raise SkimpyError(token, 'application: ' + str(proc) + ' is not callable',env)
+
+def compiled_eval(skimpy_form,env):
+    # The closure-compiling evaluator.  In the manner of SICP's analyze, each form is compiled once, with its subforms,
+    # into a Python closure taking the environment (see the compile methods above), and evaluation only calls closures.
+    # Nothing is dispatched or translated at run time, and tail calls are made by a trampoline (see call_compiled)
+    return translate(skimpy_form).get_code()(env)
+
+def cek_then(code,env,stack,continuation,state=None):
+    # Evaluate code in env and hand the value to continuation(value,env,state,stack), which gives a value or a request.
+    # If code needs the machine, the continuation is left on the stack beneath whatever code pushed
+    depth = len(stack)
+    value = code(env,stack)
+    if type(value) is tuple:
+        stack.insert(depth,(continuation,env,state))
+        return value
+    return continuation(value,env,state,stack)
+
 def explicit_eval(skimpy_form,env):
+    # The explicit-control evaluator: a CEK machine, whose control is code compiled from the forms (see the cek_compile
+    # methods), whose environment is the SkimpyEnvironment, and whose continuation is a Python list of frames.
+    # Code takes (env, stack) and gives a value, or a request (code, env) for the machine to evaluate next.  A form
+    # whose subexpression asks for the machine pushes a frame (continuation, env, state) under the frames the
+    # subexpression pushed, and passes the request up; when the machine has a value it pops the top frame and calls
+    # continuation(value, env, state, stack).
+    # Code runs its subexpressions directly in Python, so simple expressions -- variables, literals, calls of builtins --
+    # never touch the stack.  But this nests only as deep as the text: a call of a compound procedure is always a
+    # request, so the depth of recursion in Scheme is limited only by memory.  A request from tail position pushes
+    # nothing, so tail calls run in constant space.
+    # Builtins such as map call procedures back through skimpy_eval.  While the machine runs, the hybrid limit is 0, so
+    # that skimpy_eval hands those calls straight to a machine of their own and they are as deep as memory allows too
+    global hybrid_depth_limit
+    previous_limit = hybrid_depth_limit
+    hybrid_depth_limit = 0
+    try:
+        stack = []
+        result = translate(skimpy_form).get_cek_code()(env,stack)
+        while True:
+            if type(result) is tuple:
+                result = result[0](result[1],stack)
+            elif stack:
+                continuation,frame_env,state = stack.pop()
+                result = continuation(result,frame_env,state,stack)
+            else:
+                return result
+    finally:
+        hybrid_depth_limit = previous_limit
+
+def generator_eval(skimpy_form,env):
+    # The first explicit evaluator, which the machine above replaces.  It is slow, but left in as a reference.
     # The explicit evaluator does not use the Python stack for evaluation
     # Instead it uses its own stack and signals.  It treats each form as a factory for evaluators.  It communicates
     # with evaluators using send(), i.e. make_eval can be a generator
@@ -570,7 +1131,26 @@ def explicit_eval(skimpy_form,env):
                 
     return returned_result
 
-def skimpy_eval(skimpy_form,env,caller_id = None):
+# The hybrid evaluator (see hybrid_eval).  eval_depth is how deeply skimpy_eval is nested.  When it reaches
+# hybrid_depth_limit, skimpy_eval hands the form to the explicit machine instead; None means never
+eval_depth = 0
+hybrid_depth_limit = None
+default_hybrid_depth = 150  # Each level of skimpy_eval is about three Python frames; Python allows 1000 by default
+handovers = 0
+
+def hybrid_eval(skimpy_form,env,depth_limit=None):
+    # Evaluate on skimpy_eval, which is fast, as long as the nesting stays below depth_limit.  A subcomputation that
+    # would nest deeper runs on explicit_eval, which has no limit, and the computation returns to skimpy_eval when it
+    # has its value.  The counter handovers says how often that happened
+    global hybrid_depth_limit
+    previous_limit = hybrid_depth_limit
+    hybrid_depth_limit = depth_limit if depth_limit is not None else default_hybrid_depth
+    try:
+        return skimpy_eval(skimpy_form,env)[0]
+    finally:
+        hybrid_depth_limit = previous_limit
+
+def skimpy_eval(skimpy_form,env):
 
     # In this interpreter, the form classes above delimit evaluation rules for various parts.
     # Form objects are nodes -- either in the concrete tree of tokens built by parse.skimpy_scan, or the AST nodes that derive from
@@ -590,24 +1170,44 @@ def skimpy_eval(skimpy_form,env,caller_id = None):
     # i.e. to translate eagerly (and greedily).  In this case form will always be an AST node.  See recursive_translate() below.
 
     # NOTE regarding continuations:
-    # To facilitate tail recursion, we can return control here with an exception instead of calling this function recursively
-    # The caller_id value passed in during procedure application will be equal to the procedure object.  Thus if some
-    # subexpression simplifies to a recursive call to the same function, we will rebind the arguments in the environment
-    # and return here, instead of getting deeper into the recursion.
+    # This function is a trampoline.  When the result of a form is the result of one of its subforms -- the branch of
+    # an if, the last form of a sequence, and so on -- seval returns the subform instead of evaluating it, and the loop
+    # below evaluates it in the same environment.  A call of a compound procedure is returned as a TailCall, and the loop
+    # binds the arguments and evaluates the body.  Every call in tail position, to any procedure, therefore runs here
+    # instead of deeper in the Python stack.  Only subexpressions whose values are still needed recurse.
 
-    # (Exceptions in Python must be fairly performant; StopIteration is still used to signal the end of any iteration.)
-
-    final_eval = False
+    global eval_depth, handovers
     original_translated_form = translate(skimpy_form)
-
-    translated_form = original_translated_form
-    while not final_eval:
-        try:
-            to_return = translated_form.seval(env,caller_id)
-            final_eval = True
-        except ContinuationException as ce:
-            # replace the form
-            skimpy_form = ce.form
-            translated_form = translate(skimpy_form)
-
-    return (to_return, original_translated_form)
+    if hybrid_depth_limit is not None and eval_depth >= hybrid_depth_limit and original_translated_form.subnode_values:
+        # Variables and literals, which cannot nest, stay here
+        handovers += 1
+        return (explicit_eval(original_translated_form,env), original_translated_form)
+
+    caller_env = env
+    eval_depth += 1
+    try:
+        translated_form = original_translated_form
+        while True:
+            to_return = translated_form.seval(env)
+            if isinstance(to_return,SkimpyForm):
+                translated_form = to_return
+            elif isinstance(to_return,TailCall):
+                proc = to_return.proc
+                if not isinstance(proc,sdata.CompoundProc):
+                    # apply handed back a call of a procedure of another evaluator
+                    return (proc.apply(to_return.token,to_return.env,None,to_return.values), original_translated_form)
+                env = senv.bind_arglist(to_return.token,proc.enc_env,proc.arglist,to_return.values)
+                # A tail call replaces its caller's frame, so frames always point back to the caller that is waiting
+                env.bind_private("_cp",StackFrame(proc,to_return.token,caller_env))
+                translated_form = proc.text
+            else:
+                return (to_return, original_translated_form)
+    finally:
+        eval_depth -= 1
+
+# The evaluators by name, each taking a form and an environment and returning the value (see sloop)
+evaluators = {"recursive" : lambda form,env: skimpy_eval(form,env)[0],
+              "explicit" : explicit_eval,
+              "generator" : generator_eval,
+              "compiled" : compiled_eval,
+              "hybrid" : hybrid_eval}
@@ -8,14 +8,34 @@ import fileinput
 import sys
 import time
 import serror
+import scache
+import svm
+import argparse
 from serror import SkimpyError
 
-def execute_code(text,env,recipient):
-    tree = parse.skimpy_scan(text)
+def execute_code(text,env,recipient,compact=False,analysis=None,evaluator="recursive"):
+    # Forms are evaluated as soon as the reader closes them, so reading and evaluation are interleaved
+    # With compact, the concrete tree is kept in the compact, offset-based representation (see parse.py)
+    # With analysis (an seval.AnalysisStats), each form is translated whole before it is evaluated, and the
+    # work is totalled in analysis.  Otherwise forms are translated lazily, as evaluation reaches them
+    # evaluator names one of seval.evaluators
+    evaluate = seval.evaluators[evaluator]
+    reader = parse.skimpy_read_compact(text) if compact else parse.skimpy_read(text)
+    for subnode in reader:
+        try:
+            if analysis is not None:
+                subnode = seval.preprocess(subnode,analysis)
+            result = evaluate(subnode,env)
+            recipient(result)
+        except Exception as e:
+            recipient(e)
 
-    for subnode in parse.generate_subnodes(tree):
+def execute_forms(forms,env,recipient,evaluator="recursive"):
+    # As execute_code, for forms which are already read (and possibly translated), e.g. from scache
+    evaluate = seval.evaluators[evaluator]
+    for form in forms:
         try:
-            result = seval.skimpy_eval(subnode,env)[0]
+            result = evaluate(form,env)
             recipient(result)
         except Exception as e:
             recipient(e)
@@ -23,17 +43,22 @@ def execute_code(text,env,recipient):
 def receive_to_print(eval_result):
     print ('>> ' + str(eval_result) + '\n')
 
-def run_file(env,filename):
+def run_file(env,filename,use_cache=True,analysis=None,evaluator="recursive"):
     # As above but interactive from the interpreter
+    # Through the cache, a file is always analyzed whole when it is loaded (see scache.py).  Without it, the file is
+    # read and run as by execute_code, in compact mode, and analysis has the same meaning
     if not os.path.isfile(filename):
         raise ValueError('could not find file ' + filename)
 
-    ptext = None
-    with open(filename,'r') as prog_file:
-            ptext = prog_file.read()
-
     # NOTE:  We execute file inside the current environment, not the top-level
-    execute_code(ptext,env,receive_to_print)
+    if filename.endswith(".skb"):
+        # A module compiled for the bytecode machine (see svm.py), which runs on it whatever the evaluator
+        svm.run_module(svm.load_module(filename),env,receive_to_print)
+    elif use_cache:
+        execute_forms(scache.load_forms(filename,analysis),env,receive_to_print,evaluator)
+    else:
+        # The file is mapped into memory and read in place, as the cache reads it
+        execute_code(parse.map_source(filename),env,receive_to_print,compact=True,analysis=analysis,evaluator=evaluator)
 
 def prepare():
     # Creates a new global environment and adds bindings for
@@ -46,15 +71,34 @@ def prepare():
     return global_env
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description='Run a Scheme file')
+    arg_parser.add_argument('file_name',nargs='?',default="C:\\Users\\vkramer\\Documents\\skimpy_test.scm")
+    arg_parser.add_argument('--no-cache',action='store_true',help='do not read or write __skimpycache__')
+    arg_parser.add_argument('--analyze',action='store_true',
+                            help='translate every form ahead of evaluation and report the work done')
+    arg_parser.add_argument('--evaluator',choices=sorted(seval.evaluators),default="recursive",
+                            help='the evaluation engine (default: recursive)')
+    arg_parser.add_argument('--hybrid-depth',type=int,default=None,
+                            help='for the hybrid evaluator, the nesting at which it switches to the explicit one')
+    arg_parser.add_argument('--cache-stats',action='store_true',help='count and report global cache hits and misses')
+    arg_parser.add_argument('--unboxed',action='store_true',help='represent numbers as Python ints and floats')
+    arg_parser.add_argument('--arena-pairs',action='store_true',help='keep the pairs of each list built in one arena')
+    args = arg_parser.parse_args()
+    senv.collect_cache_stats = args.cache_stats
+    sdata.unboxed_numbers = args.unboxed
+    sdata.arena_pairs = args.arena_pairs
     global_env = prepare()
+    if args.hybrid_depth is not None:
+        seval.default_hybrid_depth = args.hybrid_depth
 
-    # Sit in a loop and read stdin until eof
-    file_name = "C:\\Users\\vkramer\\Documents\\skimpy_test.scm"
-    if len(sys.argv) >= 2:
-        file_name = sys.argv[1]
+    analysis = seval.AnalysisStats() if args.analyze else None
     try:
         time1 = time.time()
-        run_file(global_env,file_name)
+        run_file(global_env,args.file_name,not args.no_cache,analysis,args.evaluator)
+        if analysis is not None:
+            print (str(analysis))
+        if args.cache_stats:
+            print ('global caches: ' + str(senv.get_cache_stats()))
         print ('total time to run: ' + str(time.time() - time1))
     except SkimpyError as skimpy_err:
         if skimpy_err.env is not None:
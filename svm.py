@@ -0,0 +1,415 @@
+import parse
+import sdata
+import senv
+import seval
+import os
+import sys
+import pickle
+from array import array
+from serror import SkimpyError
+from serror import StackFrame
+from serror import SourcePosition
+
+# A bytecode virtual machine.  Analyzed forms (see seval.py) are compiled into code objects: a flat stream of
+# instructions in an array, with tables of constants, names and nested code objects for the lambdas.  The machine runs
+# them in one loop, with its own stack of values and of waiting callers, so it recurses only as deep as memory allows
+# and makes every call in tail position in constant space.
+# Code objects pickle, so a file can be compiled once and its code shipped and run without the text (see save_module).
+
+# Every instruction is three words: the opcode and two operands a and b
+OP_CONST = 0            # Push constants[a]
+OP_LOCAL = 1            # Push slot b of the frame a levels up
+OP_FREE = 2             # Push names[b], looked up by name from the environment just outside the a innermost frames
+OP_GLOBAL = 3           # Push names[a], looked up by name.  For variables outside every lambda
+OP_DEFINE = 4           # Pop a value and bind names[a] to it
+OP_POP = 5              # Drop the top of the stack
+OP_JUMP = 6             # Go to instruction a
+OP_JUMP_IF_FALSE = 7    # Pop a value, and go to instruction a if it is false
+OP_OR = 8               # If the top of the stack is true, go to instruction a and keep it; otherwise pop it
+OP_AND = 9              # If the top of the stack is false, go to instruction a and keep it; otherwise pop it
+OP_CLOSURE = 10         # Push a procedure of codes[a], closed over the current environment
+OP_CALL = 11            # Call the procedure under the a arguments on top of the stack
+OP_TAIL_CALL = 12       # As OP_CALL, replacing the current call
+OP_RETURN = 13          # Return the top of the stack to the caller
+
+op_names = ["CONST","LOCAL","FREE","GLOBAL","DEFINE","POP","JUMP","JUMP_IF_FALSE","OR","AND","CLOSURE","CALL",
+            "TAIL_CALL","RETURN"]
+
+# Bump this whenever the instructions or the layout of code objects change.  Modules of other versions are refused
+VM_VERSION = 4
+
+class SkimpyCode(object):
+    def __init__(self,name,scope=None):
+        self.name = name
+        self.scope = scope  # The layout of the frames of a lambda's code (see senv.SkimpyScope); None at the top level
+        self.ops = array('l')
+        self.positions = []  # One for each instruction
+        self.caches = []  # One for each instruction: a senv.SkimpyGlobalCache for those that look up a name, and an
+                          # sdata.CallSite for calls
+        self.constants = []
+        self.names = []
+        self.name_index = {}
+        self.codes = []
+
+    def emit(self,op,a=0,b=0,form=None):
+        # Append an instruction and return its number
+        self.ops.extend((op,a,b))
+        if form is not None and form.position is not None:
+            self.positions.append(form.position)
+        else:
+            self.positions.append(self.positions[-1] if self.positions else SourcePosition(0,0))
+        if op == OP_FREE or op == OP_GLOBAL:
+            self.caches.append(senv.SkimpyGlobalCache())
+        elif op == OP_CALL or op == OP_TAIL_CALL:
+            self.caches.append(sdata.CallSite())
+        else:
+            self.caches.append(None)
+        return len(self.positions) - 1
+
+    def patch(self,instruction,a):
+        # Set operand a of an instruction, e.g. the target of a jump emitted before its target was known
+        self.ops[instruction * 3 + 1] = a
+
+    def here(self):
+        # The number of the next instruction
+        return len(self.positions)
+
+    def add_constant(self,value):
+        for idx,constant in enumerate(self.constants):
+            if constant is value:
+                return idx
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def add_name(self,name):
+        if name not in self.name_index:
+            self.name_index[name] = len(self.names)
+            self.names.append(name)
+        return self.name_index[name]
+
+    def __str__(self):
+        return 'code ' + self.name
+
+# The procedures the machine makes.  Called from the machine, they run in the same loop.  Called from anywhere else
+# -- a builtin, another evaluator -- they start a machine of their own
+class SkimpyVMProc(sdata.SkimpyProc):
+    __slots__ = ()
+
+    def __init__(self,enc_env,code):
+        super(SkimpyVMProc,self).__init__(enc_env,code.name,code.scope,code)
+
+    def __str__(self):
+        return self.name
+
+    def apply(self,token,exec_env,caller_id,values):
+        new_env = senv.bind_arglist(token,self.enc_env,self.arglist,values)
+        new_env.bind_private("_cp",StackFrame(self,token,exec_env))
+        return execute(self.text,new_env)
+
+# The compiler.  compile_form emits the code which pushes the value of form, with one function for each kind of form
+def compile_form(form,code,tail):
+    compilers[form.__class__](form,code,tail)
+
+def compile_literal(form,code,tail):
+    code.emit(OP_CONST,code.add_constant(form._v),form=form)
+
+def compile_variable(form,code,tail):
+    # The address is the one resolve_lambda found
+    if form.depth is None:
+        code.emit(OP_GLOBAL,code.add_name(form.varname),form=form)
+    elif form.slot is None:
+        code.emit(OP_FREE,form.depth,code.add_name(form.varname),form=form)
+    else:
+        code.emit(OP_LOCAL,form.depth,form.slot,form=form)
+
+def compile_define(form,code,tail):
+    compile_subform(form,0,code,False)
+    code.emit(OP_DEFINE,code.add_name(form.key),form=form)
+
+def compile_sequence(form,code,tail):
+    last_node = len(form.subnode_values)-1
+    for idx in range(0,last_node):
+        compile_subform(form,idx,code,False)
+        code.emit(OP_POP)
+    compile_subform(form,last_node,code,tail)
+
+def compile_if(form,code,tail):
+    compile_subform(form,0,code,False)
+    to_alternative = code.emit(OP_JUMP_IF_FALSE,form=form)
+    compile_subform(form,1,code,tail)
+    to_end = code.emit(OP_JUMP)
+    code.patch(to_alternative,code.here())
+    if len(form.subnode_values) > 2:
+        compile_subform(form,2,code,tail)
+    else:
+        code.emit(OP_CONST,code.add_constant(sdata.false_val))
+    code.patch(to_end,code.here())
+
+def compile_qualifier(form,code,tail):
+    op = OP_OR if form.qualifier_type == seval.QualifierType.Q_OR else OP_AND
+    last_node = len(form.subnode_values)-1
+    to_end = []
+    for idx in range(0,last_node):
+        compile_subform(form,idx,code,False)
+        to_end.append(code.emit(op,form=form))
+    compile_subform(form,last_node,code,tail)
+    for instruction in to_end:
+        code.patch(instruction,code.here())
+
+def compile_apply(form,code,tail):
+    for idx in range(0,len(form.subnode_values)):
+        compile_subform(form,idx,code,False)
+    code.emit(OP_TAIL_CALL if tail else OP_CALL,len(form.subnode_values)-1,form=form)
+
+def compile_lambda(form,code,tail):
+    scope = form.prepare()
+    name = form.force_name if form.force_name is not None else '#compound-procedure'
+    lambda_code = SkimpyCode(name,scope)
+    compile_form(form.subnode_values[0],lambda_code,True)
+    lambda_code.emit(OP_RETURN)
+    code.codes.append(lambda_code)
+    code.emit(OP_CLOSURE,len(code.codes)-1,form=form)
+
+def compile_subform(form,idx,code,tail):
+    form.subnode_values[idx] = seval.translate(form.subnode_values[idx])
+    compile_form(form.subnode_values[idx],code,tail)
+
+compilers = {seval.SkimpyLiteral : compile_literal,
+             seval.SkimpyVariable : compile_variable,
+             seval.SkimpyDefine : compile_define,
+             seval.SkimpySequence : compile_sequence,
+             seval.SkimpyIf : compile_if,
+             seval.SkimpyQualifier : compile_qualifier,
+             seval.SkimpyApply : compile_apply,
+             seval.SkimpyLambda : compile_lambda}
+
+def compile_toplevel(form,name='#toplevel'):
+    # The code of one top-level form, which returns its value
+    code = SkimpyCode(name)
+    compile_form(seval.preprocess(form),code,False)
+    code.emit(OP_RETURN)
+    return code
+
+def mapped_in_frames(env,depth,name):
+    # The value bound to name in the mapping of one of the depth frames out from env, if any
+    for level in range(depth):
+        if env.mapping is not None and name in env.mapping:
+            return env.mapping[name]
+        env = env.enclosing
+    return None
+
+def unbound(code,pc,name,env):
+    return SkimpyError(code.positions[pc // 3 - 1], 'unbound variable in this context: ' + name,env)
+
+def execute(code,env):
+    # Run code in env and return its value
+    stack = []
+    callers = []  # (code, pc, env) of each call waiting for a value
+    entry_env = env
+
+    ops = code.ops
+    constants = code.constants
+    names = code.names
+    pc = 0
+    while True:
+        op = ops[pc]
+        a = ops[pc+1]
+        pc += 3
+
+        if op == OP_LOCAL:
+            frame = env
+            shadowed = False
+            for level in range(a):
+                if frame.mapping is not None:
+                    shadowed = True
+                frame = frame.enclosing
+            value = frame.slots[ops[pc-1]]
+            if shadowed:
+                # A name in the mapping of a frame on the way comes first, as in SkimpyFrame.find
+                mapped = mapped_in_frames(env,a,frame.scope.names[ops[pc-1]])
+                if mapped is not None:
+                    value = mapped
+            if value is None:
+                raise unbound(code,pc,frame.scope.names[ops[pc-1]],env)
+            stack.append(value)
+        elif op == OP_CONST:
+            stack.append(constants[a])
+        elif op == OP_CALL or op == OP_TAIL_CALL:
+            if a:
+                values = stack[-a:]
+                del stack[-a:]
+            else:
+                values = []
+            proc = stack.pop()
+            position = code.positions[pc // 3 - 1]
+
+            if proc.__class__ is sdata.PythonProc:
+                value = code.caches[pc // 3 - 1].call(proc,position,env,values)
+                if value.__class__ is seval.TailCall:
+                    # apply handed back its call, which is made as this instruction would make it
+                    proc = value.proc
+                    values = value.values
+
+            if proc.__class__ is SkimpyVMProc:
+                new_env = senv.bind_arglist(position,proc.enc_env,proc.arglist,values)
+                if op == OP_CALL:
+                    callers.append((code,pc,env))
+                    caller_env = env
+                else:
+                    # A tail call replaces the current call, and returns where that would have
+                    caller_env = callers[-1][2] if callers else entry_env
+                new_env.bind_private("_cp",StackFrame(proc,position,caller_env))
+
+                code = proc.text
+                ops = code.ops
+                constants = code.constants
+                names = code.names
+                pc = 0
+                env = new_env
+            elif isinstance(proc,sdata.SkimpyProc):
+                if proc.__class__ is not sdata.PythonProc:
+                    value = proc.apply(position,env,None,values)
+                stack.append(value)
+                if op == OP_TAIL_CALL:
+                    # Return the value at once, as OP_RETURN
+                    if not callers:
+                        return stack.pop()
+                    code,pc,env = callers.pop()
+                    ops = code.ops
+                    constants = code.constants
+                    names = code.names
+            else:
+                raise SkimpyError(position, 'application: ' + str(proc) + ' is not callable',env)
+        elif op == OP_JUMP_IF_FALSE:
+            if sdata.is_false(stack.pop()):
+                pc = a * 3
+        elif op == OP_RETURN:
+            if not callers:
+                return stack.pop()
+            code,pc,env = callers.pop()
+            ops = code.ops
+            constants = code.constants
+            names = code.names
+        elif op == OP_FREE:
+            frame = env
+            name = names[ops[pc-1]]
+            value = None
+            for level in range(a):
+                if frame.mapping is not None and name in frame.mapping:
+                    value = frame.mapping[name]
+                    break
+                frame = frame.enclosing
+            else:
+                value = code.caches[pc // 3 - 1].lookup(frame,name)
+            if value is None:
+                raise unbound(code,pc,name,env)
+            stack.append(value)
+        elif op == OP_GLOBAL:
+            value = code.caches[pc // 3 - 1].lookup(env,names[a])
+            if value is None:
+                raise unbound(code,pc,names[a],env)
+            stack.append(value)
+        elif op == OP_JUMP:
+            pc = a * 3
+        elif op == OP_CLOSURE:
+            stack.append(SkimpyVMProc(env,code.codes[a]))
+        elif op == OP_POP:
+            stack.pop()
+        elif op == OP_OR:
+            if not sdata.is_false(stack[-1]):
+                pc = a * 3
+            else:
+                stack.pop()
+        elif op == OP_AND:
+            if sdata.is_false(stack[-1]):
+                pc = a * 3
+            else:
+                stack.pop()
+        elif op == OP_DEFINE:
+            env.bind(names[a],stack.pop())
+            stack.append(sdata.SkimpyNonReturn(names[a]))
+        else:
+            raise ValueError('bad opcode ' + str(op) + ' in ' + str(code))
+
+def vm_eval(skimpy_form,env):
+    # The evaluator of seval.evaluators: compile the form, then run it
+    return execute(compile_toplevel(skimpy_form),env)
+
+seval.evaluators["vm"] = vm_eval
+
+def disassemble(code,out=None):
+    # A listing of code and the codes nested in it, one instruction per line, as a list of lines.  With out, also
+    # write each line to it
+    lines = []
+    def describe(code,depth):
+        indent = '    ' * depth
+        header = 'code ' + code.name
+        if code.scope is not None:
+            header += ' (' + ' '.join(code.scope.names[0:code.scope.n_args]) + ')'
+            if len(code.scope.names) > code.scope.n_args:
+                header += ' locals ' + ' '.join(code.scope.names[code.scope.n_args:])
+        lines.append(indent + header)
+        for instruction in range(0,len(code.positions)):
+            op,a,b = code.ops[instruction*3:instruction*3 + 3]
+            if op == OP_CONST:
+                note = str(code.constants[a])
+            elif op == OP_LOCAL:
+                frame_scope = code.scope
+                for level in range(a):
+                    frame_scope = frame_scope.enclosing
+                note = frame_scope.names[b]
+            elif op == OP_FREE:
+                note = code.names[b]
+            elif op in (OP_GLOBAL,OP_DEFINE):
+                note = code.names[a]
+            elif op == OP_CLOSURE:
+                note = code.codes[a].name
+            else:
+                note = ''
+            position = code.positions[instruction]
+            lines.append('{}{:5d}  {:<14}{:>4} {:>4}   {:<24} line {}'.format(indent,instruction,op_names[op],a,b,note,
+                                                                           position.line))
+        for nested_code in code.codes:
+            describe(nested_code,depth + 1)
+    describe(code,0)
+
+    if out is not None:
+        for line in lines:
+            out.write(line + '\n')
+    return lines
+
+# Compiled modules: the code of each top-level form of a file, in order
+def compile_source(text):
+    return [compile_toplevel(form) for form in parse.skimpy_read(text)]
+
+def save_module(filename,codes):
+    with open(filename,'wb') as module_file:
+        pickle.dump({"version" : VM_VERSION, "unboxed" : sdata.unboxed_numbers, "codes" : codes},module_file,
+                    pickle.HIGHEST_PROTOCOL)
+
+def load_module(filename):
+    with open(filename,'rb') as module_file:
+        module = pickle.load(module_file)
+    if module.get("version") != VM_VERSION:
+        raise ValueError(filename + ': compiled by another version of the machine')
+    if module.get("unboxed") != sdata.unboxed_numbers:
+        # The constants are numbers of the other representation
+        raise ValueError(filename + ': compiled with ' + ('unboxed' if module.get("unboxed") else 'boxed') + ' numbers')
+    return module["codes"]
+
+def run_module(codes,env,recipient):
+    # As sloop.execute_forms
+    for code in codes:
+        try:
+            recipient(execute(code,env))
+        except Exception as e:
+            recipient(e)
+
+if __name__ == "__main__":
+    # python svm.py source.scm [module.skb]: compile a file, list its code, and save it if a module name is given
+    with open(sys.argv[1]) as source_file:
+        module_codes = compile_source(source_file.read())
+    for module_code in module_codes:
+        disassemble(module_code,sys.stdout)
+    if len(sys.argv) >= 3:
+        save_module(sys.argv[2],module_codes)
@@ -1,6 +1,10 @@
 import unittest
+import random
+import tempfile
+import os
 import parse
 from parse import *
+from serror import SkimpyError
 
 class TestSkimpyParser(unittest.TestCase):
 
@@ -50,6 +54,231 @@ class TestSkimpyParser(unittest.TestCase):
         self.assertTokenWithText(radd.text[2],"3")
         
         self.assertEqual(text.str_pretty(), "(+ 1 (* 2 3))")
+
+    def test_comment(self):
+        text_root = skimpy_scan("; leading comment\n(define x 1) ; trailing\n(f x)")
+
+        self.assertNodeWithXChildren(text_root,2)
+        self.assertEqual(text_root.text[0].str_pretty(), "(define x 1)")
+        self.assertEqual(text_root.text[1].str_pretty(), "(f x)")
+        self.assertEqual(text_root.text[1].line, 3)
+
+    def test_quote(self):
+        text_root = skimpy_scan("'a '(b 'c) (f 'd)")
+
+        self.assertNodeWithXChildren(text_root,3)
+        self.assertEqual(text_root.str_pretty(), "((quote a) (quote (b (quote c))) (f (quote d)))")
+
+    def test_read_streaming(self):
+        # Forms come out one at a time, before the reader sees the error further down the text
+        reader = skimpy_read("(define x 1)\nx\n(display x))")
+
+        self.assertEqual(next(reader).str_pretty(), "(define x 1)")
+        self.assertTokenWithText(next(reader),"x")
+        self.assertEqual(next(reader).str_pretty(), "(display x)")
+        with self.assertRaises(SkimpyError):
+            next(reader)
+
+    def test_read_errors(self):
+        for text in ["(a (b)", "a)", "'", "(')", "\"abc"]:
+            with self.assertRaises(SkimpyError):
+                skimpy_scan(text)
+
+    def test_token_kinds(self):
+        text = skimpy_scan('(f 12 -3 1.5 .5 1e3 #t #f "str" "" x-1 +)')
+        tokens = list(generate_subnodes(text.text[0]))
+
+        expected = [(TokenKind.IDENTIFIER,None),(TokenKind.INTEGER,12),(TokenKind.INTEGER,-3),(TokenKind.FLOAT,1.5),
+                    (TokenKind.FLOAT,0.5),(TokenKind.FLOAT,1000.0),(TokenKind.BOOLEAN,True),(TokenKind.BOOLEAN,False),
+                    (TokenKind.STRING,"str"),(TokenKind.STRING,""),(TokenKind.IDENTIFIER,None),(TokenKind.IDENTIFIER,None)]
+        self.assertEqual([(token.kind,token.value) for token in tokens],expected)
+        self.assertIs(type(tokens[1].value),int)
+        self.assertTrue(is_literal(tokens[8]))
+        self.assertTrue(is_varname(tokens[10]))
+
+class TestSkimpyLexer(unittest.TestCase):
+    # The table-driven lexer must produce exactly the token stream of the prescan FSM
+
+    samples = ["",
+               "   \n\t ",
+               "()",
+               "a-long-scheme-id",
+               "(+ 1 (* 2 3))",
+               "(define (fact n)\n  (if (< n 2)\n      1\n      (* n (fact (- n 1)))))\n",
+               "'(a b . c)",
+               "''x",
+               "(display \"hello, world\")",
+               "\"multi\nline\nstring\" after",
+               "\"a\"\"b\"c\"d\"",
+               "(x\"s\"y)",
+               "#t #f #\\newline",
+               "; only a comment",
+               "(a ; comment ( ) \" \n b)",
+               "abc;comment\ndef",
+               "\"semi;colon\" x",
+               "\"unterminated",
+               "1.5 -2 +3 .5 1e10 x.y",
+               "\u00e9t\u00e9 (\u03bb x)",
+               "(a\r\nb)\r\n",
+               "#(a #(1) '#(b)) x#(y) ##(z)",
+               "a\u00a0b\u3000(c\u2028d)"]
+
+    def tokens(self,prescan,text):
+        return [(token.text,token.line,token.col,token.kind,token.value) for token in prescan(text)]
+
+    def assertParity(self,text):
+        self.assertEqual(self.tokens(skimpy_lex,text),self.tokens(skimpy_prescan,text),repr(text))
+
+    def assertErrorParity(self,text):
+        with self.assertRaises(SkimpyError) as fsm_error:
+            self.tokens(skimpy_prescan,text)
+        with self.assertRaises(SkimpyError) as lex_error:
+            self.tokens(skimpy_lex,text)
+        self.assertEqual(str(lex_error.exception),str(fsm_error.exception))
+
+    def test_samples(self):
+        for text in self.samples:
+            self.assertParity(text)
+
+    def test_invalid_character(self):
+        self.assertErrorParity("(a b)\n  (c , d)")
+        self.assertErrorParity("x\n\"a\nb\" [")
+
+    def test_random(self):
+        # Random soup of every character class, including ones that must be rejected
+        alphabet = ["(",")","'",'"'," ","\n","\t",";","a","Z","7","-","#","\\",".","\u00e9",","]
+        rng = random.Random(1234)
+        for trial in range(500):
+            text = "".join(rng.choice(alphabet) for i in range(rng.randint(0,40)))
+            try:
+                expected = self.tokens(skimpy_prescan,text)
+            except SkimpyError:
+                self.assertErrorParity(text)
+                continue
+            self.assertEqual(self.tokens(skimpy_lex,text),expected,repr(text))
+
+    def test_unicode_space(self):
+        # Every space str.isspace() accepts separates tokens in a UTF-8 buffer as in text
+        for space in "\x85\xa0\u1680\u2000\u200a\u2028\u2029\u202f\u205f\u3000":
+            text = "(display" + space + "\"hi\"" + space + "\u00e9t\u00e9)"
+            self.assertParity(text)
+            table = SkimpySourceTable(text.encode('utf-8'))
+            nodes = [node.str_pretty() for node in skimpy_read_compact(table.source,table)]
+            self.assertEqual(nodes,[skimpy_scan(text).str_pretty()[1:-1]],repr(text))
+
+    def test_scan_modes(self):
+        text = self.samples[5]
+        self.assertEqual(skimpy_scan(text).str_pretty(),skimpy_scan(text,prescan=skimpy_prescan).str_pretty())
           
+class TestSkimpyCompact(unittest.TestCase):
+    # The compact tree must be indistinguishable from the regular one through the accessor functions
+
+    def flatten(self,node):
+        if is_atom(node):
+            return (get_text(node),node.line,node.col,node.kind,node.value)
+        return [(node.line,node.col)] + [self.flatten(subnode) for subnode in generate_subnodes(node)]
+
+    def test_parity(self):
+        for text in TestSkimpyLexer.samples:
+            try:
+                regular = skimpy_scan(text)
+            except SkimpyError as scan_error:
+                with self.assertRaises(SkimpyError) as compact_error:
+                    skimpy_scan(text,compact=True)
+                self.assertEqual(str(compact_error.exception),str(scan_error))
+                continue
+            compact = skimpy_scan(text,compact=True)
+            self.assertEqual(self.flatten(compact)[1:],self.flatten(regular)[1:],repr(text))
+            self.assertEqual(compact.str_pretty(),regular.str_pretty())
+
+    def test_accessors(self):
+        root = skimpy_scan("(define (f x)\n  '(x \"s\" 2.5))",compact=True)
+        self.assertTrue(is_root(root))
+
+        node = get_subnode(root,0)
+        self.assertIsInstance(node,SkimpyCompactNode)
+        self.assertFalse(is_root(node))
+        self.assertEqual(get_text(get_subnode(node,0)),"define")
+
+        quoted = get_subnode(node,-1)
+        self.assertEqual((quoted.line,quoted.col),(2,3))
+        self.assertEqual(get_text(get_subnode(quoted,0)),"quote")
+        self.assertEqual(get_subnode(quoted,1).str_pretty(),'(x "s" 2.5)')
+        self.assertEqual(get_subnode(get_subnode(quoted,1),2).value,2.5)
+        self.assertTrue(is_string(get_subnode(get_subnode(quoted,1),1)))
+
+    def test_bytes_source(self):
+        # A UTF-8 buffer, such as a mapped file, reads to the same tree as the decoded text
+        for text in TestSkimpyLexer.samples + ["(\u00e9t\u00e9 \"\u03bb\" x) ; \u00e9\n(y)"]:
+            try:
+                expected = self.flatten(skimpy_scan(text))[1:]
+            except SkimpyError:
+                continue  # See test_errors
+            table = SkimpySourceTable(text.encode('utf-8'))
+            nodes = [self.flatten(node) for node in skimpy_read_compact(table.source,table)]
+            self.assertEqual(nodes,expected,repr(text))
+
+    def test_errors(self):
+        for text in ["(a (b)", "a)", "'", "(')", "\"abc", "(x ,)", "(\u00e9 \u00e9,)"]:
+            with self.assertRaises(SkimpyError) as bytes_error:
+                list(skimpy_read_compact(text.encode('utf-8')))
+            with self.assertRaises(SkimpyError) as scan_error:
+                skimpy_scan(text)
+            with self.assertRaises(SkimpyError) as compact_error:
+                skimpy_scan(text,compact=True)
+            self.assertEqual(str(compact_error.exception),str(scan_error.exception))
+            self.assertEqual(str(bytes_error.exception),str(scan_error.exception))
+
+class TestSkimpyParallel(unittest.TestCase):
+    # A parallel read must produce exactly the compact tree of a sequential one
+
+    text = "".join("; row %d\n(define row%d '(%d \"name\n%d\" (a b) #t))\n" % (i,i,i,i) for i in range(200)) + "last"
+
+    def setUp(self):
+        self.saved_min_chunk = parse.parallel_min_chunk
+        parse.parallel_min_chunk = 64
+
+    def tearDown(self):
+        parse.parallel_min_chunk = self.saved_min_chunk
+
+    def test_chunks(self):
+        cuts = find_chunks(self.text,8)
+        self.assertEqual(cuts[0],0)
+        self.assertEqual(cuts[-1],len(self.text))
+        self.assertTrue(len(cuts) > 2)
+        for cut in cuts[1:-1]:
+            self.assertEqual(self.text[cut - 1],")")
+        self.assertIsNone(find_chunks("(a))",2))
+        self.assertIsNone(find_chunks("(a \")\"",2))
+
+    def test_compact(self):
+        expected = skimpy_scan(self.text,compact=True).table
+        for source in [self.text,self.text.encode('utf-8')]:
+            table = skimpy_scan_parallel(source,processes=3).table
+            for column in ['starts','ends','kinds','node_offsets','node_firsts','node_counts','subnodes']:
+                self.assertEqual(getattr(table,column),getattr(expected,column),column)
+
+    def test_mapped_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory,"data.scm")
+            with open(filename,'w') as data_file:
+                data_file.write(self.text)
+
+            table = SkimpySourceTable(map_source(filename),filename)
+            root = skimpy_scan_parallel(table.source,processes=2,table=table)
+            self.assertEqual(root.str_pretty(),skimpy_scan(self.text).str_pretty())
+
+    def test_errors(self):
+        with self.assertRaises(SkimpyError) as scan_error:
+            skimpy_scan(self.text + ")")
+        with self.assertRaises(SkimpyError) as parallel_error:
+            skimpy_scan_parallel(self.text + ")",processes=3)
+        self.assertEqual(str(parallel_error.exception),str(scan_error.exception))
+
+        # An error inside a chunk is reported at its position in the whole text
+        with self.assertRaises(SkimpyError) as parallel_error:
+            skimpy_scan_parallel("(a)\n" * 100 + "(b ,)" + "(c)" * 100,processes=3)
+        self.assertEqual(str(parallel_error.exception),"SkimpyError: line 101 col 4: Invalid character: ,")
+
 if __name__ == '__main__':
     unittest.main()
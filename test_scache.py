@@ -0,0 +1,85 @@
+import unittest
+import unittest.mock
+import tempfile
+import shutil
+import os
+import scache
+import sloop
+import sdata
+import senv
+
+class TestSkimpyCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory,"lib.scm")
+        self.write_source("(define (square x) (* x x))\n(define syms '(a #f ()))\n(square 7)\n")
+        scache.reset_stats()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_source(self,text):
+        with open(self.filename,'w') as source_file:
+            source_file.write(text)
+
+    def run_file(self):
+        results = []
+        env = sloop.prepare()
+        sloop.execute_forms(scache.load_forms(self.filename),env,results.append)
+        return env,[str(result) for result in results]
+
+    def test_hit_and_miss(self):
+        env,cold = self.run_file()
+        self.assertEqual(scache.get_stats(),{"hits" : 0, "misses" : 1})
+        self.assertTrue(os.path.isfile(scache.get_cache_path(self.filename)))
+
+        env,warm = self.run_file()
+        self.assertEqual(scache.get_stats(),{"hits" : 1, "misses" : 1})
+        self.assertEqual(warm,cold)
+        self.assertEqual(warm[-1],"49")
+
+    def test_values_keep_identity(self):
+        self.run_file()
+        env,warm = self.run_file()
+
+        syms = env.find("syms")
+        self.assertIs(syms.car,senv.lookup_symbol("a",sdata.SkimpySymbol))
+        self.assertIs(syms.cdr.car,sdata.false_val)
+        self.assertIs(syms.cdr.cdr.car,sdata.the_empty_list)
+
+    def test_invalidation(self):
+        self.run_file()
+
+        # A change in the text is a miss
+        self.write_source("(define (square x) (* x x))\n(square 8)\n")
+        env,results = self.run_file()
+        self.assertEqual(results[-1],"64")
+        self.assertEqual(scache.get_stats(),{"hits" : 0, "misses" : 2})
+
+        self.assertTrue(scache.invalidate(self.filename))
+        self.assertFalse(scache.invalidate(self.filename))
+        self.run_file()
+        self.assertEqual(scache.get_stats(),{"hits" : 0, "misses" : 3})
+
+    def test_translation_errors_are_deferred(self):
+        self.write_source("(define x 1)\n(lambda)\nx\n(let ((y)) y)\n(cond)\n()\n")
+        env,results = self.run_file()
+        env,results = self.run_file()
+        self.assertEqual(results[0],"x")
+        self.assertIn("lambda: invalid syntax",results[1])
+        self.assertEqual(results[2],"1")
+        self.assertIn("let: invalid syntax in bindings",results[3])
+        self.assertIn("ill-formed cond",results[4])
+        self.assertIn("unexpected empty form ()",results[5])
+
+    def test_analysis_bugs_are_raised(self):
+        # Only syntax errors are deferred.  Anything else translation raises is not hidden in the cache
+        def broken(node,stats=None):
+            raise TypeError('broken')
+        with unittest.mock.patch.object(scache.seval,'preprocess',broken):
+            with self.assertRaises(TypeError):
+                scache.load_forms(self.filename)
+
+if __name__ == '__main__':
+    unittest.main()
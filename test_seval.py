@@ -0,0 +1,429 @@
+import unittest
+import pickle
+import os
+import tempfile
+import parse
+import seval
+import sloop
+import senv
+import sdata
+import sbuiltins
+from serror import SkimpyError
+
+class TestSkimpyAnalysis(unittest.TestCase):
+
+    program = """
+(define (count-down n) (cond ((= n 0) 'done) (else (count-down (+ n -1)))))
+(define (pick x) (let ((y (+ x 1))) (if (and x y) y)))
+(count-down 100)
+(pick 4)
+(or #f (if #f 1))
+"""
+
+    def run_program(self,analysis):
+        results = []
+        sloop.execute_code(self.program,sloop.prepare(),results.append,analysis=analysis)
+        return [str(result) for result in results]
+
+    def assert_fully_translated(self,form):
+        stack = [form]
+        while stack:
+            current = stack.pop()
+            self.assertIsInstance(current,seval.SkimpyForm)
+            if current.subnode_values:
+                stack.extend(current.subnode_values)
+
+    def test_preprocess(self):
+        for node in parse.skimpy_read(self.program):
+            stats = seval.AnalysisStats()
+            form = seval.preprocess(node,stats)
+            self.assert_fully_translated(form)
+            self.assertEqual(stats.forms,1)
+            self.assertGreater(stats.nodes,0)
+
+            # A translated form has nothing left to do
+            again = seval.AnalysisStats()
+            self.assertIs(seval.preprocess(form,again),form)
+            self.assertEqual(again.nodes,0)
+
+    def test_eager_and_lazy_agree(self):
+        stats = seval.AnalysisStats()
+        eager = self.run_program(stats)
+        self.assertEqual(eager,self.run_program(None))
+        self.assertEqual(eager[2:],["done","5","#f"])
+        self.assertEqual(stats.forms,5)
+
+    def test_ill_formed_if(self):
+        for text in ["(if)","(if #t)","(if #t 1 2 3)"]:
+            results = []
+            sloop.execute_code(text,sloop.prepare(),results.append)
+            self.assertIsInstance(results[0],SkimpyError,text)
+            self.assertIn("ill-formed if",str(results[0]))
+
+class TestSkimpyCompiled(unittest.TestCase):
+
+    program = """
+(define (fib n) (if (< n 2) n (+ (fib (+ n -1)) (fib (+ n -2)))))
+(define (even? n) (if (= n 0) #t (odd? (+ n -1))))
+(define (odd? n) (if (= n 0) #f (even? (+ n -1))))
+(define (sum l) (cond ((null? l) 0) (else (+ (car l) (sum (cdr l))))))
+(fib 10)
+(even? 41)
+(let ((x 3) (y 4)) (and (or #f x) (sum (list x y 5))))
+(or)
+"""
+
+    def run_program(self,text,evaluator):
+        results = []
+        sloop.execute_code(text,sloop.prepare(),results.append,evaluator=evaluator)
+        return [str(result) for result in results]
+
+    def test_evaluators_agree(self):
+        compiled = self.run_program(self.program,"compiled")
+        self.assertEqual(compiled[4:],["55","#f","12","#f"])
+        self.assertEqual(compiled,self.run_program(self.program,"recursive"))
+
+    def test_tail_calls(self):
+        # Mutual recursion in tail position runs in constant stack, also through cond, and, or and let
+        program = self.program + """
+(define (state-a n) (cond ((= n 0) 'a) (else (state-b (+ n -1)))))
+(define (state-b n) (and #t (or #f (begin (state-c (+ n -1))))))
+(define (state-c n) (let ((m n)) (state-a m)))
+(even? 100000)
+(state-a 30000)
+"""
+        for evaluator in ["recursive","explicit","compiled"]:
+            results = self.run_program(program,evaluator)
+            self.assertEqual(results[-2:],["#t","a"])
+
+    def test_apply_tail_call(self):
+        # apply in tail position is a tail call, and out of it gives the value as any call
+        program = "(define (loop n) (if (= n 0) 'done (apply loop (list (+ n -1)))))(loop 100000)" \
+                  "(define (f a b) (* a b))(+ 1 (apply f 2 '(5)))(map apply (list + f) '((1 2) (3 4)))"
+        for evaluator in ["recursive","explicit","compiled","hybrid","vm"]:
+            results = self.run_program(program,evaluator)
+            self.assertEqual(results[1],"done")
+            self.assertEqual(results[3:],["11","(3 12)"])
+
+    def test_hybrid(self):
+        # Shallow code stays on the recursive evaluator, and deep code goes on in the explicit one
+        seval.handovers = 0
+        results = self.run_program(self.program,"hybrid")
+        self.assertEqual(results[4:],["55","#f","12","#f"])
+        self.assertEqual(seval.handovers,0)
+
+        results = self.run_program("(define (count n) (if (= n 0) 0 (+ 1 (count (+ n -1)))))(count 20000)","hybrid")
+        self.assertEqual(results[-1],"20000")
+        self.assertGreater(seval.handovers,0)
+        self.assertEqual(seval.eval_depth,0)
+
+    def test_explicit_depth(self):
+        # Recursion that is not in tail position is as deep as memory allows
+        results = self.run_program("(define (count n) (if (= n 0) 0 (+ 1 (count (+ n -1)))))(count 20000)","explicit")
+        self.assertEqual(results[-1],"20000")
+        # also in procedures that builtins call back
+        results = self.run_program("(define (count n) (if (= n 0) 0 (+ 1 (count (+ n -1)))))(car (map count '(20000)))",
+                                   "explicit")
+        self.assertEqual(results[-1],"20000")
+
+    def test_call_sites(self):
+        # A call site keeps the invoker of the primitive it called last, until it calls another; the checks it
+        # keeps fail as apply's do
+        program = "(define (f op a b) (op a b))(f + 1 2)(f * 3 4)(f + 5 6)(f car 1 2)(define (g x) (car x))(g (cons 1 2))(g 3)"
+        for evaluator in ["recursive","explicit","compiled","vm"]:
+            results = self.run_program(program,evaluator)
+            self.assertEqual(results[1:4],["3","12","11"])
+            self.assertIn("too many arguments for builtin procedure car",results[4])
+            self.assertEqual(results[6],"1")
+            self.assertIn("argument 0: wrong argument type for builtin procedure car; expected pair",results[7])
+
+    def test_pickle(self):
+        # Compiled code is not part of a pickled form
+        form = seval.preprocess(next(parse.skimpy_read("(define (f x) (+ x 1))")))
+        env = sloop.prepare()
+        seval.compiled_eval(form,env)
+        copy = pickle.loads(pickle.dumps(form))
+        self.assertIsNone(copy._code)
+        self.assertIsNone(copy._cek_code)
+        seval.compiled_eval(copy,env)
+        self.assertEqual(str(seval.compiled_eval(next(parse.skimpy_read("(f 1)")),env)),"2")
+
+    def test_compact_objects(self):
+        # Values, environments and forms have no __dict__, and forms keep only the position of their text
+        env = sloop.prepare()
+        results = []
+        sloop.execute_code("(define (f x) (lambda (y) (cons x y)))((f 1) 2)",env,results.append)
+        frame = env.find("f").apply(None,env,None,[results[-1]]).enc_env
+        for value in [results[-1],results[-1].car,env.find("f"),env.find("car"),env,frame]:
+            self.assertFalse(hasattr(value,'__dict__'),type(value))
+
+        form = seval.preprocess(next(parse.skimpy_read("\n  (f 1)")))
+        self.assertFalse(hasattr(form,'__dict__'))
+        copy = pickle.loads(pickle.dumps(form))
+        self.assertEqual((copy.position.line,copy.position.col),(2,3))
+
+class TestSkimpyLexical(unittest.TestCase):
+
+    program = """
+(define (make-counter start)
+  (define step 1)
+  (lambda (n) (let ((total (+ start (* n step)))) (if (> total 10) 'big total))))
+(define counter (make-counter 5))
+(counter 2)
+(counter 9)
+(define (shadow x) (let ((x (+ x 1))) ((lambda (x) x) (+ x 1))))
+(shadow 1)
+"""
+
+    def test_addresses(self):
+        forms = [seval.preprocess(node) for node in parse.skimpy_read(self.program)]
+        maker = forms[0].get_subnode(0)
+        scope = maker.prepare()
+        self.assertEqual(scope.names,["start","step"])
+        self.assertEqual(scope.n_args,1)
+
+        # In the lambda, n is local and start and step one frame out.  In the let inside it, total is local
+        # and n one frame out.  + is free everywhere
+        addresses = set()
+        stack = [maker]
+        while stack:
+            current = stack.pop()
+            if isinstance(current,seval.SkimpyVariable):
+                addresses.add((current.varname,current.depth,current.slot))
+            elif current.subnode_values:
+                stack.extend(current.subnode_values)
+        self.assertEqual(addresses,{("n",0,0),("start",1,0),("step",1,1),("total",0,0),("+",2,None),("*",2,None),
+                                    (">",3,None)})
+
+    def test_shared_bodies(self):
+        # Every procedure made from a lambda shares the one translation of its body.  (The bytecode machine makes its
+        # procedures from compiled code instead.)
+        for evaluator in ["recursive","explicit","generator","compiled","hybrid"]:
+            seval.reset_lambda_stats()
+            results = []
+            sloop.execute_code("(define (adder n) (lambda (x) (+ x n)))(map (lambda (n) ((adder n) 1)) (list 1 2 3))",
+                               sloop.prepare(),results.append,evaluator=evaluator)
+            self.assertEqual(str(results[-1]),"(2 3 4)")
+            # adder, its inner lambda and the lambda given to map.  The inner lambda makes three procedures
+            self.assertEqual(seval.get_lambda_stats(),{"bodies_translated" : 3, "translations_avoided" : 2})
+
+    def test_global_caches(self):
+        senv.collect_cache_stats = True
+        try:
+            for evaluator in seval.evaluators:
+                env = sloop.prepare()
+                senv.reset_cache_stats()
+                results = []
+                sloop.execute_code("(define (f n) (if (= n 0) base (f (+ n -1))))(define base 1)(f 50)"
+                                   "(define base 2)(f 50)(define (g base) (f base))(g 3)(define base 3)(g 4)",
+                                   env,results.append,evaluator=evaluator)
+                # A define to a name already bound updates it in place; a new one invalidates the caches of that name
+                self.assertEqual([str(result) for result in results[2:]],["1","base","2","g","2","base","3"])
+                stats = senv.get_cache_stats()
+                self.assertGreater(stats["hits"],stats["misses"])
+
+                # A define of another name, at the top or in a frame, leaves the caches alone
+                results = []
+                sloop.execute_code("(define (h) (define unrelated 1) unrelated)(h)(f 5)",env,results.append,
+                                   evaluator=evaluator)
+                senv.reset_cache_stats()
+                sloop.execute_code("(h)(f 5)",env,results.append,evaluator=evaluator)
+                misses = senv.get_cache_stats()["misses"]  # Only the new references at the top level
+                senv.reset_cache_stats()
+                sloop.execute_code("(define another 1)(h)(f 5)",env,results.append,evaluator=evaluator)
+                self.assertEqual([str(result) for result in results[-3:]],["another","1","3"])
+                self.assertEqual(senv.get_cache_stats()["misses"],misses,evaluator)
+        finally:
+            senv.collect_cache_stats = False
+            senv.reset_cache_stats()
+
+    def test_loads_in_frames(self):
+        # A load inside a procedure binds names its scope does not know about, which references from inner scopes
+        # still find, ahead of the same names further out
+        with tempfile.TemporaryDirectory() as directory:
+            for filename,text in [("g.scm","(define (g) 42)"),("x.scm","(define x 7)")]:
+                with open(os.path.join(directory,filename),"w") as source:
+                    source.write(text)
+            program = ('(define (outer x) (define (inner) (load "{0}") (+ x (g))) (inner))(outer 1)'
+                       '(define x 100)(define (k) (load "{1}") (define (m) x) (m))(k)'
+                       .format(os.path.join(directory,"g.scm"),os.path.join(directory,"x.scm")))
+            for evaluator in seval.evaluators:
+                results = []
+                sloop.execute_code(program,sloop.prepare(),results.append,evaluator=evaluator)
+                self.assertEqual([str(results[1]),str(results[-1])],["43","7"],evaluator)
+
+    def test_evaluators(self):
+        for evaluator in seval.evaluators:
+            results = []
+            env = sloop.prepare()
+            sloop.execute_code(self.program,env,results.append,evaluator=evaluator)
+            self.assertEqual([str(result) for result in results[2:]],["7","big","shadow","3"])
+            self.assertIsInstance(env.find("counter").enc_env,senv.SkimpyFrame)
+
+class TestSkimpyBuiltins(unittest.TestCase):
+
+    def test_signatures(self):
+        # Signatures are compiled when builtins are bound, and raise the errors apply always raised
+        env = sloop.prepare()
+        check_number = (lambda arg,idx: isinstance(arg,sdata.SkimpyNumber))
+        sbuiltins.bind_builtin(env,'pick',lambda env,tok,flag,*rest: rest[0] if flag else rest[-1],
+                               check_arg_count=(2,None),check_arg_types=[('*',None)],rest_type=('number',check_number),
+                               is_raw=(True,))
+        signature = env.find('pick').signature
+        self.assertEqual((signature.min_args,signature.max_args,signature.conversion),(2,None,sdata.CONVERT_PER_ARGUMENT))
+
+        results = []
+        sloop.execute_code("(pick #f 1 2 3)(pick 'a 1 2)(pick 1)(pick 1 2 'x)(= 1)(car 1)",env,results.append)
+        results = [str(result) for result in results]
+        self.assertEqual(results[:2],["3","1"])
+        self.assertIn("too few arguments for builtin procedure pick",results[2])
+        self.assertIn("argument 2: wrong argument type for builtin procedure pick; expected number",results[3])
+        self.assertIn("too few arguments for builtin procedure =",results[4])
+        self.assertIn("argument 0: wrong argument type for builtin procedure car; expected pair",results[5])
+
+    def test_numeric(self):
+        # The arithmetic with any number of arguments, the variadic comparisons, and the fixnum and flonum operations
+        program = "(- 10 1 2)(- 5)(+ 1 2 3)(/ 1 4)(< 1 2 3)(< 1 3 2)(>= 3 3 1)(fx+ 1 2)(fx< 2 1)(fl* 1.5 2.0)(fx+ 1 2.0)"
+        for unboxed in [False,True]:
+            try:
+                sdata.unboxed_numbers = unboxed
+                for evaluator in ["recursive","compiled","vm"]:
+                    results = []
+                    sloop.execute_code(program,sloop.prepare(),results.append,evaluator=evaluator)
+                    results = [str(result) for result in results]
+                    self.assertEqual(results[:-1],["7","-5","6","0.25","#t","#f","#t","3","#f","3.0"])
+                    self.assertIn("argument 1: wrong argument type for builtin procedure fx+; expected fixnum",results[-1])
+            finally:
+                sdata.unboxed_numbers = False
+
+    def test_arena_pairs(self):
+        # Lists the builder makes in arena mode behave as lists of pair objects
+        program = "(list 1 (list 2 3) 4)(map (lambda (x) (* x x)) (list 1 2 3))(car (cdr (list 1 2)))(cons 0 (list 1))" \
+                  "'(a (b) . c)(cdr (cdr '(1 2 . 3)))"
+        for arena in [False,True]:
+            try:
+                sdata.arena_pairs = arena
+                results = []
+                sloop.execute_code(program,sloop.prepare(),results.append)
+                self.assertEqual([str(result) for result in results],["(1 (2 3) 4)","(1 4 9)","2","(0 1)","(a (b) . c)","3"])
+                self.assertIs(type(results[0]),sdata.ArenaPair if arena else sdata.SkimpyPair)
+            finally:
+                sdata.arena_pairs = False
+
+        # A cycle through the arena and a pair object is found by the printer
+        sdata.arena_pairs = True
+        try:
+            sloop.execute_code("(list 1 2 3)",sloop.prepare(),results.append)
+        finally:
+            sdata.arena_pairs = False
+        lst = results[-1]
+        lst.cdr.cdr.cdr = sdata.SkimpyPair(sdata.SkimpyNumber(0),lst.cdr)
+        self.assertEqual(str(lst),'<list structure contains cycles>')
+        self.assertEqual(lst.cdr,lst.cdr)
+
+    def test_list_primitives(self):
+        # The native list primitives agree across the engines and the pair representations, and report improper lists
+        program = "(length '(1 2 3))(append '(1) '() '(2 3) 4)(reverse '(1 2 3))(list-ref '(a b c) 2)(list-tail '(a b c) 1)" \
+                  "(last-pair '(1 2 . 3))(member '(b) '(a (b) c))(assoc 2.0 '((1 . a) (2 . b)))(filter (lambda (x) (< x 2)) '(3 1 0))" \
+                  "(fold-left - 0 '(1 2 3))(fold-right cons '() '(1 2))(map + '(1 2 3) '(10 20))(apply + 1 '(2 3))" \
+                  "(sort '(3 1 2) <)(equal? '(1 \"a\" (2)) (list 1 \"a\" (list 2)))(length '(1 . 2))(list-ref '(1) 1)" \
+                  "(list-ref '() 0)(member 5 '(1 2 . 3))(assoc 5 '((1 . 2) . 3))(assoc 5 '((1 . 2) 3))"
+        expected = ["3","(1 2 3 . 4)","(3 2 1)","c","(b c)","(2 . 3)","((b) c)","#f","(1 0)","-6","(1 2)","(11 22)","6",
+                    "(1 2 3)","#t"]
+        for arena in [False,True]:
+            try:
+                sdata.arena_pairs = arena
+                for evaluator in ["recursive","vm"]:
+                    results = []
+                    sloop.execute_code(program,sloop.prepare(),results.append,evaluator=evaluator)
+                    results = [str(result) for result in results]
+                    self.assertEqual(results[:-6],expected)
+                    self.assertIn("length: not a proper list",results[-6])
+                    self.assertIn("list-ref: index out of range",results[-5])
+                    self.assertIn("list-ref: index out of range",results[-4])
+                    self.assertIn("member: not a proper list",results[-3])
+                    self.assertIn("assoc: not a proper list",results[-2])
+                    self.assertIn("assoc: not an association list",results[-1])
+            finally:
+                sdata.arena_pairs = False
+
+    def test_hash_tables(self):
+        # eq? tables find interned symbols, equal? tables find lists, strings and numbers by structure, and eq? and eqv?
+        # themselves compare as the tables do
+        setup = "(define t (make-hash-table eq?))(hash-table-set! t 'a 1)(hash-table-set! t 'b 2)" \
+                "(hash-table-update! t 'a (lambda (v) (+ v 10)))(hash-table-update! t 'c (lambda (v) v) (lambda () 3))" \
+                "(hash-table-delete! t 'b)" \
+                "(define e (make-hash-table))(hash-table-set! e (list 1 \"x\" 2.0) 'found)(hash-table-set! e 1 'one)"
+        cases = [("(hash-table-ref t 'a)","11"),
+                 ("(hash-table-count t)","2"),
+                 ("(sort (hash-table-keys t) (lambda (a b) (eq? a 'a)))","(a c)"),
+                 ("(hash-table-ref e '(1 \"x\" 2.0))","found"),
+                 ("(hash-table-ref/default e '(1 \"x\" 2) 'no)","no"),
+                 ("(hash-table-ref e 1.0 (lambda () 'no))","no"),
+                 ("(eq? 'a 'a)","#t"),
+                 ("(eq? '(1) '(1))","#f"),
+                 ("(eqv? 1.5 1.5)","#t"),
+                 ("(eqv? 1 1.0)","#f")]
+        for unboxed in [False,True]:
+            try:
+                sdata.unboxed_numbers = unboxed
+                for evaluator in ["recursive","vm"]:
+                    env = sloop.prepare()
+                    results = []
+                    sloop.execute_code(setup,env,results.append,evaluator=evaluator)
+                    for result in results:
+                        self.assertNotIsInstance(result,Exception)
+                    for text,expected in cases:
+                        results = []
+                        sloop.execute_code(text,env,results.append,evaluator=evaluator)
+                        self.assertEqual([str(result) for result in results],[expected],(text,unboxed,evaluator))
+                    results = []
+                    sloop.execute_code("(hash-table-ref t 'b)",env,results.append,evaluator=evaluator)
+                    self.assertIsInstance(results[0],SkimpyError)
+                    self.assertIn("hash-table-ref: no value for key b",str(results[0]))
+            finally:
+                sdata.unboxed_numbers = False
+
+    def test_vectors(self):
+        # Vectors from the procedures and from #( literals, which both readers read, print with the pair printer
+        program = "(define v (make-vector 3 0))(vector-set! v 0 'a)(vector-ref v 0)(vector-length v)#(1 (2) #(3))" \
+                  "'(x #(y))(vector->list (vector 1 2))(list->vector '(1 2))(vector-map + #(1 2) #(10 20 30))" \
+                  "(equal? #(1 (2)) (vector 1 (list 2)))(vector-fill! v v)"
+        expected = ["v","<unspecified>","a","3","#(1 (2) #(3))","(x #(y))","(1 2)","#(1 2)","#(11 22)","#t",
+                    "<unspecified>"]
+        for compact in [False,True]:
+            for evaluator in ["recursive","vm"]:
+                results = []
+                env = sloop.prepare()
+                for form in parse.skimpy_scan(program,compact=compact).text:
+                    results.append(seval.evaluators[evaluator](form,env))
+                self.assertEqual([str(result) for result in results],expected,(compact,evaluator))
+        sloop.execute_code("(vector-ref v 3)",env,results.append)
+        self.assertEqual(str(env.find('v')),'<vector structure contains cycles>')
+        self.assertIn("vector-ref: index out of range",str(results[-1]))
+
+class TestSkimpyUnboxed(unittest.TestCase):
+
+    program = """
+(define (fib n) (if (< n 2) n (+ (fib (+ n -1)) (fib (+ n -2)))))
+(fib 12)
+(list 1 2.5 (* 2 3) (/ 1 2))
+(map (lambda (x) (remainder x 3)) '(4 5 6))
+(if (= (car (cons 1 2)) 1) 'one 'other)
+"""
+
+    def test_unboxed_numbers(self):
+        # Numbers are Python numbers, and every engine gives the same results as with boxes
+        try:
+            sdata.unboxed_numbers = True
+            for evaluator in ["recursive","explicit","compiled","vm"]:
+                results = []
+                env = sloop.prepare()
+                sloop.execute_code(self.program,env,results.append,evaluator=evaluator)
+                self.assertEqual([str(result) for result in results[1:]],["144","(1 2.5 6 0.5)","(1 2 0)","one"])
+                self.assertIs(type(results[1]),int)
+        finally:
+            sdata.unboxed_numbers = False
+
+if __name__ == '__main__':
+    unittest.main()
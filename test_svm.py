@@ -0,0 +1,60 @@
+import unittest
+import tempfile
+import shutil
+import os
+import parse
+import sloop
+import svm
+
+class TestSkimpyVM(unittest.TestCase):
+
+    program = """
+(define (fib n) (if (< n 2) n (+ (fib (+ n -1)) (fib (+ n -2)))))
+(define (even? n) (if (= n 0) #t (odd? (+ n -1))))
+(define (odd? n) (if (= n 0) #f (even? (+ n -1))))
+(define (make-adder n) (define step n) (lambda (x) (+ x step)))
+(fib 10)
+(even? 30001)
+(let ((add (make-adder 3))) (cond ((or #f (and 1 #f)) 'no) (else (add 4))))
+(map (make-adder 1) '(1 2))
+(begin 1 '(a b))
+\"\"
+"""
+
+    def run_source(self,evaluator):
+        results = []
+        sloop.execute_code(self.program,sloop.prepare(),results.append,evaluator=evaluator)
+        return [str(result) for result in results]
+
+    def test_agrees(self):
+        results = self.run_source("vm")
+        self.assertEqual(results[4:],["55","#f","7","(2 3)","(a b)",""])
+        self.assertEqual(results,self.run_source("recursive"))
+
+    def test_depth(self):
+        results = []
+        sloop.execute_code("(define (count n) (if (= n 0) 0 (+ 1 (count (+ n -1)))))(count 20000)",sloop.prepare(),
+                           results.append,evaluator="vm")
+        self.assertEqual(str(results[-1]),"20000")
+
+    def test_module(self):
+        # A saved module runs without the text
+        directory = tempfile.mkdtemp()
+        try:
+            module_name = os.path.join(directory,"prog.skb")
+            svm.save_module(module_name,svm.compile_source(self.program))
+            results = []
+            svm.run_module(svm.load_module(module_name),sloop.prepare(),results.append)
+            self.assertEqual([str(result) for result in results],self.run_source("recursive"))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_disassemble(self):
+        code = svm.compile_toplevel(next(parse.skimpy_read("(define (f x) (if x (g x) 'none))")))
+        listing = "\n".join(svm.disassemble(code))
+        self.assertIn("code f (x)",listing)
+        for expected in ["CLOSURE","DEFINE","JUMP_IF_FALSE","TAIL_CALL","RETURN","none"]:
+            self.assertIn(expected,listing)
+
+if __name__ == '__main__':
+    unittest.main()